@@ -9,11 +9,83 @@ class Settings(BaseSettings):
     supabase_service_key: str = ""
     database_url: str
 
+    # Database connection pool (a 0 statement timeout disables it)
+    db_pool_min_size: int = 2
+    db_pool_max_size: int = 10
+    db_pool_acquire_timeout_seconds: float = 10.0
+    db_statement_timeout_ms: int = 30000
+    db_connection_max_lifetime_seconds: float = 1800.0
+    db_connection_max_idle_seconds: float = 300.0
+    db_statement_cache_size: int = 256
+
+    # Hot queries run as named prepared statements (see app.core.statements)
+    prepared_statements_enabled: bool = True
+
+    # Authoritative in-memory game state with a write-behind journal
+    # (see app.services.game_engine; needs a single worker)
+    game_engine_enabled: bool = False
+    game_engine_journal_path: str = "game_engine.journal"
+    game_engine_fsync_interval_ms: float = 2.0
+    game_engine_flush_interval_ms: int = 500
+    game_engine_max_players: int = 100000
+    game_engine_missing_ttl_seconds: float = 30.0
+
+    # Per-statement query stats, per-request traces and the slow-query log
+    query_tracing_enabled: bool = True
+    slow_query_threshold_ms: float = 200.0
+    query_trace_max_statements: int = 500
+    query_repeat_warning_threshold: int = 10
+
     # Game settings
     max_collection_distance_meters: float = 10.0
     item_expiration_hours: int = 24
     default_map_radius_meters: float = 100.0
 
+    # In-memory spatial index serving proximity queries
+    item_index_enabled: bool = True
+    item_index_cell_meters: float = 50.0
+    item_index_max_age_seconds: float = 60.0
+    item_index_change_retention: int = 1024
+
+    # Write-behind buffer for PATCH /player/sync
+    location_buffer_enabled: bool = True
+    location_flush_interval_ms: int = 250
+
+    # Procedural item spawning (see map_spawn_settings)
+    item_spawner_enabled: bool = False
+    item_spawner_interval_seconds: float = 10.0
+
+    # Batched deletion of expired unowned items
+    expiry_reaper_enabled: bool = True
+    expiry_reaper_interval_seconds: float = 60.0
+    expiry_reaper_batch_size: int = 500
+
+    # Live map updates over WebSocket
+    live_queue_size: int = 64
+
+    # Read-through cache of player profiles
+    profile_cache_enabled: bool = True
+    profile_cache_max_entries: int = 10000
+    profile_cache_ttl_seconds: float = 30.0
+
+    # In-memory per-map leaderboards, rebuilt from items periodically
+    leaderboard_enabled: bool = True
+    leaderboard_reconcile_interval_seconds: float = 300.0
+
+    # In-memory per-map item statistics and their per-minute history
+    map_stats_enabled: bool = True
+    map_stats_reconcile_interval_seconds: float = 60.0
+    map_stats_history_minutes: int = 360
+
+    # In-memory feed of recent battles, kept in step across workers by NOTIFY
+    battle_feed_enabled: bool = True
+    battle_feed_size: int = 500
+
+    # Cross-worker cache invalidation over NOTIFY (see app.services.change_bus)
+    change_bus_enabled: bool = False
+    change_bus_channel: str = "cache_changes"
+    change_bus_interval_ms: float = 10.0
+
     class Config:
         env_file = ".env"
 
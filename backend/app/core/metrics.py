@@ -0,0 +1,199 @@
+"""
+Request metrics in the Prometheus text format, without a client library.
+
+``MetricsMiddleware`` times every HTTP request and labels it with its route
+template (``/api/player/{player_id}``, never the raw path, so label
+cardinality stays bounded). Database calls made while serving a request add
+their duration to that request through a context variable, so each route's
+latency splits into time spent waiting on Postgres and everything else
+(``http_request_duration_seconds`` minus ``http_request_db_seconds``).
+``GET /metrics`` renders these together with the pool metrics.
+"""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Upper bounds (seconds) of the request latency buckets
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """Fixed-bucket histogram with cumulative counts, as Prometheus exposes them"""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self._counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> dict:
+        """Observations at or below each bound, keyed by bound ("+Inf" last)"""
+        result, total = {}, 0
+        for bound, count in zip(self.buckets + ("+Inf",), self._counts):
+            total += count
+            result[str(bound)] = total
+        return result
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class Exposition:
+    """Builds a Prometheus text exposition"""
+
+    def __init__(self):
+        self._lines: List[str] = []
+
+    def declare(self, name: str, kind: str, help: str):
+        self._lines.append(f"# HELP {name} {help}")
+        self._lines.append(f"# TYPE {name} {kind}")
+
+    def sample(self, name: str, value, **labels):
+        self._lines.append(f"{name}{_labels(labels)} {value}")
+
+    def histogram(self, name: str, histogram: Histogram, **labels):
+        for bound, count in histogram.cumulative().items():
+            self.sample(f"{name}_bucket", count, **labels, le=bound)
+        self.sample(f"{name}_sum", histogram.sum, **labels)
+        self.sample(f"{name}_count", histogram.count, **labels)
+
+    def text(self) -> str:
+        return "\n".join(self._lines) + "\n"
+
+
+class RequestTiming:
+    """Database time accumulated by the request being served"""
+
+    __slots__ = ("db_seconds", "queries", "statements")
+
+    def __init__(self):
+        self.db_seconds = 0.0
+        self.queries = 0
+        # Statement counts, kept by the query tracer when it is enabled
+        self.statements = None
+
+
+current_request: ContextVar[Optional[RequestTiming]] = ContextVar(
+    "current_request", default=None
+)
+
+
+def record_query(seconds: float):
+    """Charge one database call to the request being served, if any"""
+    timing = current_request.get()
+    if timing is not None:
+        timing.db_seconds += seconds
+        timing.queries += 1
+
+
+class HTTPMetrics:
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.requests: Dict[Tuple[str, str, int], int] = {}
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.db_time: Dict[Tuple[str, str], Histogram] = {}
+        self.db_queries: Dict[Tuple[str, str], int] = {}
+        self._listeners: List[Callable] = []
+
+    def add_listener(self, listener: Callable):
+        """Called with (method, route, status, seconds, timing) after each request"""
+        self._listeners.append(listener)
+
+    def observe(self, method: str, route: str, status: int, seconds: float, timing: RequestTiming):
+        key = (method, route)
+        self.requests[(method, route, status)] = self.requests.get((method, route, status), 0) + 1
+        latency = self.latency.get(key)
+        if latency is None:
+            latency = self.latency[key] = Histogram(self.buckets)
+            self.db_time[key] = Histogram(self.buckets)
+            self.db_queries[key] = 0
+        latency.observe(seconds)
+        self.db_time[key].observe(timing.db_seconds)
+        self.db_queries[key] += timing.queries
+        for listener in self._listeners:
+            listener(method, route, status, seconds, timing)
+
+    def collect(self, exposition: Exposition):
+        exposition.declare("http_requests_total", "counter", "HTTP requests by route and status")
+        for (method, route, status), count in sorted(self.requests.items()):
+            exposition.sample(
+                "http_requests_total", count, method=method, route=route, status=status
+            )
+        exposition.declare(
+            "http_request_duration_seconds", "histogram", "Time to serve a request"
+        )
+        for (method, route), histogram in sorted(self.latency.items()):
+            exposition.histogram(
+                "http_request_duration_seconds", histogram, method=method, route=route
+            )
+        exposition.declare(
+            "http_request_db_seconds", "histogram", "Time a request spent in database calls"
+        )
+        for (method, route), histogram in sorted(self.db_time.items()):
+            exposition.histogram(
+                "http_request_db_seconds", histogram, method=method, route=route
+            )
+        exposition.declare(
+            "http_request_db_queries_total", "counter", "Database calls made by requests"
+        )
+        for (method, route), count in sorted(self.db_queries.items()):
+            exposition.sample(
+                "http_request_db_queries_total", count, method=method, route=route
+            )
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so timing adds no extra task or body buffering"""
+
+    def __init__(self, app, metrics: "HTTPMetrics"):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        timing = RequestTiming()
+        token = current_request.set(timing)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+            route = scope.get("route")
+            self.metrics.observe(
+                scope["method"],
+                getattr(route, "path_format", None) or "unmatched",
+                status,
+                time.perf_counter() - started,
+                timing,
+            )
+
+
+http_metrics = HTTPMetrics()
@@ -0,0 +1,242 @@
+"""
+Compact columnar item payloads, negotiated through the ``Accept`` header.
+
+``GET /map/{id}/proximity`` and ``GET /player/{id}/inventory`` answer in
+JSON by default. Clients may instead ask for:
+
+``application/x-msgpack``
+    The packed layout below, encoded with MessagePack. Ids are 16-byte
+    binaries.
+``application/vnd.wizardgo.packed+json``
+    The same layout as JSON, for clients without a MessagePack decoder.
+    Ids are 32-character hex strings.
+
+Packed layout (``v`` = 1), one array per field, all of equal length::
+
+    {
+      "v": 1,
+      "scale": 10000000,        # coordinates are round(degrees * scale)
+      "types": ["Potion", "Gem", "Chest", "Wand", "Scroll"],
+      "subtypes": [str, ...],   # distinct subtypes in this payload
+      "maps": [id, ...],        # distinct map ids in this payload
+      "id": [id, ...],
+      "owner_id": [id | null, ...],
+      "type": [int, ...],       # index into "types"
+      "subtype": [int, ...],    # index into "subtypes"
+      "map": [int | null, ...], # index into "maps"
+      "lat": [int | null, ...], # fixed-point latitude, null without a location
+      "lng": [int | null, ...], # fixed-point longitude
+      "expires_at": [int | null, ...]  # Unix seconds
+    }
+
+At the default scale one unit is about 1 cm, well below GPS accuracy.
+Proximity deltas (``since=``) keep their JSON envelope keys, with ``added``
+packed and ``removed`` as a list of ids. ``unpack_items`` is the reference
+decoder back to the JSON item shape.
+"""
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import msgpack
+from fastapi import Response
+
+from app.core.serialization import FastJSONResponse
+from app.schemas.schemas import ItemType
+
+PACKED_VERSION = 1
+COORDINATE_SCALE = 10_000_000
+TYPES = [item_type.value for item_type in ItemType]
+TYPE_CODES = {name: code for code, name in enumerate(TYPES)}
+
+JSON = "application/json"
+MSGPACK = "application/x-msgpack"
+PACKED_JSON = "application/vnd.wizardgo.packed+json"
+MEDIA_TYPES = (JSON, MSGPACK, PACKED_JSON)
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """Best supported media type for an ``Accept`` header, JSON if none"""
+    if not accept:
+        return JSON
+    best, best_q = JSON, 0.0
+    for part in accept.split(","):
+        media_type, *params = [piece.strip() for piece in part.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type in ("*/*", "application/*"):
+            media_type = JSON
+        # Earlier entries win ties, as clients list what they prefer first
+        if media_type in MEDIA_TYPES and q > best_q:
+            best, best_q = media_type, q
+    return best
+
+
+FIELDS = (
+    "id", "owner_id", "type", "subtype", "map_id", "latitude", "longitude", "expires_at"
+)
+
+
+def _flat(record) -> tuple:
+    if hasattr(record, "keys"):
+        # Dicts and rows, whether from ``databases`` or raw asyncpg
+        return tuple(record[field] for field in FIELDS)
+    return tuple(getattr(record, field, None) for field in FIELDS)
+
+
+def _uuid(value) -> uuid.UUID:
+    return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+
+def _dictionary(values: Iterable) -> Tuple[list, list]:
+    """(distinct values, code per value), None staying None"""
+    codes: Dict[Any, int] = {}
+    encoded = [
+        None if value is None else codes.setdefault(value, len(codes))
+        for value in values
+    ]
+    return list(codes), encoded
+
+
+def pack_items(
+    records: Iterable,
+    binary_ids: bool = True,
+    position: Optional[Tuple[float, float]] = None,
+) -> dict:
+    """
+    Packed layout of item records.
+
+    Records are mappings or objects with ``id``, ``owner_id``, ``type``,
+    ``subtype``, ``map_id``, ``latitude``, ``longitude`` and ``expires_at``
+    (a missing ``owner_id`` attribute reads as None). ``position`` replaces
+    every record's coordinates, e.g. with an owner's buffered location.
+    """
+    rows = [_flat(record) for record in records]
+    if not rows:
+        ids = owners = types = subtypes = map_ids = lats = lngs = expiries = ()
+    else:
+        ids, owners, types, subtypes, map_ids, lats, lngs, expiries = zip(*rows)
+    if position is not None:
+        lats, lngs = (position[0],) * len(rows), (position[1],) * len(rows)
+
+    if binary_ids:
+        encode_id = lambda value: None if value is None else _uuid(value).bytes
+    else:
+        encode_id = lambda value: None if value is None else _uuid(value).hex
+    subtype_names, subtype_codes = _dictionary(subtypes)
+    maps, map_codes = _dictionary(map_ids)
+
+    return {
+        "v": PACKED_VERSION,
+        "scale": COORDINATE_SCALE,
+        "types": TYPES,
+        "subtypes": subtype_names,
+        "maps": [encode_id(map_id) for map_id in maps],
+        "id": [encode_id(item_id) for item_id in ids],
+        "owner_id": [encode_id(owner_id) for owner_id in owners],
+        "type": [TYPE_CODES[getattr(value, "value", value)] for value in types],
+        "subtype": subtype_codes,
+        "map": map_codes,
+        "lat": [None if value is None else round(value * COORDINATE_SCALE) for value in lats],
+        "lng": [None if value is None else round(value * COORDINATE_SCALE) for value in lngs],
+        "expires_at": [
+            None if value is None else int(value.timestamp()) for value in expiries
+        ],
+    }
+
+
+def unpack_items(packed: dict) -> List[dict]:
+    """Items in the JSON wire shape from a packed payload"""
+    if packed["v"] != PACKED_VERSION:
+        raise ValueError(f"Unsupported packed version {packed['v']}")
+
+    def decode_id(value):
+        if value is None:
+            return None
+        return uuid.UUID(bytes=value) if isinstance(value, bytes) else uuid.UUID(hex=value)
+
+    scale = packed["scale"]
+    maps = [decode_id(map_id) for map_id in packed["maps"]]
+    items = []
+    for i, item_id in enumerate(packed["id"]):
+        latitude, longitude = packed["lat"][i], packed["lng"][i]
+        map_index = packed["map"][i]
+        expires_at = packed["expires_at"][i]
+        items.append(
+            {
+                "id": decode_id(item_id),
+                "type": packed["types"][packed["type"][i]],
+                "subtype": packed["subtypes"][packed["subtype"][i]],
+                "owner_id": decode_id(packed["owner_id"][i]),
+                "map_id": None if map_index is None else maps[map_index],
+                "location": (
+                    None
+                    if latitude is None
+                    else {
+                        "type": "Point",
+                        "coordinates": [longitude / scale, latitude / scale],
+                    }
+                ),
+                "expires_at": (
+                    None
+                    if expires_at is None
+                    else datetime.fromtimestamp(expires_at, timezone.utc)
+                ),
+            }
+        )
+    return items
+
+
+class MsgpackResponse(Response):
+    media_type = MSGPACK
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, use_bin_type=True)
+
+
+class PackedJSONResponse(FastJSONResponse):
+    media_type = PACKED_JSON
+
+
+def items_response(
+    media_type: str,
+    records: List,
+    to_item: Callable[[Any], Any],
+    headers: Optional[Dict[str, str]] = None,
+    envelope: Optional[dict] = None,
+    position: Optional[Tuple[float, float]] = None,
+) -> Response:
+    """
+    Item ``records`` in the negotiated format.
+
+    JSON responses hold ``to_item(record)`` for each record; packed ones are
+    built from the records directly. With ``envelope`` the items go under
+    its ``"added"`` key, as in a proximity delta, and the envelope's
+    ``"removed"`` ids are encoded like the item ids.
+    """
+    headers = {**(headers or {}), "Vary": "Accept"}
+    if media_type == JSON:
+        items = [to_item(record) for record in records]
+        content = items if envelope is None else {**envelope, "added": items}
+        return FastJSONResponse(content, headers=headers)
+
+    binary_ids = media_type == MSGPACK
+    content = pack_items(records, binary_ids=binary_ids, position=position)
+    if envelope is not None:
+        removed = [_uuid(item_id) for item_id in envelope["removed"]]
+        content = {
+            **envelope,
+            "added": content,
+            "removed": [
+                item_id.bytes if binary_ids else item_id.hex for item_id in removed
+            ],
+        }
+    if binary_ids:
+        return MsgpackResponse(content, headers=headers)
+    return PackedJSONResponse(content, headers=headers)
@@ -0,0 +1,65 @@
+"""
+Keyset (cursor) pagination over ``(created_at, id)``.
+
+A page ends with the last row's sort key, and the next page starts strictly
+after it, so every page is an index range scan of ``limit`` rows however
+deep it is. The key travels as an opaque URL-safe cursor in the
+``X-Next-Cursor`` response header and comes back as the ``cursor`` query
+parameter; the header is absent on the last page.
+"""
+import base64
+from datetime import datetime
+from typing import Optional, Sequence, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException, status
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+Key = Tuple[datetime, UUID]
+
+
+def encode_cursor(created_at: datetime, row_id) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Key]:
+    """The key a cursor encodes; 400 if it is not one of ours"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.split("|")
+        return datetime.fromisoformat(created_at), UUID(row_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def keyset_values(key: Optional[Key]) -> dict:
+    return {} if key is None else {"cursor_created_at": key[0], "cursor_id": key[1]}
+
+
+def keyset_condition(key: Optional[Key], prefix: str = "") -> str:
+    """``AND`` clause starting a newest-first page after ``key``"""
+    if key is None:
+        return ""
+    return (
+        f"AND ({prefix}created_at, {prefix}id) "
+        "< (:cursor_created_at, CAST(:cursor_id AS uuid))"
+    )
+
+
+def page(rows: Sequence, limit: int) -> Tuple[Sequence, dict]:
+    """
+    Trim rows fetched with ``LIMIT limit + 1`` to one page and build its
+    headers; the extra row only signals that another page exists.
+    """
+    if len(rows) <= limit:
+        return rows, {}
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, {NEXT_CURSOR_HEADER: encode_cursor(last["created_at"], last["id"])}
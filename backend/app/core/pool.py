@@ -0,0 +1,235 @@
+"""
+Instrumented asyncpg pool behind ``databases``.
+
+``InstrumentedDatabase`` is a ``Database`` whose pool acquires with a
+timeout, records how long each acquire waited, counts connections in use,
+waiting and opened/closed, and retires connections older than a maximum
+lifetime. An acquire that times out raises ``PoolExhausted``, which the app
+turns into a 503, so an undersized pool shows up as errors and metrics
+instead of silent tail latency. Every query is also reported to
+``app.core.tracing``, which charges it to the request being served.
+"""
+import asyncio
+import time
+from typing import Optional
+
+from databases import Database
+
+from app.core.metrics import Exposition, Histogram
+from app.core.tracing import trace_query
+
+# Upper bounds (seconds) of the acquire wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class PoolExhausted(Exception):
+    """No pooled connection became free within the acquire timeout"""
+
+
+class PoolMetrics:
+    def __init__(self):
+        self.in_use = 0
+        self.waiters = 0
+        self.acquires = 0
+        self.timeouts = 0
+        self.opened = 0
+        self.closed = 0
+        self.recycles = 0
+        self.wait = Histogram(WAIT_BUCKETS)
+
+    async def on_connect(self, connection):
+        """asyncpg ``init`` hook, run once for every new connection"""
+        self.opened += 1
+        connection.add_termination_listener(self._on_close)
+
+    def _on_close(self, connection):
+        self.closed += 1
+
+
+class InstrumentedPool:
+    """Wraps an asyncpg pool; ``databases`` only calls acquire and release"""
+
+    def __init__(self, pool, metrics: PoolMetrics, acquire_timeout: Optional[float]):
+        self._pool = pool
+        self.metrics = metrics
+        self.acquire_timeout = acquire_timeout
+
+    async def acquire(self):
+        metrics = self.metrics
+        metrics.waiters += 1
+        started = time.perf_counter()
+        try:
+            connection = await self._pool.acquire(timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            metrics.timeouts += 1
+            raise PoolExhausted(
+                f"No database connection free after {self.acquire_timeout}s "
+                f"({self._pool.get_max_size()} in use)"
+            )
+        finally:
+            metrics.waiters -= 1
+            metrics.wait.observe(time.perf_counter() - started)
+        metrics.acquires += 1
+        metrics.in_use += 1
+        return connection
+
+    async def release(self, connection):
+        self.metrics.in_use -= 1
+        return await self._pool.release(connection)
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+
+class InstrumentedDatabase(Database):
+    """
+    ``Database`` with pool settings, metrics and connection recycling.
+
+    ``statement_timeout_ms`` is applied as a server setting on every pooled
+    connection. asyncpg has no age limit for connections, so every
+    ``max_lifetime`` seconds all current connections are marked expired and
+    asyncpg replaces each one the next time it is released or acquired.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        min_size: int = 2,
+        max_size: int = 10,
+        acquire_timeout: Optional[float] = 10.0,
+        statement_timeout_ms: int = 0,
+        max_lifetime: Optional[float] = None,
+        max_idle: float = 300.0,
+        statement_cache_size: int = 100,
+    ):
+        self.metrics = PoolMetrics()
+        self.acquire_timeout = acquire_timeout
+        self.max_lifetime = max_lifetime
+        super().__init__(
+            url,
+            min_size=min_size,
+            max_size=max_size,
+            max_inactive_connection_lifetime=max_idle,
+            statement_cache_size=statement_cache_size,
+            server_settings={"statement_timeout": str(statement_timeout_ms)},
+            init=self.metrics.on_connect,
+        )
+        self._recycler: Optional[asyncio.Task] = None
+
+    @property
+    def pool(self) -> Optional[InstrumentedPool]:
+        return self._backend._pool
+
+    async def connect(self):
+        await super().connect()
+        backend = self._backend
+        if backend._pool is not None and not isinstance(backend._pool, InstrumentedPool):
+            backend._pool = InstrumentedPool(backend._pool, self.metrics, self.acquire_timeout)
+        if self.max_lifetime and self._recycler is None:
+            self._recycler = asyncio.create_task(self._recycle())
+
+    async def disconnect(self):
+        if self._recycler is not None:
+            self._recycler.cancel()
+            try:
+                await self._recycler
+            except asyncio.CancelledError:
+                pass
+            self._recycler = None
+        await super().disconnect()
+
+    async def fetch_all(self, query, values=None):
+        started = time.perf_counter()
+        rows = None
+        try:
+            result = await super().fetch_all(query, values)
+            rows = len(result)
+            return result
+        finally:
+            trace_query(query, values, time.perf_counter() - started, rows)
+
+    async def fetch_one(self, query, values=None):
+        started = time.perf_counter()
+        rows = None
+        try:
+            result = await super().fetch_one(query, values)
+            rows = 0 if result is None else 1
+            return result
+        finally:
+            trace_query(query, values, time.perf_counter() - started, rows)
+
+    async def fetch_val(self, query, values=None, column=0):
+        started = time.perf_counter()
+        try:
+            return await super().fetch_val(query, values, column)
+        finally:
+            trace_query(query, values, time.perf_counter() - started)
+
+    async def execute(self, query, values=None):
+        started = time.perf_counter()
+        try:
+            return await super().execute(query, values)
+        finally:
+            trace_query(query, values, time.perf_counter() - started)
+
+    async def execute_many(self, query, values):
+        started = time.perf_counter()
+        try:
+            return await super().execute_many(query, values)
+        finally:
+            trace_query(query, values[0] if values else None, time.perf_counter() - started)
+
+    async def _recycle(self):
+        while True:
+            await asyncio.sleep(self.max_lifetime)
+            pool = self.pool
+            if pool is not None:
+                await pool.expire_connections()
+                self.metrics.recycles += 1
+
+    def pool_stats(self) -> dict:
+        metrics = self.metrics
+        pool = self.pool
+        connected = pool is not None
+        return {
+            "size": pool.get_size() if connected else 0,
+            "min_size": pool.get_min_size() if connected else 0,
+            "max_size": pool.get_max_size() if connected else 0,
+            "in_use": metrics.in_use,
+            "idle": pool.get_idle_size() if connected else 0,
+            "waiters": metrics.waiters,
+            "acquires": metrics.acquires,
+            "acquire_timeouts": metrics.timeouts,
+            "connections_opened": metrics.opened,
+            "connections_closed": metrics.closed,
+            "recycles": metrics.recycles,
+            "acquire_wait_seconds": {
+                "count": metrics.wait.count,
+                "sum": metrics.wait.sum,
+                "buckets": metrics.wait.cumulative(),
+            },
+        }
+
+    def collect_metrics(self, exposition: Exposition):
+        stats = self.pool_stats()
+        for name, key, help in (
+            ("db_pool_size", "size", "Open pooled connections"),
+            ("db_pool_max_size", "max_size", "Most connections the pool may open"),
+            ("db_pool_in_use", "in_use", "Connections checked out"),
+            ("db_pool_idle", "idle", "Connections open and free"),
+            ("db_pool_waiters", "waiters", "Callers waiting for a connection"),
+        ):
+            exposition.declare(name, "gauge", help)
+            exposition.sample(name, stats[key])
+        for name, key, help in (
+            ("db_pool_acquires_total", "acquires", "Connections handed out"),
+            ("db_pool_acquire_timeouts_total", "acquire_timeouts", "Acquires that timed out"),
+            ("db_pool_connections_opened_total", "connections_opened", "Connections opened"),
+            ("db_pool_connections_closed_total", "connections_closed", "Connections closed"),
+        ):
+            exposition.declare(name, "counter", help)
+            exposition.sample(name, stats[key])
+        exposition.declare(
+            "db_pool_acquire_wait_seconds", "histogram", "Time spent waiting for a connection"
+        )
+        exposition.histogram("db_pool_acquire_wait_seconds", self.metrics.wait)
@@ -0,0 +1,118 @@
+"""
+Fast path from trusted database rows to JSON responses.
+
+Queries select raw ``latitude``/``longitude`` columns (see
+``coordinate_columns``) instead of ``ST_AsGeoJSON`` text, rows become
+response models through ``model_construct`` without re-validation, and
+``FastJSONResponse`` encodes them with orjson. Routes keep their
+``response_model`` for the OpenAPI schema but return the response directly,
+so FastAPI does not validate and serialize them a second time.
+"""
+from typing import Any, Mapping, Optional, Tuple
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from app.schemas.schemas import BattleLog, Item, Profile
+
+# Decimal places ST_AsGeoJSON keeps, so coordinates serialize as they used to
+COORDINATE_PRECISION = 9
+
+Position = Tuple[float, float]
+
+
+def coordinate_columns(column: str = "location") -> str:
+    """SELECT list fragment giving a geometry column's ``latitude``/``longitude``"""
+    return (
+        f"ST_Y({column}::geometry) as latitude, "
+        f"ST_X({column}::geometry) as longitude"
+    )
+
+
+def point(latitude: Optional[float], longitude: Optional[float]) -> Optional[dict]:
+    """GeoJSON Point for a coordinate pair, or None when there is no position"""
+    if latitude is None or longitude is None:
+        return None
+    return {
+        "type": "Point",
+        "coordinates": [
+            round(longitude, COORDINATE_PRECISION),
+            round(latitude, COORDINATE_PRECISION),
+        ],
+    }
+
+
+def _location(row: Mapping, position: Optional[Position]) -> Optional[dict]:
+    if position is not None:
+        return point(*position)
+    return point(row["latitude"], row["longitude"])
+
+
+def item_from_row(row: Mapping, position: Optional[Position] = None) -> Item:
+    """
+    Item from a row selecting its columns and ``coordinate_columns``.
+
+    ``position`` replaces the row's coordinates, e.g. with an owner's
+    buffered location.
+    """
+    return Item.model_construct(
+        id=row["id"],
+        type=row["type"],
+        subtype=row["subtype"],
+        owner_id=row["owner_id"],
+        map_id=row["map_id"],
+        location=_location(row, position),
+        expires_at=row["expires_at"],
+    )
+
+
+def profile_from_row(row: Mapping, position: Optional[Position] = None) -> Profile:
+    return Profile.model_construct(
+        id=row["id"],
+        name=row["name"],
+        description=row["description"],
+        level=row["level"],
+        wins=row["wins"],
+        losses=row["losses"],
+        gems=row["gems"],
+        location=_location(row, position),
+    )
+
+
+def battle_log_from_row(row: Mapping) -> BattleLog:
+    return BattleLog.model_construct(
+        id=row["id"],
+        attacker_id=row["attacker_id"],
+        defender_id=row["defender_id"],
+        winner_id=row["winner_id"],
+        created_at=row["created_at"],
+    )
+
+
+def _default(value: Any):
+    if isinstance(value, BaseModel):
+        # Field values live in __dict__; iterating the model is far slower
+        return value.__dict__
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response encoded by orjson.
+
+    UTC datetimes end in ``Z`` as Pydantic writes them. Use
+    ``IsoJSONResponse`` for routes without a ``response_model``, whose
+    datetimes FastAPI has always written with a ``+00:00`` offset.
+    """
+
+    option = orjson.OPT_UTC_Z
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=self.option)
+
+
+class IsoJSONResponse(FastJSONResponse):
+    option = 0
@@ -0,0 +1,124 @@
+"""
+Named statements for the hot SQL paths.
+
+A statement is declared once, by name, with the same ``:name`` parameters
+as any other query. At declaration it is rewritten to asyncpg's positional
+``$n`` form, and at run time it executes directly on the pooled asyncpg
+connection. asyncpg prepares a statement on each connection the first time
+it runs there and reuses the server-side prepared statement afterwards,
+binding arguments in binary against the parameter types Postgres inferred.
+A call therefore costs no SQLAlchemy compilation and no ``databases`` row
+wrapping, and the statement cache is sized (``db_statement_cache_size``) so
+the ad hoc queries still sent as plain text through ``database.fetch_*``
+cannot evict these.
+
+With ``prepared_statements_enabled`` off, or against anything other than a
+``databases.Database`` (such as the test doubles services are given), the
+same names run as plain text through ``fetch_*``/``execute``.
+``benchmarks/statements.py`` compares the two modes.
+"""
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from databases import Database
+
+from app.core.config import settings
+from app.core.tracing import rows_affected, trace_query
+from app.database import database
+
+# ``:name`` but not the second colon of a ``::type`` cast
+_PARAMETER = re.compile(r"(?<![:\w]):([A-Za-z_]\w*)")
+
+
+class Statement:
+    __slots__ = ("name", "sql", "positional", "parameters")
+
+    def __init__(self, name: str, sql: str):
+        self.name = name
+        self.sql = sql
+        parameters: List[str] = []
+
+        def number(match) -> str:
+            parameter = match.group(1)
+            if parameter not in parameters:
+                parameters.append(parameter)
+            return f"${parameters.index(parameter) + 1}"
+
+        self.positional = _PARAMETER.sub(number, sql)
+        self.parameters: Tuple[str, ...] = tuple(parameters)
+
+    def arguments(self, values: Optional[Dict[str, Any]]) -> list:
+        values = values or {}
+        missing = [name for name in self.parameters if name not in values]
+        unexpected = [name for name in values if name not in self.parameters]
+        if missing or unexpected:
+            raise TypeError(
+                f"Statement {self.name!r} expects {list(self.parameters)}; "
+                f"missing {missing}, unexpected {unexpected}"
+            )
+        return [values[name] for name in self.parameters]
+
+
+class StatementRegistry:
+    def __init__(self, db: Database, enabled: bool = True, statements=None):
+        self.db = db
+        self.enabled = enabled
+        self._statements: Dict[str, Statement] = {} if statements is None else statements
+
+    def declare(self, name: str, sql: str) -> Statement:
+        existing = self._statements.get(name)
+        if existing is not None and existing.sql != sql:
+            raise ValueError(f"Statement {name!r} is already declared differently")
+        statement = Statement(name, sql)
+        self._statements[name] = statement
+        return statement
+
+    def __getitem__(self, name: str) -> Statement:
+        return self._statements[name]
+
+    def names(self) -> List[str]:
+        return sorted(self._statements)
+
+    def using(self, db: Database, enabled: Optional[bool] = None) -> "StatementRegistry":
+        """The same declarations run against another database, e.g. in benchmarks"""
+        return StatementRegistry(
+            db, self.enabled if enabled is None else enabled, self._statements
+        )
+
+    async def fetch_all(self, name: str, values: Optional[dict] = None) -> List:
+        return await self._run(name, values, "fetch_all", "fetch")
+
+    async def fetch_one(self, name: str, values: Optional[dict] = None):
+        return await self._run(name, values, "fetch_one", "fetchrow")
+
+    async def fetch_val(self, name: str, values: Optional[dict] = None):
+        return await self._run(name, values, "fetch_val", "fetchval")
+
+    async def execute(self, name: str, values: Optional[dict] = None):
+        return await self._run(name, values, "execute", "execute")
+
+    async def _run(self, name: str, values: Optional[dict], text_method: str, method: str):
+        statement = self._statements[name]
+        arguments = statement.arguments(values)
+        if not self.enabled or not isinstance(self.db, Database):
+            return await getattr(self.db, text_method)(statement.sql, values)
+        started = time.perf_counter()
+        rows = None
+        try:
+            # Inside a transaction this is the transaction's connection
+            async with self.db.connection() as connection:
+                raw = connection.raw_connection
+                result = await getattr(raw, method)(statement.positional, *arguments)
+            if method == "fetch":
+                rows = len(result)
+            elif method == "fetchrow":
+                rows = 0 if result is None else 1
+            elif method == "execute":
+                rows = rows_affected(result)
+            return result
+        finally:
+            trace_query(statement.sql, values, time.perf_counter() - started, rows)
+
+
+statements = StatementRegistry(database, enabled=settings.prepared_statements_enabled)
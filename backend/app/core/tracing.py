@@ -0,0 +1,198 @@
+"""
+Query statistics, per-request query traces and a slow-query log.
+
+Every call through ``database`` and every prepared statement is reported to
+``trace_query`` with its SQL, parameter count, duration and row count (when
+the driver reports one). Statements are grouped by normalized text, with
+whitespace collapsed and literals replaced by ``?``, so f-string queries
+that differ only in embedded values share one entry. Only normalized text
+is ever logged or served, never parameter values.
+
+Each request also keeps a count of the statements it ran. When a request
+finishes, its route's totals are updated, and a statement repeated
+``repeat_threshold`` times or more in one request is logged as a likely
+N+1. ``GET /diagnostics/queries`` lists the top statements by total time
+and the queries issued per route.
+"""
+import logging
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import RequestTiming, current_request, http_metrics, record_query
+
+logger = logging.getLogger(__name__)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+# Statements past the cap are pooled here rather than growing without bound
+OTHER = "(other statements)"
+
+
+def normalize(query: str) -> str:
+    return _WHITESPACE.sub(" ", _LITERALS.sub("?", query)).strip()
+
+
+class StatementStats:
+    __slots__ = ("query", "parameters", "calls", "total", "max", "rows")
+
+    def __init__(self, query: str, parameters: int):
+        self.query = query
+        self.parameters = parameters
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "query": self.query,
+            "parameters": self.parameters,
+            "calls": self.calls,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total * 1000 / self.calls, 3) if self.calls else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+            "rows": self.rows,
+        }
+
+
+class RouteQueries:
+    __slots__ = ("requests", "queries", "max_queries", "repeats")
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.repeats = 0
+
+
+class QueryTracer:
+    def __init__(
+        self,
+        enabled: bool = True,
+        slow_threshold_ms: float = 200.0,
+        max_statements: int = 500,
+        repeat_threshold: int = 10,
+    ):
+        self.enabled = enabled
+        self.slow_threshold = slow_threshold_ms / 1000
+        self.max_statements = max_statements
+        self.repeat_threshold = repeat_threshold
+        self.slow_queries = 0
+        self._normalized: Dict[str, str] = {}
+        self._statements: Dict[str, StatementStats] = {}
+        self._routes: Dict[Tuple[str, str], RouteQueries] = {}
+
+    def _normalize(self, query: str) -> str:
+        normalized = self._normalized.get(query)
+        if normalized is None:
+            if len(self._normalized) >= self.max_statements * 4:
+                # Ad hoc text with embedded values would otherwise pile up
+                self._normalized.clear()
+            normalized = self._normalized[query] = normalize(query)
+        return normalized
+
+    def record(self, query: str, parameters: int, seconds: float, rows: Optional[int]):
+        if not self.enabled:
+            return
+        normalized = self._normalize(query)
+        stats = self._statements.get(normalized)
+        if stats is None:
+            if len(self._statements) >= self.max_statements:
+                normalized = OTHER
+                stats = self._statements.get(OTHER)
+            if stats is None:
+                stats = self._statements[normalized] = StatementStats(normalized, parameters)
+        stats.calls += 1
+        stats.total += seconds
+        if seconds > stats.max:
+            stats.max = seconds
+        if rows:
+            stats.rows += rows
+
+        timing = current_request.get()
+        if timing is not None:
+            if timing.statements is None:
+                timing.statements = Counter()
+            timing.statements[normalized] += 1
+
+        if seconds >= self.slow_threshold:
+            self.slow_queries += 1
+            logger.warning(
+                "Slow query: %.1f ms, %s rows, %d parameters: %s",
+                seconds * 1000,
+                "?" if rows is None else rows,
+                parameters,
+                normalized,
+            )
+
+    def finish_request(self, method: str, route: str, status: int, seconds: float, timing: RequestTiming):
+        """Fold a finished request's trace into its route's totals"""
+        if not self.enabled:
+            return
+        key = (method, route)
+        totals = self._routes.get(key)
+        if totals is None:
+            totals = self._routes[key] = RouteQueries()
+        totals.requests += 1
+        totals.queries += timing.queries
+        totals.max_queries = max(totals.max_queries, timing.queries)
+        if timing.statements:
+            query, count = timing.statements.most_common(1)[0]
+            if count >= self.repeat_threshold:
+                totals.repeats += 1
+                logger.warning(
+                    "%s %s ran one statement %d times (%d queries in total): %s",
+                    method, route, count, timing.queries, query,
+                )
+
+    def top(self, limit: int = 20) -> List[dict]:
+        ranked = sorted(self._statements.values(), key=lambda s: s.total, reverse=True)
+        return [stats.to_dict() for stats in ranked[:limit]]
+
+    def routes(self) -> List[dict]:
+        return [
+            {
+                "method": method,
+                "route": route,
+                "requests": totals.requests,
+                "queries": totals.queries,
+                "mean_queries": round(totals.queries / totals.requests, 2),
+                "max_queries": totals.max_queries,
+                "repeated_statement_requests": totals.repeats,
+            }
+            for (method, route), totals in sorted(
+                self._routes.items(), key=lambda item: item[1].queries, reverse=True
+            )
+        ]
+
+    def reset(self):
+        self.slow_queries = 0
+        self._statements.clear()
+        self._routes.clear()
+
+
+def rows_affected(status) -> Optional[int]:
+    """Row count from an asyncpg command status such as ``UPDATE 3``"""
+    if isinstance(status, str):
+        tail = status.rsplit(" ", 1)[-1]
+        if tail.isdigit():
+            return int(tail)
+    return None
+
+
+def trace_query(query, values: Optional[dict], seconds: float, rows: Optional[int] = None):
+    """Account one database call to metrics and the tracer"""
+    record_query(seconds)
+    query_tracer.record(str(query), len(values) if values else 0, seconds, rows)
+
+
+query_tracer = QueryTracer(
+    enabled=settings.query_tracing_enabled,
+    slow_threshold_ms=settings.slow_query_threshold_ms,
+    max_statements=settings.query_trace_max_statements,
+    repeat_threshold=settings.query_repeat_warning_threshold,
+)
+http_metrics.add_listener(query_tracer.finish_request)
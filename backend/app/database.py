@@ -1,11 +1,18 @@
-from databases import Database
-from sqlalchemy import MetaData, create_engine
+from sqlalchemy import MetaData
 
 from app.core.config import settings
+from app.core.pool import InstrumentedDatabase
 
 DATABASE_URL = settings.database_url.replace("postgres://", "postgresql://", 1)
 
-database = Database(DATABASE_URL)
+database = InstrumentedDatabase(
+    DATABASE_URL,
+    min_size=settings.db_pool_min_size,
+    max_size=settings.db_pool_max_size,
+    acquire_timeout=settings.db_pool_acquire_timeout_seconds,
+    statement_timeout_ms=settings.db_statement_timeout_ms,
+    max_lifetime=settings.db_connection_max_lifetime_seconds,
+    max_idle=settings.db_connection_max_idle_seconds,
+    statement_cache_size=settings.db_statement_cache_size,
+)
 metadata = MetaData()
-
-engine = create_engine(DATABASE_URL)
@@ -1 +1 @@
-from . import auth, battles, items, maps, players, institution
\ No newline at end of file
+from . import auth, battles, diagnostics, items, live, maps, players, institution
\ No newline at end of file
@@ -1,8 +1,15 @@
 from typing import Dict, Any
 from fastapi import APIRouter, HTTPException, status
+from app.core.serialization import FastJSONResponse, coordinate_columns, profile_from_row
+from app.core.statements import statements
 from app.schemas.schemas import Profile, ProfileCreate
 from app.database import database
-import json
+from app.services.game_engine import game_engine
+from app.services.change_bus import MAP, PROFILE, change_bus
+from app.services.leaderboard import leaderboard
+from app.services.location_buffer import location_buffer
+from app.services.map_stats import map_stats
+from app.services.profile_cache import profile_cache
 import uuid
 
 router = APIRouter()
@@ -10,31 +17,46 @@ router = APIRouter()
 # Fixed guest user UUID - this matches the one in the SQL
 GUEST_USER_ID = "00000000-0000-0000-0000-000000000001"
 
+statements.declare(
+    "profile_by_name",
+    f"""
+    SELECT id, name, description, level, wins, losses, gems,
+           {coordinate_columns()}
+    FROM profiles
+    WHERE name = :name
+    """,
+)
+
 @router.get("/guest/login", response_model=Profile)
 async def guest_login():
     """
     Returns the universal guest user profile.
     This allows users to try the app without registration.
     """
-    query = """
+    query = f"""
     SELECT id, name, description, level, wins, losses, gems,
-           ST_AsGeoJSON(location) as location
+           {coordinate_columns()}
     FROM profiles
     WHERE id = :guest_id
     """
     
     from app.database import database
+    cached = profile_cache.get(GUEST_USER_ID)
+    if cached:
+        return FastJSONResponse(profile_from_row(cached))
+
+    version = profile_cache.version
     result = await database.fetch_one(query, {"guest_id": GUEST_USER_ID})
     
     if not result:
         # Fallback: create guest user if not exists
-        create_query = """
+        create_query = f"""
         INSERT INTO profiles (id, name, description, level, wins, losses, gems, location)
         VALUES (:id, :name, :description, :level, :wins, :losses, :gems, 
                 ST_SetSRID(ST_MakePoint(:lng, :lat), 4326))
         ON CONFLICT (id) DO NOTHING
         RETURNING id, name, description, level, wins, losses, gems,
-                  ST_AsGeoJSON(location) as location
+                  {coordinate_columns()}
         """
         
         result = await database.fetch_one(create_query, {
@@ -52,25 +74,7 @@ async def guest_login():
     if not result:
         raise HTTPException(status_code=500, detail="Failed to create guest user")
     
-    # Parse location from GeoJSON
-    location = None
-    if result["location"]:
-        location_data = json.loads(result["location"])
-        location = {
-            "type": location_data["type"],
-            "coordinates": location_data["coordinates"],
-        }
-    
-    return Profile(
-        id=result["id"],
-        name=result["name"],
-        description=result["description"],
-        level=result["level"],
-        wins=result["wins"],
-        losses=result["losses"],
-        gems=result["gems"],
-        location=location,
-    )
+    return FastJSONResponse(profile_from_row(profile_cache.put(result, version)))
 
 @router.post("/user/login", response_model=Profile)
 async def user_login(user_data: Dict[str, str]):
@@ -82,24 +86,22 @@ async def user_login(user_data: Dict[str, str]):
     if not wizard_name:
         raise HTTPException(status_code=400, detail="Wizard name is required")
     
+    cached = profile_cache.get_by_name(wizard_name)
+    if cached:
+        return FastJSONResponse(profile_from_row(cached))
+
+    version = profile_cache.version
     # Try to find existing user
-    query = """
-    SELECT id, name, description, level, wins, losses, gems,
-           ST_AsGeoJSON(location) as location
-    FROM profiles
-    WHERE name = :name
-    """
-    
-    result = await database.fetch_one(query, {"name": wizard_name})
+    result = await statements.fetch_one("profile_by_name", {"name": wizard_name})
     
     if not result:
         # Create new user
-        create_query = """
+        create_query = f"""
         INSERT INTO profiles (id, name, description, level, wins, losses, gems, location)
         VALUES (:id, :name, :description, :level, :wins, :losses, :gems, 
                 ST_SetSRID(ST_MakePoint(:lng, :lat), 4326))
         RETURNING id, name, description, level, wins, losses, gems,
-                  ST_AsGeoJSON(location) as location
+                  {coordinate_columns()}
         """
         
         result = await database.fetch_one(create_query, {
@@ -117,25 +119,7 @@ async def user_login(user_data: Dict[str, str]):
     if not result:
         raise HTTPException(status_code=500, detail="Failed to create or retrieve user")
     
-    # Parse location from GeoJSON
-    location = None
-    if result["location"]:
-        location_data = json.loads(result["location"])
-        location = {
-            "type": location_data["type"],
-            "coordinates": location_data["coordinates"],
-        }
-    
-    return Profile(
-        id=result["id"],
-        name=result["name"],
-        description=result["description"],
-        level=result["level"],
-        wins=result["wins"],
-        losses=result["losses"],
-        gems=result["gems"],
-        location=location,
-    )
+    return FastJSONResponse(profile_from_row(profile_cache.put(result, version)))
 
 @router.post("/guest/reset")
 async def reset_guest_data():
@@ -151,13 +135,25 @@ async def reset_guest_data():
     """
     
     from app.database import database
+    # Write and drop the engine's state first so its journal cannot undo the reset
+    await game_engine.forget(GUEST_USER_ID)
     await database.execute(query, {"guest_id": GUEST_USER_ID})
+    # A buffered fix must not overwrite the reset position on its next flush
+    location_buffer.forget(uuid.UUID(GUEST_USER_ID))
+    profile_cache.invalidate(GUEST_USER_ID)
     
     # Reset inventory - remove current items and give starter items
     delete_items_query = """
     DELETE FROM items WHERE owner_id = :guest_id
+    RETURNING map_id, expires_at
     """
-    await database.execute(delete_items_query, {"guest_id": GUEST_USER_ID})
+    deleted = await database.fetch_all(delete_items_query, {"guest_id": GUEST_USER_ID})
+    leaderboard.forget_player(GUEST_USER_ID)
+    change_bus.publish(PROFILE, GUEST_USER_ID)
+    for item in deleted:
+        map_stats.removed(item["map_id"], GUEST_USER_ID, item["expires_at"])
+        if item["map_id"] is not None:
+            change_bus.publish(MAP, map_id=item["map_id"])
     
     # Give starter items
     starter_items = [
@@ -166,18 +162,21 @@ async def reset_guest_data():
         ("00000000-0000-0000-0000-000000000103", "Gem", "Focus Crystal"),
     ]
     
-    for item_id, item_type, subtype in starter_items:
-        insert_query = """
-        INSERT INTO items (id, type, subtype, owner_id, location, expires_at)
-        VALUES (:id, :type, :subtype, :owner_id, 
-                ST_SetSRID(ST_MakePoint(-83.3753, 33.9510), 4326), NULL)
-        ON CONFLICT (id) DO NOTHING
-        """
-        await database.execute(insert_query, {
-            "id": item_id,
-            "type": item_type,
-            "subtype": subtype,
-            "owner_id": GUEST_USER_ID
-        })
+    insert_query = """
+    INSERT INTO items (id, type, subtype, owner_id, location, expires_at)
+    SELECT id, type, subtype, CAST(:owner_id AS uuid), NULL, NULL
+    FROM unnest(
+        CAST(:ids AS uuid[]),
+        CAST(:types AS text[]),
+        CAST(:subtypes AS text[])
+    ) AS starter(id, type, subtype)
+    ON CONFLICT (id) DO NOTHING
+    """
+    await database.execute(insert_query, {
+        "ids": [item_id for item_id, _, _ in starter_items],
+        "types": [item_type for _, item_type, _ in starter_items],
+        "subtypes": [subtype for _, _, subtype in starter_items],
+        "owner_id": GUEST_USER_ID
+    })
     
     return {"status": "reset", "message": "Guest data reset to defaults"}
\ No newline at end of file
@@ -1,91 +1,163 @@
-from fastapi import APIRouter, HTTPException, status
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, status
+from typing import List, Optional
 from uuid import UUID
-from datetime import datetime
+from datetime import datetime, timezone
 
+from app.core.pagination import decode_cursor, keyset_condition, keyset_values, page
+from app.core.serialization import FastJSONResponse, IsoJSONResponse, battle_log_from_row
 from app.database import database
-from app.schemas.schemas import BattleReport, BattleLog
+from app.schemas.schemas import BattleLog, BattleReport, BattleReportBatch
+from app.services.battle_feed import battle_feed, feed_entry
+from app.services.battle_service import BattleService, MissingPlayers
+from app.services.change_bus import PROFILE, change_bus
+from app.services.game_engine import game_engine
+from app.services.leaderboard import leaderboard
+from app.services.profile_cache import profile_cache
 
 router = APIRouter()
 
 
 @router.post("/battle/report")
 async def report_battle(battle_data: BattleReport):
-    # Validate that all players exist
-    players_query = """
-    SELECT id, name FROM profiles 
-    WHERE id IN (:attacker_id, :defender_id, :winner_id)
-    """
-    
-    results = await database.fetch_all(players_query, {
-        "attacker_id": battle_data.attacker_id,
-        "defender_id": battle_data.defender_id,
-        "winner_id": battle_data.winner_id
-    })
-    
-    if len(results) != 3:
+    validate_battle(battle_data)
+
+    if game_engine.enabled:
+        players = await game_engine.report(
+            battle_data.attacker_id, battle_data.defender_id, battle_data.winner_id
+        )
+    else:
+        # Player check, battle log and both stat updates are one statement
+        players = await BattleService(database).report(
+            battle_data.attacker_id, battle_data.defender_id, battle_data.winner_id
+        )
+    if not players:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="One or more players not found"
         )
-    
-    # Validate that winner is either attacker or defender
+
+    apply_player_stats(players)
+    battle = players[0]
+    await battle_feed.publish([
+        feed_entry(
+            battle["battle_id"],
+            battle["battle_created_at"],
+            battle_data.attacker_id,
+            battle_data.defender_id,
+            battle_data.winner_id,
+            {player["id"]: player["name"] for player in players},
+        )
+    ])
+    return {"status": "recorded", "battle_id": battle["battle_id"]}
+
+
+@router.post("/battle/report/batch")
+async def report_battles(batch: BattleReportBatch):
+    """
+    Record many battles at once, e.g. a tournament or fights synced after
+    the fact. All battles are applied in one transaction or none are.
+    """
+    for index, battle in enumerate(batch.battles):
+        validate_battle(battle, index)
+
+    try:
+        service = game_engine if game_engine.enabled else BattleService(database)
+        result = await service.report_batch(batch.battles)
+    except MissingPlayers as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Players not found: {', '.join(map(str, e.player_ids))}"
+        )
+
+    apply_player_stats(result["players"])
+    names = {player["id"]: player["name"] for player in result["players"]}
+    await battle_feed.publish([
+        feed_entry(
+            battle_id, created_at, battle.attacker_id, battle.defender_id, battle.winner_id, names
+        )
+        for battle_id, created_at, battle in zip(
+            result["battle_ids"], result["created_at"], batch.battles
+        )
+    ])
+    return {
+        "status": "recorded",
+        "count": len(result["battle_ids"]),
+        "battle_ids": result["battle_ids"],
+    }
+
+
+def validate_battle(battle_data: BattleReport, index: Optional[int] = None):
+    where = "" if index is None else f"Battle {index}: "
+    if battle_data.attacker_id == battle_data.defender_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{where}Attacker and defender must be different players"
+        )
     if battle_data.winner_id not in [battle_data.attacker_id, battle_data.defender_id]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Winner must be either attacker or defender"
+            detail=f"{where}Winner must be either attacker or defender"
         )
-    
-    # Record the battle
-    insert_query = """
-    INSERT INTO battle_logs (attacker_id, defender_id, winner_id, created_at)
-    VALUES (:attacker_id, :defender_id, :winner_id, NOW())
-    RETURNING id
-    """
-    
-    result = await database.fetch_one(insert_query, {
-        "attacker_id": battle_data.attacker_id,
-        "defender_id": battle_data.defender_id,
-        "winner_id": battle_data.winner_id
-    })
-    
-    # Update player stats
-    await update_player_stats(battle_data)
-    
-    return {"status": "recorded", "battle_id": result["id"]}
 
 
-@router.get("/player/{player_id}/battles", response_model=List[BattleLog])
-async def get_player_battles(player_id: UUID, limit: int = 50):
-    query = """
+def apply_player_stats(players):
+    """Propagate updated player rows to the in-memory caches"""
+    profile_cache.invalidate(*(player["id"] for player in players))
+    for player in players:
+        leaderboard.update_player(player)
+        change_bus.publish(PROFILE, player["id"])
+
+
+def player_battles_query(key) -> str:
+    """A page of one player's battles, after ``key`` if given"""
+    after = keyset_condition(key)
+    # One keyset-limited scan per side instead of an OR the planner cannot
+    # walk in order; the defender side skips rows the attacker side has
+    side = """
+        SELECT id, attacker_id, defender_id, winner_id, created_at
+        FROM battle_logs
+        WHERE {condition} {after}
+        ORDER BY created_at DESC, id DESC
+        LIMIT :limit
+    """
+    return f"""
     SELECT id, attacker_id, defender_id, winner_id, created_at
-    FROM battle_logs 
-    WHERE attacker_id = :player_id OR defender_id = :player_id
-    ORDER BY created_at DESC
+    FROM (
+        ({side.format(condition="attacker_id = :player_id", after=after)})
+        UNION ALL
+        ({side.format(condition="defender_id = :player_id AND attacker_id <> :player_id", after=after)})
+    ) battles
+    ORDER BY created_at DESC, id DESC
     LIMIT :limit
     """
-    
-    results = await database.fetch_all(query, {
+
+
+@router.get("/player/{player_id}/battles", response_model=List[BattleLog])
+async def get_player_battles(
+    player_id: UUID,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+):
+    """
+    A player's battles, newest first. Pass the ``X-Next-Cursor`` response
+    header back as ``cursor`` for the next page.
+    """
+    key = decode_cursor(cursor)
+    results = await database.fetch_all(player_battles_query(key), {
         "player_id": player_id,
-        "limit": limit
+        "limit": limit + 1,
+        **keyset_values(key),
     })
-    
-    battles = []
-    for result in results:
-        battles.append(BattleLog(
-            id=result["id"],
-            attacker_id=result["attacker_id"],
-            defender_id=result["defender_id"],
-            winner_id=result["winner_id"],
-            created_at=result["created_at"]
-        ))
-    
-    return battles
+    results, headers = page(results, limit)
 
+    return FastJSONResponse(
+        [battle_log_from_row(result) for result in results], headers=headers
+    )
 
-@router.get("/battle/recent")
-async def get_recent_battles(limit: int = 20):
-    query = """
+
+def recent_battles_query(key, since: bool) -> str:
+    """A page of everyone's battles, after ``key`` and newer than ``:since`` if given"""
+    return f"""
     SELECT bl.id, bl.attacker_id, bl.defender_id, bl.winner_id, bl.created_at,
            p1.name as attacker_name,
            p2.name as defender_name,
@@ -94,37 +166,38 @@ async def get_recent_battles(limit: int = 20):
     LEFT JOIN profiles p1 ON bl.attacker_id = p1.id
     LEFT JOIN profiles p2 ON bl.defender_id = p2.id
     LEFT JOIN profiles p3 ON bl.winner_id = p3.id
-    ORDER BY bl.created_at DESC
+    WHERE TRUE {keyset_condition(key, prefix="bl.")}
+    {"AND bl.created_at > :since" if since else ""}
+    ORDER BY bl.created_at DESC, bl.id DESC
     LIMIT :limit
     """
-    
-    return await database.fetch_all(query, {"limit": limit})
-
-
-async def update_player_stats(battle_data: BattleReport):
-    """Update player wins and losses after a battle"""
-    
-    # Update winner
-    winner_update = """
-    UPDATE profiles 
-    SET wins = wins + 1,
-        level = CASE 
-            WHEN (wins + 1) % 3 = 0 THEN level + 1 
-            ELSE level 
-        END
-    WHERE id = :winner_id
+
+
+@router.get("/battle/recent")
+async def get_recent_battles(
+    limit: int = Query(20, ge=1, le=200),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+):
     """
-    
-    await database.execute(winner_update, {"winner_id": battle_data.winner_id})
-    
-    # Update loser
-    loser_id = (battle_data.defender_id if battle_data.winner_id == battle_data.attacker_id 
-               else battle_data.attacker_id)
-    
-    loser_update = """
-    UPDATE profiles 
-    SET losses = losses + 1
-    WHERE id = :loser_id
+    Battles across all players, newest first, paged like a player's
+    history through ``cursor``. Pollers pass the newest ``created_at`` they
+    have as ``since`` to get only battles after it.
     """
-    
-    await database.execute(loser_update, {"loser_id": loser_id})
\ No newline at end of file
+    key = decode_cursor(cursor)
+    if since is not None and since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    if key is None and battle_feed.ready and limit < battle_feed.size:
+        # The first page is always within the feed; fetching one extra
+        # entry still tells whether another page exists
+        results, headers = page(battle_feed.recent(limit + 1, since), limit)
+        return IsoJSONResponse(results, headers=headers)
+
+    query = recent_battles_query(key, since is not None)
+    values = {"limit": limit + 1, **keyset_values(key)}
+    if since is not None:
+        values["since"] = since
+    results = await database.fetch_all(query, values)
+    results, headers = page(results, limit)
+
+    return IsoJSONResponse([dict(result) for result in results], headers=headers)
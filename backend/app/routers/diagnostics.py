@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Query
+
+from app.core.tracing import query_tracer
+from app.database import database
+from app.services.change_bus import change_bus
+from app.services.game_engine import game_engine
+from app.services.profile_cache import profile_cache
+
+router = APIRouter()
+
+
+@router.get("/diagnostics/caches")
+async def get_cache_stats():
+    """Size and hit/miss/eviction counters of the in-process caches"""
+    return {"profiles": profile_cache.stats(), "change_bus": change_bus.stats()}
+
+
+@router.get("/diagnostics/pool")
+async def get_pool_stats():
+    """Database pool occupancy, acquire waits and connection churn"""
+    return database.pool_stats()
+
+
+@router.get("/diagnostics/engine")
+async def get_engine_stats():
+    """Players held by the game engine and how far its journal is behind"""
+    return game_engine.stats()
+
+
+@router.get("/diagnostics/queries")
+async def get_query_stats(limit: int = Query(20, ge=1, le=500)):
+    """
+    The statements with the most total database time, and how many queries
+    each route issues per request (a high maximum or repeated statements
+    point at N+1 loops)
+    """
+    return {
+        "slow_queries": query_tracer.slow_queries,
+        "statements": query_tracer.top(limit),
+        "routes": query_tracer.routes(),
+    }
+
+
+@router.delete("/diagnostics/queries")
+async def reset_query_stats():
+    """Start query statistics afresh, e.g. before a load test"""
+    query_tracer.reset()
+    return {"status": "reset"}
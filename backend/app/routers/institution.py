@@ -1,12 +1,19 @@
 import hashlib
 import json
+import math
 import uuid
 from typing import Any, Dict
 
 from fastapi import APIRouter, Depends, HTTPException, status
 
+from app.core.serialization import IsoJSONResponse, coordinate_columns, point
 from app.database import database
-from app.schemas.schemas import Institution, ItemCreate, Profile
+from app.schemas.schemas import Institution, ItemCreate, ItemType, Profile
+from app.services.change_bus import ITEM, change_bus
+from app.services.game_engine import game_engine
+from app.services.item_index import IndexedItem, item_index
+from app.services.leaderboard import leaderboard
+from app.services.map_stats import map_stats
 
 router = APIRouter()
 
@@ -113,9 +120,9 @@ async def get_institution_items(institution_id: str):
     """
     Get all items placed by an institution across all their maps.
     """
-    query = """
+    query = f"""
     SELECT i.id, i.type, i.subtype, i.map_id,
-           ST_AsGeoJSON(i.location) as location,
+           {coordinate_columns("i.location")},
            i.expires_at, m.name as map_name
     FROM items i
     JOIN maps m ON i.map_id = m.id
@@ -125,29 +132,20 @@ async def get_institution_items(institution_id: str):
 
     results = await database.fetch_all(query, {"institution_id": institution_id})
 
-    items = []
-    for result in results:
-        location = None
-        if result["location"]:
-            location_data = json.loads(result["location"])
-            location = {
-                "type": location_data["type"],
-                "coordinates": location_data["coordinates"],
-            }
-
-        items.append(
+    return IsoJSONResponse(
+        [
             {
                 "id": result["id"],
                 "type": result["type"],
                 "subtype": result["subtype"],
                 "map_id": result["map_id"],
                 "map_name": result["map_name"],
-                "location": location,
+                "location": point(result["latitude"], result["longitude"]),
                 "expires_at": result["expires_at"],
             }
-        )
-
-    return items
+            for result in results
+        ]
+    )
 
 
 @router.post("/institution/{institution_id}/items")
@@ -202,6 +200,20 @@ async def create_institution_item(institution_id: str, item_data: Dict[str, Any]
     if not result:
         raise HTTPException(status_code=500, detail="Failed to create item")
 
+    item_index.add(
+        IndexedItem(
+            id=result["id"],
+            type=result["type"],
+            subtype=result["subtype"],
+            map_id=result["map_id"],
+            latitude=float(item_data["latitude"]),
+            longitude=float(item_data["longitude"]),
+            expires_at=result["expires_at"],
+        )
+    )
+    map_stats.spawned(result["map_id"], result["expires_at"])
+    change_bus.publish(ITEM, result["id"], result["map_id"])
+
     return {
         "status": "created",
         "item_id": result["id"],
@@ -219,7 +231,7 @@ async def delete_institution_item(institution_id: str, item_id: str):
     """
     # Verify item belongs to institution's map
     verify_query = """
-    SELECT i.id
+    SELECT i.id, i.map_id, i.owner_id, i.expires_at
     FROM items i
     JOIN maps m ON i.map_id = m.id
     WHERE i.id = :item_id AND m.institution_id = :institution_id
@@ -234,12 +246,134 @@ async def delete_institution_item(institution_id: str, item_id: str):
             status_code=404, detail="Item not found or not owned by institution"
         )
 
-    # Delete the item
+    owner_id = item_check["owner_id"]
+    if game_engine.enabled:
+        # The engine may hold the item in memory (collected but not written
+        # yet), so it deletes it there and writes the delete itself
+        owner_id = await game_engine.delete(item_id) or owner_id
+    else:
+        await database.execute(
+            "DELETE FROM items WHERE id = :item_id", {"item_id": item_id}
+        )
+        item_index.remove(item_id, item_check["map_id"], "deleted")
+    if owner_id is not None:
+        leaderboard.adjust(item_check["map_id"], owner_id, -1)
+    map_stats.removed(item_check["map_id"], owner_id, item_check["expires_at"])
+    change_bus.publish(ITEM, item_id, item_check["map_id"])
+
+    return {"status": "deleted", "item_id": item_id}
+
+
+SPAWN_SETTING_DEFAULTS = {
+    "radius_meters": 150.0,
+    "items_per_hectare": 5.0,
+    "respawn_per_minute": 60,
+    "item_lifetime_hours": 24,
+    "type_weights": {"Potion": 3, "Gem": 2, "Chest": 1, "Wand": 1, "Scroll": 2},
+    "enabled": True,
+}
+
+
+@router.get("/institution/{institution_id}/maps/{map_id}/spawning")
+async def get_map_spawn_settings(institution_id: str, map_id: str):
+    """
+    Get the procedural spawn settings for a map.
+    """
+    query = """
+    SELECT s.map_id, s.center_latitude, s.center_longitude, s.radius_meters,
+           s.items_per_hectare, s.respawn_per_minute, s.item_lifetime_hours,
+           s.type_weights, s.enabled
+    FROM map_spawn_settings s
+    JOIN maps m ON s.map_id = m.id
+    WHERE s.map_id = :map_id AND m.institution_id = :institution_id
+    """
+    result = await database.fetch_one(
+        query, {"map_id": map_id, "institution_id": institution_id}
+    )
+    if not result:
+        raise HTTPException(status_code=404, detail="Spawn settings not found")
+
+    settings_data = dict(result)
+    if isinstance(settings_data["type_weights"], str):
+        settings_data["type_weights"] = json.loads(settings_data["type_weights"])
+    return settings_data
+
+
+@router.put("/institution/{institution_id}/maps/{map_id}/spawning")
+async def update_map_spawn_settings(
+    institution_id: str, map_id: str, spawn_data: Dict[str, Any]
+):
+    """
+    Create or replace the procedural spawn settings for a map. Requires
+    center_latitude and center_longitude; other fields fall back to defaults.
+    """
+    map_check = await database.fetch_one(
+        "SELECT 1 FROM maps WHERE id = :map_id AND institution_id = :institution_id",
+        {"map_id": map_id, "institution_id": institution_id},
+    )
+    if not map_check:
+        raise HTTPException(
+            status_code=404, detail="Map not found or not owned by institution"
+        )
+
+    for field in ["center_latitude", "center_longitude"]:
+        if field not in spawn_data:
+            raise HTTPException(
+                status_code=400, detail=f"Missing required field: {field}"
+            )
+
+    values = {**SPAWN_SETTING_DEFAULTS, **spawn_data}
+    type_weights = values["type_weights"]
+    if not isinstance(type_weights, dict) or not all(
+        t in ItemType._value2member_map_
+        and isinstance(w, (int, float))
+        and not isinstance(w, bool)
+        and 0 <= w < math.inf
+        for t, w in type_weights.items()
+    ):
+        raise HTTPException(status_code=400, detail="Invalid type_weights")
+    if not any(w > 0 for w in type_weights.values()):
+        raise HTTPException(
+            status_code=400, detail="type_weights needs at least one positive weight"
+        )
+
+    query = """
+    INSERT INTO map_spawn_settings (
+        map_id, center_latitude, center_longitude, radius_meters,
+        items_per_hectare, respawn_per_minute, item_lifetime_hours,
+        type_weights, enabled
+    )
+    VALUES (
+        :map_id, :center_latitude, :center_longitude, :radius_meters,
+        :items_per_hectare, :respawn_per_minute, :item_lifetime_hours,
+        CAST(:type_weights AS jsonb), :enabled
+    )
+    ON CONFLICT (map_id) DO UPDATE SET
+        center_latitude = EXCLUDED.center_latitude,
+        center_longitude = EXCLUDED.center_longitude,
+        radius_meters = EXCLUDED.radius_meters,
+        items_per_hectare = EXCLUDED.items_per_hectare,
+        respawn_per_minute = EXCLUDED.respawn_per_minute,
+        item_lifetime_hours = EXCLUDED.item_lifetime_hours,
+        type_weights = EXCLUDED.type_weights,
+        enabled = EXCLUDED.enabled
+    """
     await database.execute(
-        "DELETE FROM items WHERE id = :item_id", {"item_id": item_id}
+        query,
+        {
+            "map_id": map_id,
+            "center_latitude": float(values["center_latitude"]),
+            "center_longitude": float(values["center_longitude"]),
+            "radius_meters": float(values["radius_meters"]),
+            "items_per_hectare": float(values["items_per_hectare"]),
+            "respawn_per_minute": int(values["respawn_per_minute"]),
+            "item_lifetime_hours": int(values["item_lifetime_hours"]),
+            "type_weights": json.dumps(type_weights),
+            "enabled": bool(values["enabled"]),
+        },
     )
 
-    return {"status": "deleted", "item_id": item_id}
+    return await get_map_spawn_settings(institution_id, map_id)
 
 
 @router.get("/institution/{institution_id}/maps/{map_id}/students")
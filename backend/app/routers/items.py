@@ -1,28 +1,41 @@
 from datetime import datetime, timedelta, timezone
-from typing import List
+from typing import List, Optional, Union
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 
 from app.core.config import settings
+from app.core.packed import items_response, negotiate
+from app.core.serialization import coordinate_columns, item_from_row
+from app.core.statements import statements
 from app.database import database
-from app.schemas.schemas import Item, ItemCollect, ItemCreate, ItemUse
-from app.services.item_service import ItemService
+from app.schemas.schemas import (
+    Item,
+    ItemCollect,
+    ItemCreate,
+    ItemUse,
+    ProximityDelta,
+)
+from app.services.change_bus import ITEM, PROFILE, change_bus
+from app.services.item_index import IndexedItem, item_index
+from app.services.game_engine import game_engine
+from app.services.item_service import ItemService, gems_awarded
+from app.services.leaderboard import leaderboard
+from app.services.map_stats import map_stats
+from app.services.profile_cache import profile_cache
 
 router = APIRouter()
 
-
-@router.get("/map/{map_id}/proximity", response_model=List[Item])
-async def get_nearby_items(
-    map_id: UUID, latitude: float, longitude: float, radius: float = 100.0
-):
-    query = """
+statements.declare(
+    "nearby_items",
+    f"""
     SELECT id, type, subtype, owner_id, map_id,
-           ST_AsGeoJSON(location) as location,
+           {coordinate_columns()},
            expires_at
     FROM items
     WHERE map_id = :map_id
     AND owner_id IS NULL
+    AND (expires_at IS NULL OR expires_at > NOW())
     AND ST_DWithin(
         location::geography,
         ST_SetSRID(ST_MakePoint(CAST(:longitude AS float8), CAST(:latitude AS float8)), 4326)::geography,
@@ -32,10 +45,97 @@ async def get_nearby_items(
         location::geography,
         ST_SetSRID(ST_MakePoint(CAST(:longitude AS float8), CAST(:latitude AS float8)), 4326)::geography
     )
+    """,
+)
+
+statements.declare(
+    "owned_item",
     """
+    SELECT id, type, subtype, owner_id, map_id, expires_at
+    FROM items
+    WHERE id = :item_id AND owner_id = :player_id
+    """,
+)
 
-    results = await database.fetch_all(
-        query,
+statements.declare("delete_item", "DELETE FROM items WHERE id = :item_id")
+
+statements.declare(
+    "add_gems",
+    """
+    UPDATE profiles
+    SET gems = gems + :gems_awarded
+    WHERE id = :player_id
+    """,
+)
+
+
+@router.get(
+    "/map/{map_id}/proximity", response_model=Union[List[Item], ProximityDelta]
+)
+async def get_nearby_items(
+    map_id: UUID,
+    latitude: float,
+    longitude: float,
+    radius: float = 100.0,
+    since: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+):
+    """
+    Unowned items within ``radius`` meters, nearest first.
+
+    Every response carries an ``X-Map-Cursor`` header. Passing it back as
+    ``since`` returns only the items that were added to or removed from the
+    caller's view since then, along with the next cursor.
+
+    Clients may ask for a compact packed payload through ``Accept`` (see
+    ``app.core.packed``).
+    """
+    media_type = negotiate(accept)
+    if since is not None:
+        delta = await item_index.changes(
+            database, map_id, latitude, longitude, radius, since
+        )
+        if delta is None:
+            delta = {
+                "cursor": item_index.cursor(map_id, latitude, longitude, radius),
+                "reset": True,
+                "added": await nearby_items(map_id, latitude, longitude, radius),
+                "removed": [],
+            }
+        return items_response(
+            media_type,
+            delta["added"],
+            wire_item,
+            headers={"X-Map-Cursor": delta["cursor"]},
+            envelope=delta,
+        )
+
+    cursor = item_index.cursor(map_id, latitude, longitude, radius)
+    items = await nearby_items(map_id, latitude, longitude, radius)
+    return items_response(
+        media_type, items, wire_item, headers={"X-Map-Cursor": cursor}
+    )
+
+
+def wire_item(record) -> Union[Item, dict]:
+    if isinstance(record, IndexedItem):
+        return record.to_dict()
+    return item_from_row(record)
+
+
+async def nearby_items(
+    map_id: UUID, latitude: float, longitude: float, radius: float
+) -> list:
+    """
+    Unowned, unexpired items around a position: IndexedItems when the index
+    is enabled, otherwise rows selecting ``coordinate_columns``
+    """
+    indexed = await item_index.nearby(database, map_id, latitude, longitude, radius)
+    if indexed is not None:
+        return indexed
+
+    results = await statements.fetch_all(
+        "nearby_items",
         {
             "map_id": map_id,
             "longitude": longitude,
@@ -43,94 +143,55 @@ async def get_nearby_items(
             "radius": radius,
         },
     )
-
-    items = []
-    for result in results:
-        location = None
-        if result["location"]:
-            import json
-
-            location_data = json.loads(result["location"])
-            location = {
-                "type": location_data["type"],
-                "coordinates": location_data["coordinates"],
-            }
-
-        items.append(
-            Item(
-                id=result["id"],
-                type=result["type"],
-                subtype=result["subtype"],
-                owner_id=result["owner_id"],
-                map_id=result["map_id"],
-                location=location,
-                expires_at=result["expires_at"],
-            )
-        )
-
-    return items
+    return results
 
 
 @router.post("/items/collect")
 async def collect_item(collect_data: ItemCollect):
-    item_service = ItemService(database)
-
-    # Check if item exists and is collectible
-    item_query = """
-    SELECT id, type, subtype, owner_id, map_id,
-           ST_AsGeoJSON(location) as location,
-           expires_at
-    FROM items
-    WHERE id = :item_id
-    """
-
-    item = await database.fetch_one(item_query, {"item_id": collect_data.item_id})
+    if game_engine.enabled:
+        # Claimed in memory; the engine takes the item out of the index itself
+        result = await game_engine.collect(
+            collect_data.item_id,
+            collect_data.player_id,
+            collect_data.player_latitude,
+            collect_data.player_longitude,
+            settings.max_collection_distance_meters,
+        )
+    else:
+        # Check, proximity test and ownership transfer happen in one statement
+        result = await ItemService(database).collect(
+            collect_data.item_id,
+            collect_data.player_id,
+            collect_data.player_latitude,
+            collect_data.player_longitude,
+            settings.max_collection_distance_meters,
+        )
 
-    if not item:
+    if not result:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Item not found"
         )
 
-    if item["owner_id"] is not None:
+    if not result["collected"]:
+        if result["owner_id"] is None and not result["within_range"]:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Item too far away to collect",
+            )
+        # Either owned already or claimed by a concurrent collector
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Item already owned"
         )
 
-    # Allow collection of expired items but return warning
-    is_expired = item["expires_at"] and item["expires_at"] < datetime.now(timezone.utc)
-
-    # Check proximity (within 10 meters)
-    is_within_range = await item_service.check_proximity(
-        collect_data.item_id,
-        collect_data.player_latitude,
-        collect_data.player_longitude,
-        settings.max_collection_distance_meters,
-    )
-
-    if not is_within_range:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Item too far away to collect",
-        )
-
-    player_id = collect_data.player_id
-
-    # Transfer ownership
-    update_query = """
-    UPDATE items
-    SET owner_id = :player_id,
-        location = ST_SetSRID(ST_MakePoint(CAST(:longitude AS float8), CAST(:latitude AS float8)), 4326)
-    WHERE id = :item_id
-    """
+    if not game_engine.enabled:
+        item_index.remove(collect_data.item_id, result["map_id"], "collected")
+    leaderboard.adjust(result["map_id"], collect_data.player_id, +1)
+    map_stats.collected(result["map_id"], collect_data.player_id)
+    change_bus.publish(ITEM, collect_data.item_id, result["map_id"])
 
-    await database.execute(
-        update_query,
-        {
-            "player_id": player_id,
-            "longitude": collect_data.player_longitude,
-            "latitude": collect_data.player_latitude,
-            "item_id": collect_data.item_id,
-        },
+    # Allow collection of expired items but return warning
+    is_expired = result["expires_at"] and result["expires_at"] < datetime.now(
+        timezone.utc
     )
 
     response = {"status": "collected", "item_id": collect_data.item_id}
@@ -143,16 +204,14 @@ async def collect_item(collect_data: ItemCollect):
 async def use_item(use_data: ItemUse):
     player_id = use_data.player_id
 
-    # Check if item exists and is owned by player
-    item_query = """
-    SELECT id, type, subtype, owner_id
-    FROM items
-    WHERE id = :item_id AND owner_id = :player_id
-    """
-
-    item = await database.fetch_one(
-        item_query, {"item_id": use_data.item_id, "player_id": player_id}
-    )
+    if game_engine.enabled:
+        # Ownership check, effect and removal all happen in memory
+        item = await game_engine.use(use_data.item_id, player_id)
+    else:
+        # Check if item exists and is owned by player
+        item = await statements.fetch_one(
+            "owned_item", {"item_id": use_data.item_id, "player_id": player_id}
+        )
 
     if not item:
         raise HTTPException(
@@ -160,17 +219,23 @@ async def use_item(use_data: ItemUse):
             detail="Item not found or not owned by player",
         )
 
-    # Apply item effects based on type and subtype
-    effect_applied = await apply_item_effect(player_id, dict(item))
+    if not game_engine.enabled:
+        # Apply item effects based on type and subtype
+        effect_applied = await apply_item_effect(player_id, dict(item))
 
-    if not effect_applied:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot use this item"
-        )
+        if not effect_applied:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot use this item"
+            )
 
-    # Remove the item after use
-    delete_query = "DELETE FROM items WHERE id = :item_id"
-    await database.execute(delete_query, {"item_id": use_data.item_id})
+        # Remove the item after use
+        await statements.execute("delete_item", {"item_id": use_data.item_id})
+    # Owned items are off the map, so normally not indexed
+    if item_index.get(use_data.item_id) is not None:
+        item_index.remove(use_data.item_id, item["map_id"], "used")
+    leaderboard.adjust(item["map_id"], player_id, -1)
+    map_stats.removed(item["map_id"], player_id, item["expires_at"])
+    change_bus.publish(ITEM, use_data.item_id, item["map_id"])
 
     return {"status": "used", "item_id": use_data.item_id, "effect": item["subtype"]}
 
@@ -182,7 +247,7 @@ async def spawn_item(item_data: ItemCreate):
     VALUES (:type, :subtype, :map_id,
             ST_SetSRID(ST_MakePoint(CAST(:longitude AS float8), CAST(:latitude AS float8)), 4326),
             NOW() + INTERVAL '24 hours')
-    RETURNING id
+    RETURNING id, expires_at
     """
 
     result = await database.fetch_one(
@@ -197,32 +262,35 @@ async def spawn_item(item_data: ItemCreate):
     )
 
     item_id = result["id"] if result else None
+    if item_id and item_data.map_id:
+        item_index.add(
+            IndexedItem(
+                id=item_id,
+                type=item_data.type.value,
+                subtype=item_data.subtype,
+                map_id=item_data.map_id,
+                latitude=item_data.latitude,
+                longitude=item_data.longitude,
+                expires_at=result["expires_at"],
+            )
+        )
+        map_stats.spawned(item_data.map_id, result["expires_at"])
+        change_bus.publish(ITEM, item_id, item_data.map_id)
     return {"status": "spawned", "item_id": item_id}
 
 
 async def apply_item_effect(player_id: UUID, item: dict) -> bool:
     """Apply item effects based on type and subtype"""
     try:
-        if item["type"] == "Chest" and item["subtype"] == "Iron Crate":
-            # Give random gems (5-15)
-            import random
-
-            gems_awarded = random.randint(5, 15)
-
-            update_gems = """
-            UPDATE profiles
-            SET gems = gems + :gems_awarded
-            WHERE id = :player_id
-            """
-            await database.execute(
-                update_gems, {"gems_awarded": gems_awarded, "player_id": player_id}
+        awarded = gems_awarded(item["type"], item["subtype"])
+        if awarded:
+            await statements.execute(
+                "add_gems", {"gems_awarded": awarded, "player_id": player_id}
             )
+            profile_cache.invalidate(player_id)
+            change_bus.publish(PROFILE, player_id)
 
-            return True
-
-        # Other item effects would be implemented here
-        # For now, we'll just consume them
-
+        # Items without an effect are just consumed
         return True
     except Exception:
         return False
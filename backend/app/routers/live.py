@@ -0,0 +1,73 @@
+import asyncio
+import json
+from typing import Optional
+from uuid import UUID
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+
+from app.services.live_updates import EVICTED, live_hub
+
+router = APIRouter()
+
+
+@router.websocket("/map/{map_id}/live")
+async def map_live_updates(
+    websocket: WebSocket,
+    map_id: UUID,
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+    radius: Optional[float] = None,
+):
+    """
+    Push item spawned/collected/used/deleted events for a map as they happen.
+
+    When a position and radius are given only events for items within range
+    are sent; clients can move by sending
+    ``{"latitude": ..., "longitude": ..., "radius": ...}``.
+    """
+    await websocket.accept()
+    subscriber = live_hub.subscribe(
+        map_id, latitude=latitude, longitude=longitude, radius=radius
+    )
+
+    async def receive_positions():
+        # Returns (ending the stream) when the client goes away; malformed
+        # messages are ignored
+        while True:
+            try:
+                text = await websocket.receive_text()
+            except WebSocketDisconnect:
+                return
+            try:
+                message = json.loads(text)
+                radius = message.get("radius")
+                subscriber.move(
+                    float(message["latitude"]),
+                    float(message["longitude"]),
+                    float(radius) if radius is not None else None,
+                )
+            except (AttributeError, KeyError, TypeError, ValueError):
+                continue
+
+    reader = asyncio.create_task(receive_positions())
+    try:
+        while True:
+            getter = asyncio.create_task(subscriber.queue.get())
+            done, _ = await asyncio.wait(
+                {getter, reader}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if reader in done:
+                getter.cancel()
+                break
+            message = getter.result()
+            if message is EVICTED:
+                await websocket.close(
+                    code=status.WS_1013_TRY_AGAIN_LATER, reason="Too slow"
+                )
+                break
+            await websocket.send_text(message)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        reader.cancel()
+        live_hub.unsubscribe(subscriber)
@@ -4,6 +4,8 @@ from uuid import UUID
 
 from app.database import database
 from app.schemas.schemas import Map, MapCreate, Institution, InstitutionCreate
+from app.services.leaderboard import leaderboard
+from app.services.map_stats import map_stats
 
 router = APIRouter()
 
@@ -124,62 +126,41 @@ async def create_map(map_data: MapCreate):
 
 @router.get("/maps/{map_id}/stats")
 async def get_map_stats(map_id: UUID):
-    # Get item counts
-    items_query = """
-    SELECT 
-        COUNT(*) as total_items,
-        COUNT(CASE WHEN owner_id IS NULL THEN 1 END) as available_items,
-        COUNT(CASE WHEN owner_id IS NOT NULL THEN 1 END) as collected_items,
-        COUNT(CASE WHEN expires_at <= NOW() THEN 1 END) as expired_items
-    FROM items 
-    WHERE map_id = :map_id
-    """
-    
-    items_stats = await database.fetch_one(items_query, {"map_id": map_id})
-    
-    # Get player activity (unique players who collected items on this map)
-    players_query = """
-    SELECT COUNT(DISTINCT owner_id) as active_players
-    FROM items 
-    WHERE map_id = :map_id AND owner_id IS NOT NULL
-    """
-    
-    players_stats = await database.fetch_one(players_query, {"map_id": map_id})
-    
+    stats = await map_stats.current(map_id)
     return {
         "map_id": map_id,
         "items": {
-            "total": items_stats["total_items"],
-            "available": items_stats["available_items"],
-            "collected": items_stats["collected_items"],
-            "expired": items_stats["expired_items"]
+            "total": stats["total"],
+            "available": stats["available"],
+            "collected": stats["collected"],
+            "expired": stats["expired"]
         },
-        "active_players": players_stats["active_players"]
+        "active_players": stats["active_players"]
     }
 
 
+@router.get("/maps/{map_id}/stats/history")
+async def get_map_stats_history(map_id: UUID, minutes: int = 60):
+    """
+    Per-minute stats for the last ``minutes`` (at most
+    MAP_STATS_HISTORY_MINUTES), oldest first, with how many items were
+    spawned, collected and removed during each minute.
+    """
+    return await map_stats.history(map_id, minutes)
+
+
 @router.get("/maps/{map_id}/leaderboard")
 async def get_map_leaderboard(map_id: UUID, limit: int = 10):
-    query = """
-    SELECT 
-        p.id,
-        p.name,
-        p.level,
-        p.wins,
-        p.losses,
-        COUNT(i.id) as items_collected
-    FROM profiles p
-    LEFT JOIN items i ON p.id = i.owner_id AND i.map_id = :map_id
-    WHERE EXISTS (
-        SELECT 1 FROM items collected 
-        WHERE collected.owner_id = p.id AND collected.map_id = :map_id
-    )
-    GROUP BY p.id, p.name, p.level, p.wins, p.losses
-    ORDER BY items_collected DESC, p.wins DESC, p.level DESC
-    LIMIT :limit
-    """
-    
-    return await database.fetch_all(query, {
-        "map_id": map_id,
-        "limit": limit
-    })
\ No newline at end of file
+    return await leaderboard.top(map_id, limit)
+
+
+@router.get("/maps/{map_id}/leaderboard/{player_id}")
+async def get_map_leaderboard_standing(map_id: UUID, player_id: UUID):
+    """A player's rank on a map's leaderboard"""
+    standing = await leaderboard.standing(map_id, player_id)
+    if standing is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Player has no items on this map"
+        )
+    return standing
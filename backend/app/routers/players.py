@@ -1,137 +1,157 @@
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 
+from app.core.packed import items_response, negotiate
+from app.core.serialization import (
+    FastJSONResponse,
+    coordinate_columns,
+    item_from_row,
+    profile_from_row,
+)
+from app.core.statements import statements
 from app.database import database
 from app.schemas.schemas import Item, LocationUpdate, Profile, ProfileUpdate
-from app.services.location_service import LocationService
+from app.services.game_engine import game_engine
+from app.services.location_buffer import location_buffer
+from app.services.profile_cache import profile_cache
 
 router = APIRouter()
 
-
-@router.get("/player/{player_id}", response_model=Profile)
-async def get_player(player_id: UUID):
-    query = """
+statements.declare(
+    "player_profile",
+    f"""
     SELECT id, name, description, level, wins, losses, gems,
-           ST_AsGeoJSON(location) as location
+           {coordinate_columns()}
     FROM profiles
     WHERE id = :player_id
+    """,
+)
+
+# Owned items are carried by their owner, so they sit at the owner's position
+statements.declare(
+    "player_inventory",
+    f"""
+    SELECT i.id, i.type, i.subtype, i.owner_id, i.map_id,
+           {coordinate_columns("p.location")},
+           i.expires_at
+    FROM items i
+    JOIN profiles p ON p.id = i.owner_id
+    WHERE i.owner_id = :player_id
+    """,
+)
+
+statements.declare(
+    "sync_location",
     """
+    UPDATE profiles
+    SET location = ST_SetSRID(ST_MakePoint(CAST(:longitude AS float8), CAST(:latitude AS float8)), 4326)
+    WHERE id = :player_id
+    """,
+)
 
-    result = await database.fetch_one(query, {"player_id": player_id})
 
-    if not result:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Player not found"
-        )
+@router.get("/player/{player_id}", response_model=Profile)
+async def get_player(player_id: UUID):
+    if game_engine.enabled:
+        profile = await game_engine.profile(player_id)
+        if profile is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Player not found"
+            )
+        return FastJSONResponse(profile_from_row(profile))
 
-    # Parse location from GeoJSON
-    location = None
-    if result["location"]:
-        import json
+    profile = profile_cache.get(player_id)
+    if profile is None:
+        version = profile_cache.version
+        result = await statements.fetch_one("player_profile", {"player_id": player_id})
 
-        location_data = json.loads(result["location"])
-        location = {
-            "type": location_data["type"],
-            "coordinates": location_data["coordinates"],
-        }
+        if not result:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Player not found"
+            )
+        profile = profile_cache.put(result, version)
 
-    return Profile(
-        id=result["id"],
-        name=result["name"],
-        description=result["description"],
-        level=result["level"],
-        wins=result["wins"],
-        losses=result["losses"],
-        gems=result["gems"],
-        location=location,
+    # A fix still waiting in the sync buffer is newer than the stored one
+    return FastJSONResponse(
+        profile_from_row(profile, location_buffer.position(player_id))
     )
 
 
 @router.get("/player/{player_id}/inventory", response_model=List[Item])
-async def get_player_inventory(player_id: UUID):
+async def get_player_inventory(player_id: UUID, accept: Optional[str] = Header(None)):
+    """Items the player owns, packed on request like proximity (see ``app.core.packed``)"""
+    if game_engine.enabled:
+        results = await game_engine.inventory(player_id)
+        if results is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Player not found"
+            )
+        return items_response(negotiate(accept), results, item_from_row)
+
     # Ensure player exists before returning inventory
-    player_exists = await database.fetch_one(
-        "SELECT 1 FROM profiles WHERE id = :player_id", {"player_id": player_id}
-    )
+    player_exists = await statements.fetch_one("player_exists", {"player_id": player_id})
     if not player_exists:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Player not found"
         )
 
-    query = """
-    SELECT id, type, subtype, owner_id, map_id,
-           ST_AsGeoJSON(location) as location,
-           expires_at
-    FROM items
-    WHERE owner_id = :player_id
-
-    """
+    results = await statements.fetch_all("player_inventory", {"player_id": player_id})
+    buffered = location_buffer.position(player_id)
 
-    results = await database.fetch_all(query, {"player_id": player_id})
+    return items_response(
+        negotiate(accept),
+        results,
+        lambda result: item_from_row(result, buffered),
+        position=buffered,
+    )
 
-    items = []
-    for result in results:
-        location = None
-        if result["location"]:
-            import json
 
-            location_data = json.loads(result["location"])
-            location = {
-                "type": location_data["type"],
-                "coordinates": location_data["coordinates"],
-            }
+@router.patch("/player/sync")
+async def sync_player_location(sync_data: LocationUpdate):
+    player_id = sync_data.player_id
 
-        items.append(
-            Item(
-                id=result["id"],
-                type=result["type"],
-                subtype=result["subtype"],
-                owner_id=result["owner_id"],
-                map_id=result["map_id"],
-                location=location,
-                expires_at=result["expires_at"],
+    if game_engine.enabled:
+        if not await game_engine.sync(player_id, sync_data.latitude, sync_data.longitude):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Player not found"
             )
-        )
-
-    return items
-
+        return {
+            "status": "synced",
+            "location": {"lat": sync_data.latitude, "lng": sync_data.longitude},
+        }
 
-@router.patch("/player/sync")
-async def sync_player_location(sync_data: LocationUpdate):
-    location_service = LocationService(database)
+    if location_buffer.enabled:
+        if not await location_buffer.player_exists(player_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Player not found"
+            )
+        # Written to Postgres by the buffer's next flush
+        location_buffer.record(player_id, sync_data.latitude, sync_data.longitude)
+        profile_cache.update_position(player_id, sync_data.latitude, sync_data.longitude)
+        return {
+            "status": "synced",
+            "location": {"lat": sync_data.latitude, "lng": sync_data.longitude},
+        }
 
     # Validate player exists
-    player_id = sync_data.player_id
-    player_exists = await database.fetch_one(
-        "SELECT 1 FROM profiles WHERE id = :player_id", {"player_id": player_id}
-    )
+    player_exists = await statements.fetch_one("player_exists", {"player_id": player_id})
     if not player_exists:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Player not found"
         )
 
     # Update player location
-    update_query = """
-    UPDATE profiles
-    SET location = ST_SetSRID(ST_MakePoint(CAST(:longitude AS float8), CAST(:latitude AS float8)), 4326)
-    WHERE id = :player_id
-    """
-
-    await database.execute(
-        update_query,
+    await statements.execute(
+        "sync_location",
         {
             "longitude": sync_data.longitude,
             "latitude": sync_data.latitude,
             "player_id": player_id,
         },
     )
-
-    # Update all owned items to match player location
-    await location_service.update_owned_items_location(
-        player_id, sync_data.latitude, sync_data.longitude
-    )
+    profile_cache.update_position(player_id, sync_data.latitude, sync_data.longitude)
 
     return {
         "status": "synced",
@@ -144,9 +164,7 @@ async def get_player_maps(player_id: UUID):
     """
     Get all maps a player has access to.
     """
-    player_exists = await database.fetch_one(
-        "SELECT 1 FROM profiles WHERE id = :player_id", {"player_id": player_id}
-    )
+    player_exists = await statements.fetch_one("player_exists", {"player_id": player_id})
     if not player_exists:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Player not found"
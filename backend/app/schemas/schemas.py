@@ -68,6 +68,13 @@ class Item(BaseModel):
         from_attributes = True
 
 
+class ProximityDelta(BaseModel):
+    cursor: str
+    reset: bool
+    added: List[Item]
+    removed: List[UUID]
+
+
 class ItemCollect(BaseModel):
     item_id: UUID
     player_latitude: float = Field(..., ge=-90, le=90)
@@ -113,6 +120,15 @@ class BattleReport(BaseModel):
     winner_id: UUID
 
 
+class BattleBatchEntry(BattleReport):
+    # When the battle was fought, for fights synced after the fact
+    created_at: Optional[datetime] = None
+
+
+class BattleReportBatch(BaseModel):
+    battles: List[BattleBatchEntry] = Field(..., min_length=1, max_length=1000)
+
+
 class BattleLog(BaseModel):
     id: UUID
     attacker_id: UUID
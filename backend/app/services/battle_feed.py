@@ -0,0 +1,225 @@
+import asyncio
+import json
+import logging
+import uuid
+from bisect import bisect_right
+from collections import deque
+from datetime import datetime
+from typing import Iterable, List, Mapping, Optional
+from uuid import UUID
+
+import asyncpg
+from databases import Database
+
+from app.core.config import settings
+from app.database import DATABASE_URL, database
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "battle_feed"
+
+# NOTIFY payloads must stay under 8000 bytes; larger changes send a reload
+MAX_PAYLOAD_BYTES = 7900
+
+ID_FIELDS = ("id", "attacker_id", "defender_id", "winner_id")
+
+
+def feed_entry(battle_id, created_at, attacker_id, defender_id, winner_id, names: Mapping) -> dict:
+    """A feed entry, with player names looked up in ``names`` by id"""
+    return {
+        "id": battle_id,
+        "attacker_id": attacker_id,
+        "defender_id": defender_id,
+        "winner_id": winner_id,
+        "created_at": created_at,
+        "attacker_name": names.get(attacker_id),
+        "defender_name": names.get(defender_id),
+        "winner_name": names.get(winner_id),
+    }
+
+
+def _sort_key(entry: Mapping):
+    return entry["created_at"], entry["id"]
+
+
+def _encode(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def _decode(entry: dict) -> dict:
+    for field in ID_FIELDS:
+        entry[field] = UUID(entry[field])
+    entry["created_at"] = datetime.fromisoformat(entry["created_at"])
+    return entry
+
+
+class BattleFeed:
+    """
+    The most recent battles, names included, for the home page ticker.
+
+    A bounded buffer kept in ``(created_at, id)`` order, so
+    ``GET /battle/recent`` is a memory read. Reported battles are added with
+    the names already known at report time, then announced on the
+    ``battle_feed`` channel so every other worker adds them too. Each worker
+    LISTENs on a dedicated connection and re-warms from ``battle_logs``
+    whenever that connection is (re)established, so notifications missed
+    while disconnected cannot leave a gap.
+    """
+
+    _RECENT_QUERY = """
+    SELECT bl.id, bl.attacker_id, bl.defender_id, bl.winner_id, bl.created_at,
+           p1.name as attacker_name,
+           p2.name as defender_name,
+           p3.name as winner_name
+    FROM battle_logs bl
+    LEFT JOIN profiles p1 ON bl.attacker_id = p1.id
+    LEFT JOIN profiles p2 ON bl.defender_id = p2.id
+    LEFT JOIN profiles p3 ON bl.winner_id = p3.id
+    ORDER BY bl.created_at DESC, bl.id DESC
+    LIMIT :limit
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        size: int = 500,
+        enabled: bool = True,
+        dsn: str = DATABASE_URL,
+        retry_seconds: float = 5.0,
+    ):
+        self.db = db
+        self.size = size
+        self.enabled = enabled
+        self.dsn = dsn
+        self.retry_seconds = retry_seconds
+        # Tags our own notifications so they are not applied twice
+        self.origin = uuid.uuid4().hex
+        self.ready = False
+        self.reloads = 0
+        self._entries: deque = deque(maxlen=size)
+        self._ids = set()
+        self._task: Optional[asyncio.Task] = None
+        self._reload: Optional[asyncio.Task] = None
+
+    # Buffer
+
+    def add(self, entries: Iterable[dict]):
+        for entry in entries:
+            if entry["id"] in self._ids:
+                continue
+            key = _sort_key(entry)
+            if not self._entries or key >= _sort_key(self._entries[-1]):
+                # The usual case: newer than everything held
+                if len(self._entries) == self.size:
+                    self._ids.discard(self._entries[0]["id"])
+                self._entries.append(entry)
+            else:
+                # Backdated, e.g. an offline battle synced late
+                if len(self._entries) == self.size:
+                    if key < _sort_key(self._entries[0]):
+                        continue
+                    self._ids.discard(self._entries.popleft()["id"])
+                index = bisect_right(self._entries, key, key=_sort_key)
+                self._entries.insert(index, entry)
+            self._ids.add(entry["id"])
+
+    def recent(self, limit: int, since: Optional[datetime] = None) -> List[dict]:
+        """Up to ``limit`` entries newest first, only those after ``since`` if given"""
+        result = []
+        for entry in reversed(self._entries):
+            if len(result) >= limit or (since is not None and entry["created_at"] <= since):
+                break
+            result.append(entry)
+        return result
+
+    def _replace(self, entries: List[dict]):
+        self._entries = deque(sorted(entries, key=_sort_key), maxlen=self.size)
+        self._ids = {entry["id"] for entry in self._entries}
+
+    async def warm(self):
+        rows = await self.db.fetch_all(self._RECENT_QUERY, {"limit": self.size})
+        # Merged, not replaced: battles added while the query ran may be
+        # newer than its snapshot
+        entries = {row["id"]: dict(row) for row in rows}
+        entries.update((entry["id"], entry) for entry in self._entries)
+        self._replace(list(entries.values()))
+        self.ready = True
+
+    # Change notification
+
+    async def publish(self, entries: List[dict]):
+        """Add freshly reported battles here and announce them to other workers"""
+        if not self.enabled:
+            return
+        self.add(entries)
+        payload = json.dumps({"origin": self.origin, "entries": entries}, default=_encode)
+        if len(payload.encode()) > MAX_PAYLOAD_BYTES:
+            payload = json.dumps({"origin": self.origin, "reload": True})
+        try:
+            await self.db.execute(
+                "SELECT pg_notify(:channel, :payload)",
+                {"channel": CHANNEL, "payload": payload},
+            )
+        except Exception:
+            # The battles are recorded; other workers catch up on their next warm
+            logger.exception("Could not announce reported battles")
+
+    def _on_notify(self, payload: str):
+        message = json.loads(payload)
+        if message.get("origin") == self.origin:
+            return
+        if message.get("reload"):
+            self._schedule_reload()
+        else:
+            self.add(_decode(entry) for entry in message["entries"])
+
+    def _schedule_reload(self):
+        if self._reload is None or self._reload.done():
+            self.reloads += 1
+            self._reload = asyncio.ensure_future(self.warm())
+
+    async def _listen(self):
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda _: closed.set())
+                await connection.add_listener(
+                    CHANNEL, lambda _conn, _pid, _channel, payload: self._on_notify(payload)
+                )
+                # Listening first, so nothing reported during the warm is missed
+                await self.warm()
+                await closed.wait()
+                logger.warning("Battle feed connection lost; reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Battle feed listener failed")
+            finally:
+                self.ready = False
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(self.retry_seconds)
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        for task in (self._task, self._reload):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._reload = None
+
+
+battle_feed = BattleFeed(
+    database,
+    size=settings.battle_feed_size,
+    enabled=settings.battle_feed_enabled,
+)
@@ -0,0 +1,161 @@
+from collections import Counter
+from datetime import datetime, timezone
+from typing import List, Optional, Sequence
+
+from databases import Database
+
+
+class MissingPlayers(Exception):
+    """Battles named players that do not exist"""
+
+    def __init__(self, player_ids):
+        super().__init__(f"Players not found: {', '.join(map(str, player_ids))}")
+        self.player_ids = list(player_ids)
+
+
+def _aware(value: Optional[datetime]) -> Optional[datetime]:
+    # Offline clients may send naive timestamps; they are taken as UTC
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class BattleService:
+    def __init__(self, db: Database):
+        self.db = db
+
+    async def report(self, attacker_id, defender_id, winner_id) -> Optional[List]:
+        """
+        Log one battle and update both players' stats in a single statement.
+
+        Being one statement it commits or fails as a whole. Both profiles
+        are locked in id order first, so concurrent reports for the same
+        pair cannot deadlock. Returns the winner's and loser's updated rows
+        (each with ``battle_id`` and ``battle_created_at``), or None if either
+        player does not exist.
+        """
+        query = """
+        WITH players AS (
+            SELECT id
+            FROM profiles
+            WHERE id IN (CAST(:attacker_id AS uuid), CAST(:defender_id AS uuid))
+            ORDER BY id
+            FOR UPDATE
+        ),
+        battle AS (
+            INSERT INTO battle_logs (attacker_id, defender_id, winner_id, created_at)
+            SELECT CAST(:attacker_id AS uuid), CAST(:defender_id AS uuid),
+                   CAST(:winner_id AS uuid), NOW()
+            WHERE (SELECT COUNT(*) FROM players) = 2
+            RETURNING id, created_at
+        ),
+        updated AS (
+            UPDATE profiles AS p
+            SET wins = p.wins + CASE WHEN p.id = CAST(:winner_id AS uuid) THEN 1 ELSE 0 END,
+                losses = p.losses + CASE WHEN p.id = CAST(:winner_id AS uuid) THEN 0 ELSE 1 END,
+                level = CASE
+                    WHEN p.id = CAST(:winner_id AS uuid) AND (p.wins + 1) % 3 = 0 THEN p.level + 1
+                    ELSE p.level
+                END
+            FROM battle
+            WHERE p.id IN (CAST(:attacker_id AS uuid), CAST(:defender_id AS uuid))
+            RETURNING battle.id as battle_id, battle.created_at as battle_created_at,
+                      p.id, p.name, p.level, p.wins, p.losses
+        )
+        SELECT battle_id, battle_created_at, id, name, level, wins, losses FROM updated
+        """
+
+        rows = await self.db.fetch_all(
+            query,
+            {
+                "attacker_id": str(attacker_id),
+                "defender_id": str(defender_id),
+                "winner_id": str(winner_id),
+            },
+        )
+        return rows or None
+
+    async def report_batch(self, battles: Sequence) -> dict:
+        """
+        Log many battles and apply their net stat changes in one transaction.
+
+        ``battles`` have ``attacker_id``, ``defender_id``, ``winner_id`` and
+        ``created_at`` (None for now). Battles are inserted with one
+        multi-row INSERT and each player's profile is updated once with
+        their summed wins and losses; level-ups are the multiples of three
+        crossed by the new win total, as with single reports. Raises
+        MissingPlayers, rolling everything back, if any player is unknown.
+        """
+        wins, losses = Counter(), Counter()
+        for battle in battles:
+            loser_id = (
+                battle.defender_id
+                if battle.winner_id == battle.attacker_id
+                else battle.attacker_id
+            )
+            wins[str(battle.winner_id)] += 1
+            losses[str(loser_id)] += 1
+        player_ids = sorted(wins.keys() | losses.keys())
+
+        async with self.db.transaction():
+            # Lock in id order so overlapping batches cannot deadlock
+            found = await self.db.fetch_all(
+                """
+                SELECT id FROM profiles
+                WHERE id = ANY(CAST(:ids AS uuid[]))
+                ORDER BY id
+                FOR UPDATE
+                """,
+                {"ids": player_ids},
+            )
+            missing = set(player_ids) - {str(row["id"]) for row in found}
+            if missing:
+                raise MissingPlayers(sorted(missing))
+
+            inserted = await self.db.fetch_all(
+                """
+                INSERT INTO battle_logs (attacker_id, defender_id, winner_id, created_at)
+                SELECT attacker_id, defender_id, winner_id, COALESCE(created_at, NOW())
+                FROM unnest(
+                    CAST(:attackers AS uuid[]),
+                    CAST(:defenders AS uuid[]),
+                    CAST(:winners AS uuid[]),
+                    CAST(:created AS timestamptz[])
+                ) WITH ORDINALITY AS b(attacker_id, defender_id, winner_id, created_at, n)
+                ORDER BY n
+                RETURNING id, created_at
+                """,
+                {
+                    "attackers": [str(b.attacker_id) for b in battles],
+                    "defenders": [str(b.defender_id) for b in battles],
+                    "winners": [str(b.winner_id) for b in battles],
+                    "created": [_aware(b.created_at) for b in battles],
+                },
+            )
+
+            players = await self.db.fetch_all(
+                """
+                UPDATE profiles AS p
+                SET wins = p.wins + d.wins,
+                    losses = p.losses + d.losses,
+                    level = p.level + (p.wins + d.wins) / 3 - p.wins / 3
+                FROM unnest(
+                    CAST(:ids AS uuid[]),
+                    CAST(:wins AS int[]),
+                    CAST(:losses AS int[])
+                ) AS d(id, wins, losses)
+                WHERE p.id = d.id
+                RETURNING p.id, p.name, p.level, p.wins, p.losses
+                """,
+                {
+                    "ids": player_ids,
+                    "wins": [wins[player_id] for player_id in player_ids],
+                    "losses": [losses[player_id] for player_id in player_ids],
+                },
+            )
+
+        return {
+            "battle_ids": [row["id"] for row in inserted],
+            "created_at": [row["created_at"] for row in inserted],
+            "players": players,
+        }
@@ -0,0 +1,307 @@
+import asyncio
+import json
+import logging
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+import asyncpg
+from databases import Database
+
+from app.core.config import settings
+from app.database import DATABASE_URL, database
+from app.services.game_engine import game_engine
+from app.services.item_index import item_index
+from app.services.leaderboard import leaderboard
+from app.services.map_stats import map_stats
+from app.services.profile_cache import profile_cache
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY payloads must stay under 8000 bytes; bigger batches are split
+MAX_PAYLOAD_BYTES = 7900
+
+# Entities a change event can name. ``item`` and ``profile`` events carry the
+# row's id (items also their map); ``map`` events stand for bulk changes to
+# one map's items, e.g. a spawner tick or a reaper batch.
+ITEM = "item"
+PROFILE = "profile"
+MAP = "map"
+
+Event = Tuple[str, Optional[str], Optional[str]]
+
+
+def _chunks(events: List[Event]) -> List[List[Event]]:
+    """Event lists small enough for one NOTIFY each, without origin and seq"""
+    chunks, chunk, size = [], [], 0
+    for event in events:
+        length = len(json.dumps(event)) + 1
+        if chunk and size + length > MAX_PAYLOAD_BYTES - 100:
+            chunks.append(chunk)
+            chunk, size = [], 0
+        chunk.append(event)
+        size += length
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+class ChangeBus:
+    """
+    Cross-worker cache invalidation over Postgres LISTEN/NOTIFY.
+
+    Writers call ``publish(entity, id, map_id)`` after their write commits.
+    Events are buffered, de-duplicated and sent every ``interval`` seconds as
+    compact ``[entity, id, map]`` lists on ``channel``. Every worker LISTENs
+    on a dedicated connection and hands other workers' events to the
+    handlers registered with ``subscribe``.
+
+    Each worker numbers its notifications. A skipped number (a send that
+    failed) or a lost listener connection means events may have been missed,
+    so the flush handlers registered with ``on_flush`` run and every cache
+    reloads from Postgres on its next read.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        enabled: bool = True,
+        dsn: str = DATABASE_URL,
+        channel: str = "cache_changes",
+        interval: float = 0.01,
+        retry_seconds: float = 1.0,
+    ):
+        self.db = db
+        self.enabled = enabled
+        self.dsn = dsn
+        self.channel = channel
+        self.interval = interval
+        self.retry_seconds = retry_seconds
+        # Tags our own notifications so they are not applied twice
+        self.origin = uuid.uuid4().hex
+        self.connected = False
+        self.published = 0
+        self.sent = 0
+        self.send_failures = 0
+        self.received = 0
+        self.flushes = 0
+        self._seq = 0
+        self._last_seq: Dict[str, int] = {}
+        self._buffer: Dict[Event, None] = {}
+        self._wakeup = asyncio.Event()
+        self._handlers: Dict[str, List[Callable]] = {}
+        self._flush_handlers: List[Callable] = []
+        self._sender: Optional[asyncio.Task] = None
+        self._listener: Optional[asyncio.Task] = None
+
+    # Handlers
+
+    def subscribe(self, entity: str, handler: Callable):
+        """Call ``handler(id, map_id)`` for every other worker's ``entity`` event"""
+        self._handlers.setdefault(entity, []).append(handler)
+
+    def on_flush(self, handler: Callable):
+        """Call ``handler()`` whenever events may have been missed"""
+        self._flush_handlers.append(handler)
+
+    def flush_all(self, reason: str):
+        self.flushes += 1
+        logger.warning("Flushing in-process caches (%s)", reason)
+        for handler in self._flush_handlers:
+            handler()
+
+    # Publishing
+
+    def publish(self, entity: str, id=None, map_id=None):
+        """Announce a committed change; sent with the next batch"""
+        if not self.enabled:
+            return
+        event = (
+            entity,
+            str(id) if id is not None else None,
+            str(map_id) if map_id is not None else None,
+        )
+        if event not in self._buffer:
+            self._buffer[event] = None
+            self.published += 1
+        self._wakeup.set()
+
+    async def send(self) -> int:
+        """Send everything buffered; returns how many notifications went out"""
+        if not self._buffer:
+            return 0
+        events, self._buffer = list(self._buffer), {}
+        payloads = []
+        for chunk in _chunks(events):
+            # Numbered before sending, so a failed send shows up as a gap
+            self._seq += 1
+            payloads.append(json.dumps({"o": self.origin, "s": self._seq, "e": chunk}))
+        try:
+            await self.db.execute(
+                """
+                SELECT pg_notify(:channel, payload)
+                FROM unnest(CAST(:payloads AS text[])) AS payload
+                """,
+                {"channel": self.channel, "payloads": payloads},
+            )
+        except Exception:
+            # Our next notification tells every other worker to flush
+            self.send_failures += 1
+            logger.exception("Could not announce %d cache changes", len(events))
+            return 0
+        self.sent += len(payloads)
+        return len(payloads)
+
+    async def _send_loop(self):
+        while True:
+            await self._wakeup.wait()
+            # A short pause batches the writes of concurrent requests together
+            await asyncio.sleep(self.interval)
+            self._wakeup.clear()
+            await self.send()
+
+    # Receiving
+
+    def _on_notify(self, payload: str):
+        message = json.loads(payload)
+        origin, seq = message["o"], message["s"]
+        if origin == self.origin:
+            return
+        self.received += 1
+        last = self._last_seq.get(origin)
+        self._last_seq[origin] = seq
+        if last is not None and seq != last + 1:
+            self.flush_all(f"missed {seq - last - 1} notifications")
+            return
+        for entity, id, map_id in message["e"]:
+            for handler in self._handlers.get(entity, ()):
+                try:
+                    handler(id, map_id)
+                except Exception:
+                    logger.exception("Cache invalidation for %s %s failed", entity, id)
+
+    async def _connect(self) -> Tuple[asyncpg.Connection, asyncio.Event]:
+        connection = await asyncpg.connect(self.dsn)
+        closed = asyncio.Event()
+        connection.add_termination_listener(lambda _: closed.set())
+        await connection.add_listener(
+            self.channel, lambda _conn, _pid, _channel, payload: self._on_notify(payload)
+        )
+        self.connected = True
+        return connection, closed
+
+    async def _listen(self, connected: Optional[tuple]):
+        while True:
+            connection = None
+            try:
+                if connected is None:
+                    connected = await self._connect()
+                    # Whatever was announced while we were away is lost
+                    self._last_seq.clear()
+                    self.flush_all("listener reconnected")
+                connection, closed = connected
+                connected = None
+                await closed.wait()
+                logger.warning("Change bus connection lost; reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Change bus listener failed")
+            finally:
+                self.connected = False
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(self.retry_seconds)
+
+    async def start(self):
+        """
+        Start listening before the caches are first loaded, so nothing
+        written in between is missed; a failed first connect is retried (and
+        flushes) in the background instead of holding up startup.
+        """
+        if not self.enabled or self._listener is not None:
+            return
+        try:
+            connected = await self._connect()
+        except Exception:
+            logger.exception("Change bus could not connect; retrying in the background")
+            connected = None
+        self._listener = asyncio.create_task(self._listen(connected))
+        self._sender = asyncio.create_task(self._send_loop())
+
+    async def stop(self):
+        for task in (self._sender, self._listener):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._sender = None
+        self._listener = None
+        # Announce what the last requests changed
+        await self.send()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "connected": self.connected,
+            "published": self.published,
+            "sent": self.sent,
+            "send_failures": self.send_failures,
+            "received": self.received,
+            "flushes": self.flushes,
+            "buffered": len(self._buffer),
+        }
+
+
+change_bus = ChangeBus(
+    database,
+    enabled=settings.change_bus_enabled,
+    channel=settings.change_bus_channel,
+    interval=settings.change_bus_interval_ms / 1000,
+)
+
+
+def _reload_items(map_id=None):
+    # The game engine's index is authoritative: a reload from Postgres could
+    # bring back items collected in memory but not written yet
+    if not game_engine.enabled:
+        item_index.invalidate(map_id)
+
+
+def _item_changed(item_id, map_id):
+    if map_id is None:
+        # Owned items off the map are in no cache
+        return
+    # Collected, used or deleted items leave the index at once; anything
+    # else (e.g. a spawn) is picked up by a background reload of the map
+    if item_index.get(item_id) is not None:
+        item_index.remove(item_id, map_id, "changed")
+    else:
+        _reload_items(map_id)
+    leaderboard.invalidate(map_id)
+    map_stats.invalidate(map_id)
+
+
+def _profile_changed(player_id, _map_id):
+    profile_cache.invalidate(player_id)
+    leaderboard.invalidate_player(player_id)
+
+
+def _map_changed(_id, map_id):
+    _reload_items(map_id)
+    leaderboard.invalidate(map_id)
+    map_stats.invalidate(map_id)
+
+
+def _flush():
+    profile_cache.clear()
+    _reload_items()
+    leaderboard.invalidate()
+    map_stats.invalidate()
+
+
+change_bus.subscribe(ITEM, _item_changed)
+change_bus.subscribe(PROFILE, _profile_changed)
+change_bus.subscribe(MAP, _map_changed)
+change_bus.on_flush(_flush)
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+from typing import Optional
+
+from databases import Database
+
+from app.core.config import settings
+from app.database import database
+from app.services.change_bus import MAP, change_bus
+from app.services.item_index import item_index
+from app.services.item_service import ItemService
+from app.services.leader import LeaderLock
+from app.services.map_stats import map_stats
+
+logger = logging.getLogger(__name__)
+
+
+class ExpiryReaper:
+    """
+    Periodically deletes expired unowned items in bounded batches.
+
+    Runs on whichever worker holds the ``expiry_reaper`` leader lock for the
+    tick. Each batch is its own short statement, and every removed item is
+    reported to the spatial index so change cursors and live subscribers
+    see it expire.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        interval: float = 60.0,
+        batch_size: int = 500,
+        enabled: bool = True,
+    ):
+        self.db = db
+        self.interval = interval
+        self.batch_size = batch_size
+        self.enabled = enabled
+        self.leader = LeaderLock(db, "expiry_reaper")
+        self._task: Optional[asyncio.Task] = None
+
+    async def reap(self) -> int:
+        """Delete expired items until none are left; returns how many went"""
+        item_service = ItemService(self.db)
+        reaped = 0
+        while True:
+            rows = await item_service.cleanup_expired_items(self.batch_size)
+            for row in rows:
+                item_index.remove(row["id"], row["map_id"], "expired")
+                map_stats.removed(row["map_id"], expires_at=row["expires_at"])
+                if row["map_id"] is not None:
+                    change_bus.publish(MAP, map_id=row["map_id"])
+            reaped += len(rows)
+            if len(rows) < self.batch_size:
+                return reaped
+            # Let request handlers run between batches
+            await asyncio.sleep(0)
+
+    async def tick(self) -> int:
+        async with self.leader.acquire() as is_leader:
+            if not is_leader:
+                return 0
+            return await self.reap()
+
+    async def _run(self):
+        while True:
+            try:
+                reaped = await self.tick()
+                if reaped:
+                    logger.info("Reaped %d expired items", reaped)
+            except Exception:
+                logger.exception("Expiry reaper tick failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+expiry_reaper = ExpiryReaper(
+    database,
+    interval=settings.expiry_reaper_interval_seconds,
+    batch_size=settings.expiry_reaper_batch_size,
+    enabled=settings.expiry_reaper_enabled,
+)
@@ -0,0 +1,807 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence
+from uuid import UUID
+
+from databases import Database
+
+from app.core.config import settings
+from app.core.serialization import coordinate_columns
+from app.core.statements import statements
+from app.database import database
+from app.services.battle_service import MissingPlayers, _aware
+from app.services.item_index import ItemIndex, _key, haversine_meters, item_index
+from app.services.item_service import gems_awarded
+
+logger = logging.getLogger(__name__)
+
+statements.declare(
+    "engine_player",
+    f"""
+    SELECT id, name, description, level, wins, losses, gems,
+           {coordinate_columns()}
+    FROM profiles
+    WHERE id = :player_id
+    """,
+)
+
+statements.declare(
+    "engine_inventory",
+    """
+    SELECT id, type, subtype, map_id, expires_at
+    FROM items
+    WHERE owner_id = :player_id
+    """,
+)
+
+
+def _timestamp(value: Optional[str]) -> Optional[datetime]:
+    return None if value is None else datetime.fromisoformat(value)
+
+
+class Journal:
+    """
+    Append-only file of engine mutations, fsynced in groups.
+
+    ``append`` assigns a sequence number and returns at once; ``commit``
+    waits until that entry is on disk. A background task writes and fsyncs
+    everything appended since its last pass, so concurrent actions share
+    one fsync. Entries stay in memory until ``checkpoint`` says Postgres
+    has them, which also rewrites the file to hold only what is left.
+    """
+
+    def __init__(self, path: str, fsync_interval: float = 0.002):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.seq = 0
+        self.durable = 0
+        self._entries: List[dict] = []
+        self._buffer: List[str] = []
+        self._waiters: List[tuple] = []
+        self._wakeup = asyncio.Event()
+        self._io_lock = asyncio.Lock()
+        self._file = None
+        self._task: Optional[asyncio.Task] = None
+
+    def recover(self) -> List[dict]:
+        """Open the journal, returning the entries left by the last run"""
+        entries = []
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as journal:
+                for line in journal:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        # A torn final write; it was never acknowledged
+                        break
+        self._entries = entries
+        self.seq = self.durable = entries[-1]["seq"] if entries else 0
+        self._rewrite(entries)
+        return list(entries)
+
+    def append(self, op: str, **fields) -> int:
+        self.seq += 1
+        entry = {"seq": self.seq, "op": op, **fields}
+        self._entries.append(entry)
+        self._buffer.append(json.dumps(entry, default=str))
+        self._wakeup.set()
+        return self.seq
+
+    async def commit(self, seq: int):
+        if seq <= self.durable:
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append((seq, waiter))
+        await waiter
+
+    def pending(self) -> List[dict]:
+        """Durable entries not yet checkpointed, oldest first"""
+        return [entry for entry in self._entries if entry["seq"] <= self.durable]
+
+    def backlog(self) -> int:
+        return len(self._entries)
+
+    async def sync(self):
+        async with self._io_lock:
+            if not self._buffer:
+                return
+            lines, seq = self._buffer, self.seq
+            self._buffer = []
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(None, self._write, lines)
+            except Exception as exc:
+                self._buffer[:0] = lines
+                self._settle(seq, exc)
+                raise
+            self.durable = seq
+            self._settle(seq)
+
+    async def checkpoint(self, seq: int):
+        """Postgres holds every entry up to ``seq``; drop them"""
+        async with self._io_lock:
+            self._entries = [entry for entry in self._entries if entry["seq"] > seq]
+            remaining = [entry for entry in self._entries if entry["seq"] <= self.durable]
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._rewrite, remaining)
+
+    def _settle(self, seq: int, exc: Optional[Exception] = None):
+        waiting = []
+        for entry_seq, waiter in self._waiters:
+            if entry_seq > seq:
+                waiting.append((entry_seq, waiter))
+            elif not waiter.done():
+                if exc is None:
+                    waiter.set_result(None)
+                else:
+                    waiter.set_exception(exc)
+        self._waiters = waiting
+
+    def _write(self, lines: List[str]):
+        self._file.write("\n".join(lines) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _rewrite(self, entries: List[dict]):
+        temporary = self.path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as journal:
+            for entry in entries:
+                journal.write(json.dumps(entry, default=str) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+        if self._file is not None:
+            self._file.close()
+        os.replace(temporary, self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            # Let actions arriving in the next moment share this fsync
+            await asyncio.sleep(self.fsync_interval)
+            self._wakeup.clear()
+            try:
+                await self.sync()
+            except Exception:
+                logger.exception("Failed to write the game engine journal")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.sync()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class PlayerState:
+    __slots__ = (
+        "id", "name", "description", "level", "wins", "losses", "gems",
+        "latitude", "longitude", "inventory", "seq",
+    )
+
+    def __init__(self, row, inventory):
+        self.id = _key(row["id"])
+        self.name = row["name"]
+        self.description = row["description"]
+        self.level = row["level"]
+        self.wins = row["wins"]
+        self.losses = row["losses"]
+        self.gems = row["gems"]
+        self.latitude = row["latitude"]
+        self.longitude = row["longitude"]
+        self.inventory: Dict[UUID, dict] = {
+            _key(item["id"]): {
+                "id": _key(item["id"]),
+                "type": item["type"],
+                "subtype": item["subtype"],
+                "map_id": item["map_id"],
+                "expires_at": item["expires_at"],
+            }
+            for item in inventory
+        }
+        # The last journal entry that changed this player
+        self.seq = 0
+
+    def profile(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "description": self.description,
+            "level": self.level,
+            "wins": self.wins,
+            "losses": self.losses,
+            "gems": self.gems,
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+        }
+
+    def stats(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "level": self.level,
+            "wins": self.wins,
+            "losses": self.losses,
+        }
+
+
+class GameEngine:
+    """
+    Authoritative in-memory game state with write-behind persistence.
+
+    When enabled, collect, use, sync and battle reports are applied to
+    player state held in memory and to the item index, with no database
+    round trip. Each mutation runs to completion on the event loop before
+    any other request is served, so actions on a map are applied one at a
+    time; the first collector of an item takes it out of the index before
+    anyone else can see it.
+
+    Every mutation is appended to a ``Journal`` and the action is only
+    acknowledged once its entry is on disk. Every ``flush_interval`` seconds
+    the journal's entries are written to Postgres in one transaction,
+    coalesced to one statement per table, and then dropped from the
+    journal. Entries carry absolute values (gems, wins, final ownership),
+    so replaying them is idempotent: at startup whatever the last run left
+    in the journal is written to Postgres before requests are served.
+
+    Players are loaded from Postgres the first time they act and stay in
+    memory afterwards; reads of their profile and inventory never touch
+    the database. Beyond ``max_players`` the least recently used players
+    whose changes are all in Postgres are dropped, to be reloaded when
+    they next act. Ids with no profile are remembered for ``missing_ttl``
+    seconds. The engine is only correct when one worker serves all
+    traffic for the players and maps it holds, so run a single worker per
+    deployment (or route sticky by map) in this mode.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        items: ItemIndex,
+        journal_path: str = "game_engine.journal",
+        fsync_interval: float = 0.002,
+        flush_interval: float = 0.5,
+        max_players: int = 100000,
+        missing_ttl: float = 30.0,
+        enabled: bool = False,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.db = db
+        self.items = items
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.max_players = max_players
+        self.missing_ttl = missing_ttl
+        self.clock = clock
+        self.journal = Journal(journal_path, fsync_interval)
+        self._players: "OrderedDict[UUID, PlayerState]" = OrderedDict()
+        self._missing: "OrderedDict[UUID, float]" = OrderedDict()
+        # Every journal entry up to this one is in Postgres
+        self._flushed = 0
+        self._owners: Dict[UUID, UUID] = {}
+        self._locks: Dict[UUID, asyncio.Lock] = {}
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.flushed_entries = 0
+        self.last_flush_ms = 0.0
+        self.evictions = 0
+
+    # Players
+
+    async def player(self, player_id) -> Optional[PlayerState]:
+        """A player's live state, loaded from Postgres on first use"""
+        player_id = _key(player_id)
+        player = self._players.get(player_id)
+        if player is not None:
+            self._players.move_to_end(player_id)
+            return player
+        if self._missed(player_id):
+            return None
+        lock = self._locks.setdefault(player_id, asyncio.Lock())
+        async with lock:
+            player = self._players.get(player_id)
+            if player is None:
+                player = await self._load(player_id)
+        self._locks.pop(player_id, None)
+        return player
+
+    async def _load(self, player_id: UUID) -> Optional[PlayerState]:
+        registry = statements.using(self.db)
+        row = await registry.fetch_one("engine_player", {"player_id": player_id})
+        if row is None:
+            self._missing[player_id] = self.clock()
+            self._missing.move_to_end(player_id)
+            while len(self._missing) > self.max_players:
+                self._missing.popitem(last=False)
+            return None
+        inventory = await registry.fetch_all("engine_inventory", {"player_id": player_id})
+        player = PlayerState(row, inventory)
+        self._evict(room=1)
+        self._players[player_id] = player
+        for item_id in player.inventory:
+            self._owners[item_id] = player_id
+        return player
+
+    def _missed(self, player_id: UUID) -> bool:
+        """Whether ``player_id`` recently had no profile"""
+        missed_at = self._missing.get(player_id)
+        if missed_at is None:
+            return False
+        if self.clock() - missed_at <= self.missing_ttl:
+            return True
+        del self._missing[player_id]
+        return False
+
+    def _evict(self, room: int = 0):
+        """
+        Drop least recently used players with nothing left to write until
+        ``room`` more fit under ``max_players``
+        """
+        excess = len(self._players) + room - self.max_players
+        if excess <= 0:
+            return
+        evicted = []
+        for player_id, player in self._players.items():
+            if len(evicted) == excess:
+                break
+            if player.seq <= self._flushed:
+                evicted.append(player_id)
+        for player_id in evicted:
+            player = self._players.pop(player_id)
+            for item_id in player.inventory:
+                self._owners.pop(item_id, None)
+        self.evictions += len(evicted)
+
+    async def forget(self, *player_ids):
+        """
+        Drop players so they are reloaded, after something other than the
+        engine changed their rows. Writes everything pending first, so the
+        journal cannot overwrite that change later.
+        """
+        await self.flush()
+        for player_id in player_ids:
+            player = self._players.pop(_key(player_id), None)
+            self._missing.pop(_key(player_id), None)
+            if player is not None:
+                for item_id in player.inventory:
+                    self._owners.pop(item_id, None)
+
+    async def profile(self, player_id) -> Optional[dict]:
+        player = await self.player(player_id)
+        return None if player is None else player.profile()
+
+    async def inventory(self, player_id) -> Optional[List[dict]]:
+        """Owned items as rows, located at their owner like the inventory query"""
+        player = await self.player(player_id)
+        if player is None:
+            return None
+        return [
+            {
+                **item,
+                "owner_id": player.id,
+                "latitude": player.latitude,
+                "longitude": player.longitude,
+            }
+            for item in player.inventory.values()
+        ]
+
+    # Mutations
+
+    async def sync(self, player_id, latitude: float, longitude: float) -> bool:
+        player = await self.player(player_id)
+        if player is None:
+            return False
+        player.latitude, player.longitude = latitude, longitude
+        seq = player.seq = self.journal.append(
+            "sync", player_id=str(player.id), latitude=latitude, longitude=longitude
+        )
+        await self.journal.commit(seq)
+        return True
+
+    async def collect(
+        self, item_id, player_id, player_latitude: float, player_longitude: float, max_distance: float
+    ) -> Optional[dict]:
+        """
+        Claim an unowned item for a player. Returns None if there is no such
+        item (or player), otherwise the same fields as ``ItemService.collect``.
+        """
+        item_id = _key(item_id)
+        player = await self.player(player_id)
+        if player is None:
+            return None
+        item = self.items.get(item_id)
+        if item is None:
+            item = await self._find_unindexed(item_id)
+            if isinstance(item, dict):
+                return item
+        if item is None:
+            return None
+
+        distance = haversine_meters(
+            player_latitude, player_longitude, item.latitude, item.longitude
+        )
+        result = {
+            "owner_id": None,
+            "map_id": item.map_id,
+            "expires_at": item.expires_at,
+            "within_range": distance <= max_distance,
+            "collected": False,
+        }
+        if not result["within_range"]:
+            return result
+
+        self.items.remove(item_id, item.map_id, "collected")
+        player.inventory[item_id] = {
+            "id": item_id,
+            "type": item.type,
+            "subtype": item.subtype,
+            "map_id": item.map_id,
+            "expires_at": item.expires_at,
+        }
+        self._owners[item_id] = player.id
+        seq = player.seq = self.journal.append(
+            "collect",
+            item_id=str(item_id),
+            player_id=str(player.id),
+            type=item.type,
+            subtype=item.subtype,
+            map_id=str(item.map_id),
+            expires_at=item.expires_at.isoformat() if item.expires_at else None,
+        )
+        result["collected"] = True
+        await self.journal.commit(seq)
+        return result
+
+    async def _find_unindexed(self, item_id: UUID):
+        """
+        An item missing from the index: owned (returned as a not-collected
+        result), on a map that is not loaded yet (loaded, then returned), or
+        unknown (None).
+        """
+        owner_id = self._owners.get(item_id)
+        if owner_id is None:
+            row = await self.db.fetch_one(
+                "SELECT owner_id, map_id, expires_at FROM items WHERE id = :item_id",
+                {"item_id": item_id},
+            )
+            if row is None:
+                return None
+            owner_id = row["owner_id"]
+            if owner_id is None and row["map_id"] is not None:
+                await self.items.ensure_loaded(self.db, row["map_id"])
+                return self.items.get(item_id)
+        if owner_id is None:
+            return None
+        return {
+            "owner_id": owner_id,
+            "map_id": None,
+            "expires_at": None,
+            "within_range": True,
+            "collected": False,
+        }
+
+    async def use(self, item_id, player_id) -> Optional[dict]:
+        """
+        Consume an item the player owns and apply its effect. Returns the
+        item (with ``gems_awarded``), or None if the player does not own it.
+        """
+        item_id = _key(item_id)
+        player = await self.player(player_id)
+        if player is None or item_id not in player.inventory:
+            return None
+        item = player.inventory.pop(item_id)
+        self._owners.pop(item_id, None)
+        awarded = gems_awarded(item["type"], item["subtype"])
+        player.gems += awarded
+        seq = player.seq = self.journal.append(
+            "use", item_id=str(item_id), player_id=str(player.id), gems=player.gems
+        )
+        await self.journal.commit(seq)
+        return {**item, "gems_awarded": awarded}
+
+    async def delete(self, item_id) -> Optional[UUID]:
+        """
+        Delete an item outright, on the map or in an inventory (an
+        institution removing it). Returns its owner if a loaded player held
+        it. Written through at once, so a map loaded from Postgres later
+        cannot bring the item back.
+        """
+        item_id = _key(item_id)
+        if self.items.get(item_id) is not None:
+            self.items.remove(item_id, event="deleted")
+        owner_id = self._owners.pop(item_id, None)
+        player = self._players.get(owner_id) if owner_id is not None else None
+        seq = self.journal.append("delete", item_id=str(item_id))
+        if player is not None:
+            player.inventory.pop(item_id, None)
+            player.seq = seq
+        await self.journal.commit(seq)
+        await self.flush()
+        return owner_id
+
+    async def report(self, attacker_id, defender_id, winner_id) -> Optional[List[dict]]:
+        """Same as ``BattleService.report``, applied in memory"""
+        attacker = await self.player(attacker_id)
+        defender = await self.player(defender_id)
+        if attacker is None or defender is None:
+            return None
+        battle_id, created_at = self._battle(attacker, defender, _key(winner_id), None)
+        await self.journal.commit(self.journal.seq)
+        return [
+            {**player.stats(), "battle_id": battle_id, "battle_created_at": created_at}
+            for player in (attacker, defender)
+        ]
+
+    async def report_batch(self, battles: Sequence) -> dict:
+        """Same as ``BattleService.report_batch``, applied in memory"""
+        ids = {
+            _key(player_id)
+            for battle in battles
+            for player_id in (battle.attacker_id, battle.defender_id)
+        }
+        players = {player_id: await self.player(player_id) for player_id in ids}
+        missing = sorted(str(player_id) for player_id, player in players.items() if player is None)
+        if missing:
+            raise MissingPlayers(missing)
+
+        battle_ids, created = [], []
+        for battle in battles:
+            battle_id, created_at = self._battle(
+                players[_key(battle.attacker_id)],
+                players[_key(battle.defender_id)],
+                _key(battle.winner_id),
+                _aware(battle.created_at),
+            )
+            battle_ids.append(battle_id)
+            created.append(created_at)
+        await self.journal.commit(self.journal.seq)
+        return {
+            "battle_ids": battle_ids,
+            "created_at": created,
+            "players": [player.stats() for player in players.values()],
+        }
+
+    def _battle(self, attacker: PlayerState, defender: PlayerState, winner_id: UUID, created_at):
+        winner, loser = (attacker, defender) if winner_id == attacker.id else (defender, attacker)
+        winner.wins += 1
+        if winner.wins % 3 == 0:
+            winner.level += 1
+        loser.losses += 1
+        battle_id = uuid.uuid4()
+        created_at = created_at or datetime.now(timezone.utc)
+        winner.seq = loser.seq = self.journal.append(
+            "battle",
+            id=str(battle_id),
+            attacker_id=str(attacker.id),
+            defender_id=str(defender.id),
+            winner_id=str(winner.id),
+            created_at=created_at.isoformat(),
+            players=[
+                {"id": str(p.id), "level": p.level, "wins": p.wins, "losses": p.losses}
+                for p in (winner, loser)
+            ],
+        )
+        return battle_id, created_at
+
+    # Persistence
+
+    async def flush(self) -> int:
+        """Write the journal's durable entries to Postgres; returns how many"""
+        if not self.enabled:
+            return 0
+        async with self._flush_lock:
+            await self.journal.sync()
+            entries = self.journal.pending()
+            if not entries:
+                return 0
+            started = time.perf_counter()
+            await self.apply(entries)
+            await self.journal.checkpoint(entries[-1]["seq"])
+            self._flushed = entries[-1]["seq"]
+            self._evict()
+            self.flushes += 1
+            self.flushed_entries += len(entries)
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+            return len(entries)
+
+    async def apply(self, entries: List[dict]):
+        """Write journal entries to Postgres in one transaction (idempotent)"""
+        profiles: Dict[str, dict] = {}
+        owned: Dict[str, dict] = {}
+        deleted: set = set()
+        battles: List[dict] = []
+        for entry in entries:
+            op = entry["op"]
+            if op == "sync":
+                profiles.setdefault(entry["player_id"], {}).update(
+                    latitude=entry["latitude"], longitude=entry["longitude"]
+                )
+            elif op == "collect":
+                owned[entry["item_id"]] = entry
+                deleted.discard(entry["item_id"])
+            elif op == "use":
+                owned.pop(entry["item_id"], None)
+                deleted.add(entry["item_id"])
+                profiles.setdefault(entry["player_id"], {})["gems"] = entry["gems"]
+            elif op == "delete":
+                owned.pop(entry["item_id"], None)
+                deleted.add(entry["item_id"])
+            elif op == "battle":
+                battles.append(entry)
+                for player in entry["players"]:
+                    profiles.setdefault(player["id"], {}).update(
+                        level=player["level"], wins=player["wins"], losses=player["losses"]
+                    )
+
+        async with self.db.transaction():
+            if owned:
+                # An upsert, so an item reaped before this write is restored
+                await self.db.execute(
+                    """
+                    INSERT INTO items (id, type, subtype, owner_id, map_id, location, expires_at)
+                    SELECT id, type, subtype, owner_id, map_id, NULL, expires_at
+                    FROM unnest(
+                        CAST(:ids AS uuid[]),
+                        CAST(:types AS text[]),
+                        CAST(:subtypes AS text[]),
+                        CAST(:owners AS uuid[]),
+                        CAST(:maps AS uuid[]),
+                        CAST(:expires AS timestamptz[])
+                    ) AS v(id, type, subtype, owner_id, map_id, expires_at)
+                    ON CONFLICT (id) DO UPDATE
+                    SET owner_id = EXCLUDED.owner_id, location = NULL
+                    """,
+                    {
+                        "ids": list(owned),
+                        "types": [entry["type"] for entry in owned.values()],
+                        "subtypes": [entry["subtype"] for entry in owned.values()],
+                        "owners": [entry["player_id"] for entry in owned.values()],
+                        "maps": [entry["map_id"] for entry in owned.values()],
+                        "expires": [_timestamp(entry["expires_at"]) for entry in owned.values()],
+                    },
+                )
+            if deleted:
+                await self.db.execute(
+                    "DELETE FROM items WHERE id = ANY(CAST(:ids AS uuid[]))",
+                    {"ids": sorted(deleted)},
+                )
+            if battles:
+                await self.db.execute(
+                    """
+                    INSERT INTO battle_logs (id, attacker_id, defender_id, winner_id, created_at)
+                    SELECT * FROM unnest(
+                        CAST(:ids AS uuid[]),
+                        CAST(:attackers AS uuid[]),
+                        CAST(:defenders AS uuid[]),
+                        CAST(:winners AS uuid[]),
+                        CAST(:created AS timestamptz[])
+                    )
+                    ON CONFLICT (id) DO NOTHING
+                    """,
+                    {
+                        "ids": [battle["id"] for battle in battles],
+                        "attackers": [battle["attacker_id"] for battle in battles],
+                        "defenders": [battle["defender_id"] for battle in battles],
+                        "winners": [battle["winner_id"] for battle in battles],
+                        "created": [_timestamp(battle["created_at"]) for battle in battles],
+                    },
+                )
+            if profiles:
+                ids = sorted(profiles)
+
+                def column(field: str) -> list:
+                    return [profiles[player_id].get(field) for player_id in ids]
+
+                await self.db.execute(
+                    """
+                    UPDATE profiles AS p
+                    SET location = CASE
+                            WHEN v.latitude IS NULL THEN p.location
+                            ELSE ST_SetSRID(ST_MakePoint(v.longitude, v.latitude), 4326)
+                        END,
+                        gems = COALESCE(v.gems, p.gems),
+                        level = COALESCE(v.level, p.level),
+                        wins = COALESCE(v.wins, p.wins),
+                        losses = COALESCE(v.losses, p.losses)
+                    FROM unnest(
+                        CAST(:ids AS uuid[]),
+                        CAST(:latitudes AS float8[]),
+                        CAST(:longitudes AS float8[]),
+                        CAST(:gems AS int[]),
+                        CAST(:levels AS int[]),
+                        CAST(:wins AS int[]),
+                        CAST(:losses AS int[])
+                    ) AS v(id, latitude, longitude, gems, level, wins, losses)
+                    WHERE p.id = v.id
+                    """,
+                    {
+                        "ids": ids,
+                        "latitudes": column("latitude"),
+                        "longitudes": column("longitude"),
+                        "gems": column("gems"),
+                        "levels": column("level"),
+                        "wins": column("wins"),
+                        "losses": column("losses"),
+                    },
+                )
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to write game engine journal to Postgres")
+
+    async def start(self):
+        if not self.enabled or self._task is not None:
+            return
+        recovered = self.journal.recover()
+        if recovered:
+            logger.info("Replaying %d game engine journal entries", len(recovered))
+            await self.apply(recovered)
+            await self.journal.checkpoint(recovered[-1]["seq"])
+            # In case the index was loaded before the replay gave these owners
+            for entry in recovered:
+                if entry["op"] in ("collect", "use", "delete") and self.items.get(entry["item_id"]):
+                    self.items.remove(entry["item_id"], event="collected")
+        # The engine is authoritative; a reload from Postgres could bring
+        # back items collected in memory but not written yet
+        self.items.max_age = float("inf")
+        self.journal.start()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.flush()
+        await self.journal.close()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "players": len(self._players),
+            "missing_players": len(self._missing),
+            "evictions": self.evictions,
+            "journal_seq": self.journal.seq,
+            "journal_durable_seq": self.journal.durable,
+            "journal_backlog": self.journal.backlog(),
+            "flushes": self.flushes,
+            "flushed_entries": self.flushed_entries,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+        }
+
+
+game_engine = GameEngine(
+    database,
+    item_index,
+    journal_path=settings.game_engine_journal_path,
+    fsync_interval=settings.game_engine_fsync_interval_ms / 1000,
+    flush_interval=settings.game_engine_flush_interval_ms / 1000,
+    max_players=settings.game_engine_max_players,
+    missing_ttl=settings.game_engine_missing_ttl_seconds,
+    enabled=settings.game_engine_enabled,
+)
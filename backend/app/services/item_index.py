@@ -0,0 +1,454 @@
+import asyncio
+import math
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from databases import Database
+
+from app.core.config import settings
+
+EARTH_RADIUS_METERS = 6371008.8
+METERS_PER_DEGREE = 111320.0
+
+
+def _key(value) -> UUID:
+    return value if isinstance(value, UUID) else UUID(str(value))
+
+
+def haversine_meters(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance in meters between two WGS84 points"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(min(1.0, math.sqrt(a)))
+
+
+class IndexedItem:
+    """An unowned item on a map, as held by the in-memory index"""
+
+    __slots__ = ("id", "type", "subtype", "map_id", "latitude", "longitude", "expires_at")
+
+    def __init__(self, id, type, subtype, map_id, latitude, longitude, expires_at=None):
+        self.id = _key(id)
+        self.type = type
+        self.subtype = subtype
+        self.map_id = _key(map_id)
+        # ST_AsGeoJSON emits at most 9 decimal digits; match it
+        self.latitude = round(float(latitude), 9)
+        self.longitude = round(float(longitude), 9)
+        self.expires_at = expires_at
+
+    def is_expired(self, now: datetime) -> bool:
+        return self.expires_at is not None and self.expires_at <= now
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "type": self.type,
+            "subtype": self.subtype,
+            "owner_id": None,
+            "map_id": self.map_id,
+            "location": {
+                "type": "Point",
+                "coordinates": [self.longitude, self.latitude],
+            },
+            "expires_at": self.expires_at,
+        }
+
+
+class MapGrid:
+    """Uniform lat/lng grid of the unowned items on one map"""
+
+    def __init__(self, cell_meters: float):
+        self.cell_lat = cell_meters / METERS_PER_DEGREE
+        self.cell_lng = cell_meters / METERS_PER_DEGREE
+        self.cells: Dict[Tuple[int, int], Dict[UUID, IndexedItem]] = {}
+        self.items: Dict[UUID, IndexedItem] = {}
+        self.loaded_at = time.monotonic()
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return (
+            math.floor(latitude / self.cell_lat),
+            math.floor(longitude / self.cell_lng),
+        )
+
+    def add(self, item: IndexedItem):
+        self.remove(item.id)
+        self.items[item.id] = item
+        self.cells.setdefault(self._cell(item.latitude, item.longitude), {})[item.id] = item
+
+    def remove(self, item_id: UUID) -> Optional[IndexedItem]:
+        item = self.items.pop(item_id, None)
+        if item is None:
+            return None
+        cell = self._cell(item.latitude, item.longitude)
+        bucket = self.cells.get(cell)
+        if bucket is not None:
+            bucket.pop(item_id, None)
+            if not bucket:
+                del self.cells[cell]
+        return item
+
+    def within(
+        self,
+        latitude: float,
+        longitude: float,
+        radius: float,
+        now: datetime,
+        include_expired: bool = False,
+    ) -> List[Tuple[float, IndexedItem]]:
+        dlat = radius / METERS_PER_DEGREE
+        # Widen the longitude span at the edge of the search box closest to a pole
+        cos_lat = math.cos(math.radians(min(89.9, abs(latitude) + dlat)))
+        dlng = radius / (METERS_PER_DEGREE * max(cos_lat, 1e-6))
+
+        lat_lo, lng_lo = self._cell(latitude - dlat, longitude - dlng)
+        lat_hi, lng_hi = self._cell(latitude + dlat, longitude + dlng)
+
+        hits = []
+        if (lat_hi - lat_lo + 1) * (lng_hi - lng_lo + 1) > len(self.cells):
+            buckets: Iterable = self.cells.values()
+        else:
+            buckets = (
+                self.cells.get((i, j), {})
+                for i in range(lat_lo, lat_hi + 1)
+                for j in range(lng_lo, lng_hi + 1)
+            )
+        for bucket in buckets:
+            for item in bucket.values():
+                if not include_expired and item.is_expired(now):
+                    continue
+                distance = haversine_meters(latitude, longitude, item.latitude, item.longitude)
+                if distance <= radius:
+                    hits.append((distance, item))
+
+        hits.sort(key=lambda hit: hit[0])
+        return hits
+
+
+class MapChangeLog:
+    """Monotonic version counter and bounded log of item adds/removes on one map"""
+
+    def __init__(self, retention: int):
+        self.version = 0
+        self.floor = 0
+        self.entries: deque = deque()
+        self.retention = retention
+
+    def record(self, op: str, item_id: UUID, item: Optional[IndexedItem] = None):
+        self.version += 1
+        self.entries.append((self.version, op, item_id, item))
+        while len(self.entries) > self.retention:
+            self.floor = self.entries.popleft()[0]
+
+    def truncate(self):
+        """Invalidate every outstanding cursor for this map"""
+        self.entries.clear()
+        self.floor = self.version
+
+    def since(self, version: int) -> Optional[Dict[UUID, tuple]]:
+        """Latest (op, item) per item after ``version``, or None if no longer covered"""
+        if version < self.floor or version > self.version:
+            return None
+        latest: Dict[UUID, tuple] = {}
+        for entry_version, op, item_id, item in reversed(self.entries):
+            if entry_version <= version:
+                break
+            latest.setdefault(item_id, (op, item))
+        return latest
+
+
+class ItemIndex:
+    """
+    Per-worker spatial index of unowned, unexpired items, keyed by map.
+
+    Maps are loaded at startup and lazily on first use; writers in the routers
+    keep it current, and a map is reloaded in the background once it is older
+    than ``max_age`` so that writes made by other workers become visible.
+
+    Every change also bumps the map's version in its ``MapChangeLog`` so that
+    polling clients can ask for just what changed since their last cursor.
+    """
+
+    def __init__(
+        self,
+        cell_meters: float = 50.0,
+        max_age: float = 60.0,
+        enabled: bool = True,
+        change_retention: int = 1024,
+    ):
+        self.cell_meters = cell_meters
+        self.max_age = max_age
+        self.enabled = enabled
+        self.change_retention = change_retention
+        # Cursors are only meaningful to the worker (and process lifetime) that issued them
+        self.epoch = uuid.uuid4().hex[:8]
+        self._changes: Dict[UUID, MapChangeLog] = {}
+        self._listeners: List[Callable] = []
+        self._maps: Dict[UUID, MapGrid] = {}
+        self._item_maps: Dict[UUID, UUID] = {}
+        self._locks: Dict[UUID, asyncio.Lock] = {}
+        self._pending: Dict[UUID, list] = {}
+        self._refreshing: set = set()
+        self._stale: set = set()
+
+    _LOAD_QUERY = """
+    SELECT id, type, subtype, map_id,
+           ST_Y(location::geometry) as latitude,
+           ST_X(location::geometry) as longitude,
+           expires_at
+    FROM items
+    WHERE owner_id IS NULL
+    AND map_id IS NOT NULL
+    AND location IS NOT NULL
+    AND (expires_at IS NULL OR expires_at > NOW())
+    """
+
+    def is_loaded(self, map_id) -> bool:
+        return _key(map_id) in self._maps
+
+    async def load_all(self, db: Database):
+        """Load every map's unowned items in one pass (used at startup)"""
+        if not self.enabled:
+            return
+        rows = await db.fetch_all(self._LOAD_QUERY)
+        grids: Dict[UUID, MapGrid] = {}
+        for row in rows:
+            item = IndexedItem(**dict(row))
+            grids.setdefault(item.map_id, MapGrid(self.cell_meters)).add(item)
+        for map_id, grid in grids.items():
+            self._install(map_id, grid)
+
+    async def ensure_loaded(self, db: Database, map_id) -> Optional[MapGrid]:
+        """Return the grid for a map, loading it from the database if cold"""
+        if not self.enabled:
+            return None
+        map_id = _key(map_id)
+        grid = self._maps.get(map_id)
+        if grid is None:
+            lock = self._locks.setdefault(map_id, asyncio.Lock())
+            async with lock:
+                grid = self._maps.get(map_id)
+                if grid is None:
+                    grid = await self._load_map(db, map_id)
+        elif (
+            map_id in self._stale or time.monotonic() - grid.loaded_at > self.max_age
+        ) and map_id not in self._refreshing:
+            self._refreshing.add(map_id)
+            asyncio.create_task(self._refresh(db, map_id))
+        return grid
+
+    async def _refresh(self, db: Database, map_id: UUID):
+        try:
+            await self._load_map(db, map_id)
+        finally:
+            self._refreshing.discard(map_id)
+
+    async def _load_map(self, db: Database, map_id: UUID) -> MapGrid:
+        # Writes that land while the snapshot is being read are replayed on top of it
+        self._pending[map_id] = []
+        self._stale.discard(map_id)
+        try:
+            rows = await db.fetch_all(
+                self._LOAD_QUERY + " AND map_id = :map_id", {"map_id": map_id}
+            )
+            grid = MapGrid(self.cell_meters)
+            for row in rows:
+                grid.add(IndexedItem(**dict(row)))
+            for op, arg in self._pending[map_id]:
+                if op == "add":
+                    grid.add(arg)
+                else:
+                    grid.remove(arg)
+        finally:
+            del self._pending[map_id]
+        self._install(map_id, grid)
+        return grid
+
+    def _install(self, map_id: UUID, grid: MapGrid):
+        old = self._maps.get(map_id)
+        if old is not None:
+            # Surface writes made by other workers through the change log
+            changes = self._log(map_id)
+            for item_id in old.items.keys() - grid.items.keys():
+                changes.record("remove", item_id, old.items[item_id])
+                self._notify("removed", map_id, item_id, old.items[item_id])
+            for item_id in grid.items.keys() - old.items.keys():
+                changes.record("add", item_id)
+                self._notify("spawned", map_id, item_id, grid.items[item_id])
+            for item_id in old.items:
+                self._item_maps.pop(item_id, None)
+        for item_id in grid.items:
+            self._item_maps[item_id] = map_id
+        self._maps[map_id] = grid
+
+    def add_listener(self, listener: Callable):
+        """Call ``listener(event, map_id, item_id, item)`` on every add/remove"""
+        self._listeners.append(listener)
+
+    def _notify(self, event: str, map_id: UUID, item_id: UUID, item: Optional[IndexedItem]):
+        for listener in self._listeners:
+            listener(event, map_id, item_id, item)
+
+    def _log(self, map_id: UUID) -> MapChangeLog:
+        changes = self._changes.get(map_id)
+        if changes is None:
+            changes = self._changes[map_id] = MapChangeLog(self.change_retention)
+        return changes
+
+    def add(self, item: IndexedItem, event: str = "spawned"):
+        """Record a newly spawned unowned item"""
+        self._log(item.map_id).record("add", item.id)
+        self._notify(event, item.map_id, item.id, item)
+        pending = self._pending.get(item.map_id)
+        if pending is not None:
+            pending.append(("add", item))
+        grid = self._maps.get(item.map_id)
+        if grid is not None:
+            grid.add(item)
+            self._item_maps[item.id] = item.map_id
+
+    def remove(self, item_id, map_id=None, event: str = "removed") -> Optional[IndexedItem]:
+        """Drop an item that was collected, used, expired or deleted"""
+        item_id = _key(item_id)
+        map_id = self._item_maps.pop(item_id, None) or (_key(map_id) if map_id else None)
+        if map_id is None:
+            return None
+        pending = self._pending.get(map_id)
+        if pending is not None:
+            pending.append(("remove", item_id))
+        grid = self._maps.get(map_id)
+        item = grid.remove(item_id) if grid is not None else None
+        self._log(map_id).record("remove", item_id, item)
+        self._notify(event, map_id, item_id, item)
+        return item
+
+    def get(self, item_id) -> Optional[IndexedItem]:
+        """An indexed item by id, if its map is loaded"""
+        item_id = _key(item_id)
+        map_id = self._item_maps.get(item_id)
+        if map_id is None:
+            return None
+        return self._maps[map_id].items.get(item_id)
+
+    def clear(self, map_id=None):
+        """Forget one map (or all maps) so the next query reloads from Postgres"""
+        if map_id is None:
+            self._maps.clear()
+            self._item_maps.clear()
+            for changes in self._changes.values():
+                changes.truncate()
+            return
+        map_id = _key(map_id)
+        if map_id in self._changes:
+            self._changes[map_id].truncate()
+        grid = self._maps.pop(map_id, None)
+        if grid is not None:
+            for item_id in grid.items:
+                self._item_maps.pop(item_id, None)
+
+    def invalidate(self, map_id=None):
+        """
+        Reload one map (or all maps) in the background on next use, keeping
+        its change log so the reload's diff reaches polling clients
+        """
+        if map_id is None:
+            self._stale.update(self._maps)
+        else:
+            self._stale.add(_key(map_id))
+
+    async def nearby(
+        self, db: Database, map_id, latitude: float, longitude: float, radius: float
+    ) -> Optional[List[IndexedItem]]:
+        """Items within ``radius`` meters ordered by distance, or None when disabled"""
+        grid = await self.ensure_loaded(db, map_id)
+        if grid is None:
+            return None
+        now = datetime.now(timezone.utc)
+        return [item for _, item in grid.within(latitude, longitude, radius, now)]
+
+    def cursor(self, map_id, latitude: float, longitude: float, radius: float) -> str:
+        """Opaque cursor for the map's current version as seen from a position"""
+        version = self._log(_key(map_id)).version
+        return f"{self.epoch}:{version}:{latitude:.7f}:{longitude:.7f}:{radius:g}"
+
+    def _parse_cursor(self, cursor: str) -> Optional[Tuple[int, float, float, float]]:
+        try:
+            epoch, version, latitude, longitude, radius = cursor.split(":")
+            if epoch != self.epoch:
+                return None
+            return int(version), float(latitude), float(longitude), float(radius)
+        except ValueError:
+            return None
+
+    async def changes(
+        self,
+        db: Database,
+        map_id,
+        latitude: float,
+        longitude: float,
+        radius: float,
+        since: str,
+    ) -> Optional[dict]:
+        """
+        Items that entered or left a client's view since ``since``.
+
+        The cursor carries the position it was issued for, so items that came
+        into (or went out of) range because the player moved are reported too.
+        Returns a full snapshot with ``reset`` set when the cursor is unusable.
+        """
+        grid = await self.ensure_loaded(db, map_id)
+        if grid is None:
+            return None
+        map_id = _key(map_id)
+        now = datetime.now(timezone.utc)
+        current = grid.within(latitude, longitude, radius, now)
+        cursor = self.cursor(map_id, latitude, longitude, radius)
+
+        parsed = self._parse_cursor(since)
+        latest = self._log(map_id).since(parsed[0]) if parsed else None
+        if latest is None:
+            return {
+                "cursor": cursor,
+                "reset": True,
+                "added": [item for _, item in current],
+                "removed": [],
+            }
+
+        _, old_latitude, old_longitude, old_radius = parsed
+        previously_visible = {
+            item.id
+            for _, item in grid.within(
+                old_latitude, old_longitude, old_radius, now, include_expired=True
+            )
+        }
+        visible = {item.id for _, item in current}
+        added = [
+            item
+            for _, item in current
+            if item.id not in previously_visible or latest.get(item.id, ("",))[0] == "add"
+        ]
+        removed = previously_visible - visible
+        for item_id, (op, item) in latest.items():
+            # Removals we have no position for are always reported; clients ignore unknown ids
+            if op == "remove" and (
+                item is None
+                or haversine_meters(old_latitude, old_longitude, item.latitude, item.longitude)
+                <= old_radius
+            ):
+                removed.add(item_id)
+        return {"cursor": cursor, "reset": False, "added": added, "removed": list(removed)}
+
+
+item_index = ItemIndex(
+    cell_meters=settings.item_index_cell_meters,
+    max_age=settings.item_index_max_age_seconds,
+    enabled=settings.item_index_enabled,
+    change_retention=settings.item_index_change_retention,
+)
@@ -1,9 +1,61 @@
+import random
 from typing import Optional
 
 from databases import Database
 
+from app.core.statements import statements
+
+# Claim an item if still unowned and in range; see ItemService.collect
+statements.declare(
+    "collect_item",
+    """
+    WITH target AS (
+        SELECT id, owner_id, map_id, expires_at,
+               COALESCE(ST_DWithin(
+                   location::geography,
+                   ST_SetSRID(ST_MakePoint(CAST(:longitude AS float8), CAST(:latitude AS float8)), 4326)::geography,
+                   CAST(:max_distance AS float8)
+               ), false) as within_range
+        FROM items
+        WHERE id = :item_id
+    ),
+    claimed AS (
+        UPDATE items
+        SET owner_id = :player_id,
+            location = NULL
+        FROM target
+        WHERE items.id = target.id
+        AND items.owner_id IS NULL
+        AND target.within_range
+        RETURNING items.id
+    )
+    SELECT owner_id, map_id, expires_at, within_range,
+           EXISTS (SELECT 1 FROM claimed) as collected
+    FROM target
+    """,
+)
+
+
+def gems_awarded(item_type: str, subtype: str) -> int:
+    """Gems a player receives for using an item"""
+    if item_type == "Chest" and subtype == "Iron Crate":
+        return random.randint(5, 15)
+    # Other item effects would be implemented here
+    return 0
+
 
 class ItemService:
+    _CLEANUP_EXPIRED_QUERY = """
+    DELETE FROM items
+    WHERE id IN (
+        SELECT id FROM items
+        WHERE expires_at <= NOW() AND owner_id IS NULL
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, map_id, expires_at
+    """
+
     def __init__(self, db: Database):
         self.db = db
 
@@ -37,6 +89,34 @@ class ItemService:
 
         return result["within_range"] if result else False
 
+    async def collect(
+        self,
+        item_id,
+        player_id,
+        player_latitude: float,
+        player_longitude: float,
+        max_distance: float,
+    ):
+        """
+        Claim an item for a player in a single statement.
+
+        The claim only succeeds while the item is still unowned and within
+        ``max_distance`` meters; when two players race, the loser's UPDATE
+        re-checks ``owner_id`` after the winner commits and matches nothing.
+        Returns None if the item does not exist, otherwise a row with the
+        item's prior state and whether this call collected it.
+        """
+        return await statements.using(self.db).fetch_one(
+            "collect_item",
+            {
+                "item_id": item_id,
+                "player_id": player_id,
+                "longitude": player_longitude,
+                "latitude": player_latitude,
+                "max_distance": max_distance,
+            },
+        )
+
     async def spawn_random_item(
         self, map_id, item_type: str, subtype: str, latitude: float, longitude: float
     ):
@@ -62,12 +142,50 @@ class ItemService:
 
         return result["id"]
 
-    async def cleanup_expired_items(self):
-        """Remove expired items from the database"""
+    async def spawn_items(self, map_id, items: list, lifetime_hours: int):
+        """
+        Insert many items on a map with one multi-row INSERT.
+
+        ``items`` holds (type, subtype, latitude, longitude) tuples; returns the
+        inserted rows with their coordinates.
+        """
         query = """
-        DELETE FROM items
-        WHERE expires_at <= NOW() AND owner_id IS NULL
+        INSERT INTO items (type, subtype, map_id, location, expires_at)
+        SELECT u.type, u.subtype, CAST(:map_id AS uuid),
+               ST_SetSRID(ST_MakePoint(u.longitude, u.latitude), 4326),
+               CASE WHEN CAST(:lifetime_hours AS int) > 0
+                    THEN NOW() + make_interval(hours => CAST(:lifetime_hours AS int))
+                    ELSE NULL END
+        FROM unnest(
+            CAST(:types AS text[]),
+            CAST(:subtypes AS text[]),
+            CAST(:latitudes AS float8[]),
+            CAST(:longitudes AS float8[])
+        ) AS u(type, subtype, latitude, longitude)
+        RETURNING id, type, subtype, map_id, expires_at,
+                  ST_Y(location::geometry) as latitude,
+                  ST_X(location::geometry) as longitude
         """
 
-        result = await self.db.execute(query)
-        return result
+        return await self.db.fetch_all(
+            query,
+            {
+                "map_id": str(map_id),
+                "lifetime_hours": lifetime_hours,
+                "types": [item[0] for item in items],
+                "subtypes": [item[1] for item in items],
+                "latitudes": [item[2] for item in items],
+                "longitudes": [item[3] for item in items],
+            },
+        )
+
+    async def cleanup_expired_items(self, batch_size: int = 500):
+        """
+        Remove up to ``batch_size`` expired unowned items from the database.
+
+        Rows locked by a concurrent collector are skipped rather than waited
+        on. Returns the id and map of each deleted item.
+        """
+        return await self.db.fetch_all(
+            self._CLEANUP_EXPIRED_QUERY, {"batch_size": batch_size}
+        )
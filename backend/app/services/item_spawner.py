@@ -0,0 +1,241 @@
+import asyncio
+import json
+import logging
+import math
+import random
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from databases import Database
+
+from app.core.config import settings
+from app.database import database
+from app.services.change_bus import MAP, change_bus
+from app.services.item_index import METERS_PER_DEGREE, IndexedItem, item_index
+from app.services.item_service import ItemService
+from app.services.leader import LeaderLock
+from app.services.map_stats import map_stats
+
+logger = logging.getLogger(__name__)
+
+# Subtype given to procedurally spawned items of each type
+ITEM_SUBTYPES = {
+    "Potion": "Stun Brew",
+    "Gem": "Focus Crystal",
+    "Chest": "Iron Crate",
+    "Wand": "Oak Branch",
+    "Scroll": "Mirror Image",
+}
+
+
+def poisson_disc_sample(
+    center_latitude: float,
+    center_longitude: float,
+    radius_meters: float,
+    count: int,
+    min_distance: float,
+    existing: Sequence[Tuple[float, float]] = (),
+    rng: Optional[random.Random] = None,
+    attempts: int = 30,
+) -> List[Tuple[float, float]]:
+    """
+    Up to ``count`` (lat, lng) points inside a circle, none closer than
+    ``min_distance`` meters to each other or to ``existing`` points.
+
+    Dart throwing on a local tangent plane with a background grid, so each
+    candidate only checks its neighbouring cells.
+    """
+    rng = rng or random.Random()
+    meters_per_lng = METERS_PER_DEGREE * math.cos(math.radians(center_latitude))
+    cell = min_distance / math.sqrt(2)
+    grid: Dict[Tuple[int, int], List[Tuple[float, float]]] = {}
+
+    def insert(x: float, y: float):
+        grid.setdefault((math.floor(x / cell), math.floor(y / cell)), []).append((x, y))
+
+    def is_free(x: float, y: float) -> bool:
+        i, j = math.floor(x / cell), math.floor(y / cell)
+        for di in range(-2, 3):
+            for dj in range(-2, 3):
+                for px, py in grid.get((i + di, j + dj), ()):
+                    if (px - x) ** 2 + (py - y) ** 2 < min_distance**2:
+                        return False
+        return True
+
+    for latitude, longitude in existing:
+        insert(
+            (longitude - center_longitude) * meters_per_lng,
+            (latitude - center_latitude) * METERS_PER_DEGREE,
+        )
+
+    points = []
+    for _ in range(count * attempts):
+        if len(points) >= count:
+            break
+        distance = radius_meters * math.sqrt(rng.random())
+        angle = 2 * math.pi * rng.random()
+        x, y = distance * math.cos(angle), distance * math.sin(angle)
+        if is_free(x, y):
+            insert(x, y)
+            points.append(
+                (
+                    center_latitude + y / METERS_PER_DEGREE,
+                    center_longitude + x / meters_per_lng,
+                )
+            )
+    return points
+
+
+class ItemSpawner:
+    """
+    Background task keeping each configured map at its target item density.
+
+    Every tick it compares each map's live unowned items with the target from
+    ``map_spawn_settings``, and tops it up at no more than the map's respawn
+    rate with Poisson-disc placed items written in one INSERT per map.
+    Only the worker holding the ``item_spawner`` leader lock spawns each tick.
+    """
+
+    _SETTINGS_QUERY = """
+    SELECT map_id, center_latitude, center_longitude, radius_meters,
+           items_per_hectare, respawn_per_minute, item_lifetime_hours, type_weights
+    FROM map_spawn_settings
+    WHERE enabled
+    """
+
+    _POSITIONS_QUERY = """
+    SELECT ST_Y(location::geometry) as latitude,
+           ST_X(location::geometry) as longitude
+    FROM items
+    WHERE map_id = :map_id
+    AND owner_id IS NULL
+    AND (expires_at IS NULL OR expires_at > NOW())
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        interval: float = 10.0,
+        enabled: bool = False,
+        rng: Optional[random.Random] = None,
+    ):
+        self.db = db
+        self.interval = interval
+        self.enabled = enabled
+        self.rng = rng or random.Random()
+        self.leader = LeaderLock(db, "item_spawner")
+        self._credit: Dict[UUID, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def _existing_positions(self, map_id: UUID) -> List[Tuple[float, float]]:
+        grid = await item_index.ensure_loaded(self.db, map_id)
+        if grid is not None:
+            now = datetime.now(timezone.utc)
+            return [
+                (item.latitude, item.longitude)
+                for item in grid.items.values()
+                if not item.is_expired(now)
+            ]
+        rows = await self.db.fetch_all(self._POSITIONS_QUERY, {"map_id": map_id})
+        return [(row["latitude"], row["longitude"]) for row in rows]
+
+    def _budget(self, map_id: UUID, respawn_per_minute: int) -> int:
+        # Fractional spawns carry over between ticks, capped at a minute's worth
+        credit = self._credit.get(map_id, 0.0) + respawn_per_minute * self.interval / 60
+        credit = min(credit, float(max(respawn_per_minute, 1)))
+        self._credit[map_id] = credit
+        return int(credit)
+
+    async def spawn_for_map(self, spawn_settings) -> int:
+        map_id = spawn_settings["map_id"]
+        radius = spawn_settings["radius_meters"]
+        area = math.pi * radius**2
+        target = int(round(spawn_settings["items_per_hectare"] * area / 10000))
+        if target <= 0:
+            return 0
+
+        existing = await self._existing_positions(map_id)
+        budget = self._budget(map_id, spawn_settings["respawn_per_minute"])
+        wanted = min(target - len(existing), budget)
+        if wanted <= 0:
+            return 0
+
+        points = poisson_disc_sample(
+            spawn_settings["center_latitude"],
+            spawn_settings["center_longitude"],
+            radius,
+            wanted,
+            min_distance=0.5 * math.sqrt(area / target),
+            existing=existing,
+            rng=self.rng,
+        )
+        if not points:
+            return 0
+
+        weights = spawn_settings["type_weights"]
+        if isinstance(weights, str):
+            weights = json.loads(weights)
+        weights = {t: w for t, w in weights.items() if t in ITEM_SUBTYPES and w > 0}
+        if not weights:
+            return 0
+        types = self.rng.choices(list(weights), weights=list(weights.values()), k=len(points))
+
+        rows = await ItemService(self.db).spawn_items(
+            map_id,
+            [
+                (item_type, ITEM_SUBTYPES[item_type], latitude, longitude)
+                for item_type, (latitude, longitude) in zip(types, points)
+            ],
+            spawn_settings["item_lifetime_hours"],
+        )
+        for row in rows:
+            item_index.add(IndexedItem(**dict(row)))
+            map_stats.spawned(map_id, row["expires_at"])
+        if rows:
+            change_bus.publish(MAP, map_id=map_id)
+
+        self._credit[map_id] -= len(rows)
+        return len(rows)
+
+    async def tick(self) -> int:
+        async with self.leader.acquire() as is_leader:
+            if not is_leader:
+                return 0
+            spawned = 0
+            for spawn_settings in await self.db.fetch_all(self._SETTINGS_QUERY):
+                try:
+                    spawned += await self.spawn_for_map(spawn_settings)
+                except Exception:
+                    logger.exception(
+                        "Failed to spawn items on map %s", spawn_settings["map_id"]
+                    )
+            return spawned
+
+    async def _run(self):
+        while True:
+            try:
+                await self.tick()
+            except Exception:
+                logger.exception("Item spawner tick failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+item_spawner = ItemSpawner(
+    database,
+    interval=settings.item_spawner_interval_seconds,
+    enabled=settings.item_spawner_enabled,
+)
@@ -0,0 +1,37 @@
+import hashlib
+from contextlib import asynccontextmanager
+
+from databases import Database
+
+
+class LeaderLock:
+    """
+    Cluster-wide mutual exclusion for background jobs via a Postgres advisory lock.
+
+    Every worker runs the job loop, but only the one that wins the lock for
+    a given tick does the work. The lock is session-level and held on this
+    task's pooled connection, so queries issued while it is held may commit
+    independently (keeping each batch's row locks short).
+    """
+
+    def __init__(self, db: Database, name: str):
+        self.db = db
+        self.name = name
+        # Stable across processes, unlike hash()
+        self.key = int.from_bytes(
+            hashlib.sha256(name.encode()).digest()[:8], "big", signed=True
+        )
+
+    @asynccontextmanager
+    async def acquire(self):
+        async with self.db.connection() as connection:
+            acquired = await connection.fetch_val(
+                "SELECT pg_try_advisory_lock(:key)", {"key": self.key}
+            )
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    await connection.execute(
+                        "SELECT pg_advisory_unlock(:key)", {"key": self.key}
+                    )
@@ -0,0 +1,286 @@
+import asyncio
+import logging
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+from databases import Database
+
+from app.core.config import settings
+from app.database import database
+from app.services.item_index import _key
+
+logger = logging.getLogger(__name__)
+
+PLAYER_FIELDS = ("id", "name", "level", "wins", "losses")
+
+
+class MapBoard:
+    """
+    One map's players ordered by items held, then wins, then level.
+
+    Sort keys live in a sorted list, so rank lookups are a bisection and the
+    top N is a slice.
+    """
+
+    def __init__(self):
+        self._keys: List[tuple] = []
+        self._key_of: Dict[UUID, tuple] = {}
+        self.counts: Dict[UUID, int] = {}
+
+    @staticmethod
+    def _sort_key(player_id: UUID, count: int, player: dict) -> tuple:
+        return (-count, -player["wins"], -player["level"], player_id)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, player_id: UUID) -> bool:
+        return player_id in self._key_of
+
+    def set(self, player_id: UUID, count: int, player: dict):
+        old = self._key_of.pop(player_id, None)
+        if old is not None:
+            del self._keys[bisect_left(self._keys, old)]
+        if count > 0:
+            key = self._sort_key(player_id, count, player)
+            insort(self._keys, key)
+            self._key_of[player_id] = key
+            self.counts[player_id] = count
+        else:
+            self.counts.pop(player_id, None)
+
+    def top(self, limit: int) -> List[Tuple[UUID, int]]:
+        return [(key[-1], -key[0]) for key in self._keys[:limit]]
+
+    def rank(self, player_id: UUID) -> Optional[int]:
+        key = self._key_of.get(player_id)
+        if key is None:
+            return None
+        return bisect_left(self._keys, key) + 1
+
+
+class Leaderboard:
+    """
+    Per-map leaderboards maintained from collect/use events.
+
+    A map's board is loaded from ``items`` on first read. After that, collects
+    and uses adjust per-player counts in memory, and battle results
+    reposition players whose wins or level changed. Players first seen
+    through an event are resolved in one query on the next read.
+    ``reconcile`` rebuilds every loaded board from ``items`` every
+    ``interval`` seconds, so drift (e.g. from writes on other workers) never
+    outlives one period.
+    """
+
+    _BOARD_QUERY = """
+    SELECT p.id, p.name, p.level, p.wins, p.losses, COUNT(*) as items_collected
+    FROM items i
+    JOIN profiles p ON p.id = i.owner_id
+    WHERE i.map_id = :map_id AND i.owner_id IS NOT NULL
+    GROUP BY p.id, p.name, p.level, p.wins, p.losses
+    """
+
+    _PLAYERS_QUERY = """
+    SELECT id, name, level, wins, losses
+    FROM profiles
+    WHERE id = ANY(CAST(:ids AS uuid[]))
+    """
+
+    def __init__(self, db: Database, interval: float = 300.0, enabled: bool = True):
+        self.db = db
+        self.interval = interval
+        self.enabled = enabled
+        self._boards: Dict[UUID, MapBoard] = {}
+        self._players: Dict[UUID, dict] = {}
+        self._pending: Dict[UUID, Counter] = {}
+        # Adjustments made while a map's board is being read from ``items``
+        self._racing: Dict[UUID, Counter] = {}
+        self._loading: Dict[UUID, asyncio.Task] = {}
+        self._stale: Set[UUID] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    # Events
+
+    def adjust(self, map_id, player_id, delta: int):
+        """A player gained (``delta`` > 0) or lost items held on a map"""
+        if map_id is None:
+            return
+        map_id, player_id = _key(map_id), _key(player_id)
+        racing = self._racing.get(map_id)
+        if racing is not None:
+            racing[player_id] += delta
+        board = self._boards.get(map_id)
+        if board is None:
+            return
+        player = self._players.get(player_id)
+        if player is None:
+            self._pending.setdefault(map_id, Counter())[player_id] += delta
+            return
+        board.set(player_id, board.counts.get(player_id, 0) + delta, player)
+
+    def update_player(self, row):
+        """New name/level/wins/losses for a player, e.g. after a battle"""
+        player_id = _key(row["id"])
+        if player_id not in self._players:
+            return
+        player = {field: row[field] for field in PLAYER_FIELDS}
+        self._players[player_id] = player
+        for board in self._boards.values():
+            if player_id in board:
+                board.set(player_id, board.counts[player_id], player)
+
+    def forget_player(self, player_id):
+        """Take a player off every board, e.g. after their items were deleted"""
+        player_id = _key(player_id)
+        for board in self._boards.values():
+            board.set(player_id, 0, {})
+        for pending in (*self._pending.values(), *self._racing.values()):
+            pending.pop(player_id, None)
+
+    def invalidate(self, map_id=None):
+        """Rebuild one map's board (or all boards) from ``items`` on next read"""
+        if map_id is None:
+            self._stale.update(self._boards)
+        else:
+            self._stale.add(_key(map_id))
+
+    def invalidate_player(self, player_id):
+        """Re-read a player's name/level/wins/losses on next read of their boards"""
+        player_id = _key(player_id)
+        if self._players.pop(player_id, None) is None:
+            return
+        for map_id, board in self._boards.items():
+            if player_id in board:
+                # A zero delta resolves the player and repositions them
+                self._pending.setdefault(map_id, Counter())[player_id] += 0
+
+    # Reads
+
+    async def top(self, map_id, limit: int = 10) -> List[dict]:
+        board, players = await self._board(_key(map_id))
+        return [
+            {**players[player_id], "items_collected": count}
+            for player_id, count in board.top(limit)
+        ]
+
+    async def standing(self, map_id, player_id) -> Optional[dict]:
+        player_id = _key(player_id)
+        board, players = await self._board(_key(map_id))
+        rank = board.rank(player_id)
+        if rank is None:
+            return None
+        return {
+            **players[player_id],
+            "items_collected": board.counts[player_id],
+            "rank": rank,
+            "players": len(board),
+        }
+
+    async def _board(self, map_id: UUID) -> Tuple[MapBoard, Dict[UUID, dict]]:
+        if not self.enabled:
+            return await self._load(map_id)
+        board = self._boards.get(map_id)
+        if board is None or map_id in self._stale:
+            board = await self._ensure_loaded(map_id)
+        if self._pending.get(map_id):
+            await self._resolve(map_id, board)
+        return board, self._players
+
+    async def _ensure_loaded(self, map_id: UUID) -> MapBoard:
+        # Concurrent first reads share one load
+        task = self._loading.get(map_id)
+        if task is None:
+            task = asyncio.ensure_future(self._install(map_id))
+            self._loading[map_id] = task
+            task.add_done_callback(lambda _: self._loading.pop(map_id, None))
+        return await task
+
+    async def _load(self, map_id: UUID) -> Tuple[MapBoard, Dict[UUID, dict]]:
+        rows = await self.db.fetch_all(self._BOARD_QUERY, {"map_id": map_id})
+        board = MapBoard()
+        players = {}
+        for row in rows:
+            player = {field: row[field] for field in PLAYER_FIELDS}
+            players[player["id"]] = player
+            board.set(player["id"], row["items_collected"], player)
+        return board, players
+
+    async def _install(self, map_id: UUID) -> MapBoard:
+        # Adjustments made while the snapshot is being read are replayed on top of it
+        self._racing[map_id] = Counter()
+        self._stale.discard(map_id)
+        try:
+            board, players = await self._load(map_id)
+        finally:
+            racing = self._racing.pop(map_id)
+        self._players.update(players)
+        self._boards[map_id] = board
+        # Anything pending before the load is in the snapshot; what raced it
+        # is applied (resolving new players) on the next read
+        self._pending.pop(map_id, None)
+        if racing:
+            self._pending[map_id] = racing
+        return board
+
+    async def _resolve(self, map_id: UUID, board: MapBoard):
+        pending = self._pending.pop(map_id)
+        unknown = [player_id for player_id in pending if player_id not in self._players]
+        if unknown:
+            rows = await self.db.fetch_all(
+                self._PLAYERS_QUERY, {"ids": [str(player_id) for player_id in unknown]}
+            )
+            for row in rows:
+                self._players[_key(row["id"])] = {
+                    field: row[field] for field in PLAYER_FIELDS
+                }
+        for player_id, delta in pending.items():
+            player = self._players.get(player_id)
+            if player is not None:
+                board.set(player_id, board.counts.get(player_id, 0) + delta, player)
+
+    # Reconciliation
+
+    async def reconcile(self) -> int:
+        """Rebuild every loaded board from ``items``; returns how many"""
+        for map_id in list(self._boards):
+            await self._ensure_loaded(map_id)
+        self._prune_players()
+        return len(self._boards)
+
+    def _prune_players(self):
+        on_boards: Set[UUID] = set()
+        for board in self._boards.values():
+            on_boards.update(board.counts)
+        for player_id in list(self._players):
+            if player_id not in on_boards:
+                del self._players[player_id]
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.reconcile()
+            except Exception:
+                logger.exception("Leaderboard reconciliation failed")
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+leaderboard = Leaderboard(
+    database,
+    interval=settings.leaderboard_reconcile_interval_seconds,
+    enabled=settings.leaderboard_enabled,
+)
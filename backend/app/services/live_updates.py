@@ -0,0 +1,118 @@
+import asyncio
+import json
+from datetime import datetime
+from typing import Dict, Optional, Set
+from uuid import UUID
+
+from app.core.config import settings
+from app.services.item_index import IndexedItem, haversine_meters, item_index
+
+# Queued in place of a subscriber's backlog when it cannot keep up
+EVICTED = None
+
+
+def _encode(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+class Subscriber:
+    """One live connection watching a map, optionally around a position"""
+
+    __slots__ = ("map_id", "latitude", "longitude", "radius", "queue", "evicted")
+
+    def __init__(
+        self,
+        map_id: UUID,
+        queue_size: int,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        radius: Optional[float] = None,
+    ):
+        self.map_id = map_id
+        self.latitude = latitude
+        self.longitude = longitude
+        self.radius = radius
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.evicted = False
+
+    def move(self, latitude: float, longitude: float, radius: Optional[float] = None):
+        self.latitude = latitude
+        self.longitude = longitude
+        if radius is not None:
+            self.radius = radius
+
+    def wants(self, item: Optional[IndexedItem]) -> bool:
+        if item is None or self.radius is None or self.latitude is None:
+            return True
+        distance = haversine_meters(
+            self.latitude, self.longitude, item.latitude, item.longitude
+        )
+        return distance <= self.radius
+
+
+class LiveHub:
+    """
+    Per-map fan-out of item events to connected clients.
+
+    Each event is encoded once and offered to every subscriber's bounded
+    queue without awaiting. A subscriber whose queue is full has its backlog
+    dropped and is evicted, so a slow client never holds up the others.
+    """
+
+    def __init__(self, queue_size: int = 64):
+        self.queue_size = queue_size
+        self._subscribers: Dict[UUID, Set[Subscriber]] = {}
+        self.evictions = 0
+
+    def subscribe(self, map_id: UUID, **position) -> Subscriber:
+        subscriber = Subscriber(map_id, self.queue_size, **position)
+        self._subscribers.setdefault(map_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscribers = self._subscribers.get(subscriber.map_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[subscriber.map_id]
+
+    def subscriber_count(self, map_id: Optional[UUID] = None) -> int:
+        if map_id is not None:
+            return len(self._subscribers.get(map_id, ()))
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def publish(
+        self, event: str, map_id: UUID, item_id: UUID, item: Optional[IndexedItem]
+    ):
+        subscribers = self._subscribers.get(map_id)
+        if not subscribers:
+            return
+
+        message = json.dumps(
+            {
+                "event": event,
+                "map_id": str(map_id),
+                "item_id": str(item_id),
+                "item": item.to_dict() if item is not None and event == "spawned" else None,
+            },
+            default=_encode,
+        )
+        for subscriber in list(subscribers):
+            if subscriber.evicted or not subscriber.wants(item):
+                continue
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self._evict(subscriber)
+
+    def _evict(self, subscriber: Subscriber):
+        subscriber.evicted = True
+        self.evictions += 1
+        self.unsubscribe(subscriber)
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(EVICTED)
+
+
+live_hub = LiveHub(queue_size=settings.live_queue_size)
+item_index.add_listener(live_hub.publish)
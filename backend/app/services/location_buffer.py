@@ -0,0 +1,99 @@
+import asyncio
+import logging
+from typing import Dict, Optional, Set, Tuple
+from uuid import UUID
+
+from databases import Database
+
+from app.core.config import settings
+from app.core.statements import statements
+from app.database import database
+from app.services.location_service import LocationService
+
+logger = logging.getLogger(__name__)
+
+statements.declare("player_exists", "SELECT 1 FROM profiles WHERE id = :player_id")
+
+
+class LocationBuffer:
+    """
+    Write-behind buffer for player GPS fixes.
+
+    Only the latest fix per player is kept; a background task writes every
+    dirty player in one set-based UPDATE each ``interval`` seconds, and the
+    buffer is drained on shutdown.
+    """
+
+    def __init__(self, db: Database, interval: float = 0.25, enabled: bool = True):
+        self.db = db
+        self.interval = interval
+        self.enabled = enabled
+        self._dirty: Dict[UUID, Tuple[float, float]] = {}
+        self._known: Set[UUID] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    async def player_exists(self, player_id: UUID) -> bool:
+        if player_id in self._known:
+            return True
+        row = await statements.using(self.db).fetch_one(
+            "player_exists", {"player_id": player_id}
+        )
+        if row:
+            self._known.add(player_id)
+        return row is not None
+
+    def record(self, player_id: UUID, latitude: float, longitude: float):
+        self._dirty[player_id] = (latitude, longitude)
+
+    def position(self, player_id: UUID) -> Optional[Tuple[float, float]]:
+        """Latest buffered (lat, lng) not yet written to Postgres"""
+        return self._dirty.get(player_id)
+
+    def forget(self, player_id: UUID):
+        self._dirty.pop(player_id, None)
+        self._known.discard(player_id)
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            if not self._dirty:
+                return 0
+            batch, self._dirty = self._dirty, {}
+            try:
+                await LocationService(self.db).bulk_update_player_locations(batch)
+            except BaseException:
+                # Keep fixes that have not been superseded for the next attempt;
+                # also on cancellation, so stop() still drains them
+                for player_id, position in batch.items():
+                    self._dirty.setdefault(player_id, position)
+                raise
+            return len(batch)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to flush buffered player locations")
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+location_buffer = LocationBuffer(
+    database,
+    interval=settings.location_flush_interval_ms / 1000,
+    enabled=settings.location_buffer_enabled,
+)
@@ -2,37 +2,52 @@ from typing import Optional
 
 from databases import Database
 
+from app.core.statements import statements
+
+statements.declare(
+    "flush_locations",
+    """
+    UPDATE profiles AS p
+    SET location = ST_SetSRID(ST_MakePoint(u.longitude, u.latitude), 4326)
+    FROM unnest(
+        CAST(:ids AS uuid[]),
+        CAST(:latitudes AS float8[]),
+        CAST(:longitudes AS float8[])
+    ) AS u(id, latitude, longitude)
+    WHERE p.id = u.id
+    """,
+)
+
 
 class LocationService:
     def __init__(self, db: Database):
         self.db = db
 
-    async def update_owned_items_location(
-        self, player_id, latitude: float, longitude: float
-    ):
-        """Update all items owned by a player to match the player's location"""
-        query = """
-        UPDATE items
-        SET location = ST_SetSRID(ST_MakePoint(CAST(:longitude AS float8), CAST(:latitude AS float8)), 4326)
-        WHERE owner_id = :player_id
-        """
-
-        await self.db.execute(
-            query,
-            {"longitude": longitude, "latitude": latitude, "player_id": player_id},
+    async def bulk_update_player_locations(self, positions: dict):
+        """Move many players at once; ``positions`` maps player id to (lat, lng)"""
+        ids = list(positions)
+        await statements.using(self.db).execute(
+            "flush_locations",
+            {
+                "ids": [str(player_id) for player_id in ids],
+                "latitudes": [positions[player_id][0] for player_id in ids],
+                "longitudes": [positions[player_id][1] for player_id in ids],
+            },
         )
 
     async def calculate_distance(
         self, item_id, player_latitude: float, player_longitude: float
     ) -> Optional[float]:
         """Calculate distance between an item and player in meters"""
+        # Owned items have no location of their own and sit with their owner
         query = """
         SELECT ST_Distance(
-            location::geography,
+            COALESCE(i.location, p.location)::geography,
             ST_SetSRID(ST_MakePoint(CAST(:longitude AS float8), CAST(:latitude AS float8)), 4326)::geography
         ) as distance
-        FROM items
-        WHERE id = :item_id
+        FROM items i
+        LEFT JOIN profiles p ON p.id = i.owner_id
+        WHERE i.id = :item_id
         """
 
         result = await self.db.fetch_one(
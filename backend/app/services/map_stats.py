@@ -0,0 +1,329 @@
+import asyncio
+import logging
+import time
+import heapq
+import math
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Set
+from uuid import UUID
+
+from databases import Database
+
+from app.core.config import settings
+from app.database import database
+from app.services.item_index import _key
+
+logger = logging.getLogger(__name__)
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[float]:
+    return None if value is None else value.timestamp()
+
+
+def _minute(timestamp: float) -> int:
+    """The minute boundary at or after ``timestamp``, in minutes since the epoch"""
+    return math.ceil(timestamp / 60)
+
+
+class MapCounters:
+    """
+    Live item counts for one map, plus a per-minute history.
+
+    Expiry is time-driven. Items already expired are a plain count; later
+    expiries are counted per minute, keyed by the minute boundary at or
+    after the expiry time, and each minute's count joins the expired count
+    once the clock passes that boundary. Expired counts can therefore lag
+    by up to a minute, and a map costs one counter per distinct minute
+    rather than one timestamp per item. Read times never go backwards.
+    """
+
+    def __init__(self, history_minutes: int, now: float):
+        self.total = 0
+        self.available = 0
+        self.owners: Counter = Counter()
+        self.expired_base = 0
+        # Minute boundary -> items expiring within the minute before it
+        self.upcoming: Dict[int, int] = {}
+        self._due: List[int] = []
+        self.history: deque = deque(maxlen=history_minutes)
+        self.minute = int(now // 60)
+        self.events: Counter = Counter()
+
+    def expired(self, now: float) -> int:
+        while self._due and self._due[0] * 60 <= now:
+            self.expired_base += self.upcoming.pop(heapq.heappop(self._due), 0)
+        return self.expired_base
+
+    def set_upcoming(self, upcoming: Dict[int, int]):
+        self.upcoming = dict(upcoming)
+        self._due = list(self.upcoming)
+        heapq.heapify(self._due)
+
+    def snapshot(self, now: float) -> dict:
+        return {
+            "total": self.total,
+            "available": self.available,
+            "collected": self.total - self.available,
+            "expired": self.expired(now),
+            "active_players": len(self.owners),
+        }
+
+    def roll(self, now: float):
+        """Close every whole minute before ``now`` into the history"""
+        current = int(now // 60)
+        # Minutes older than the history window would be dropped anyway
+        self.minute = max(self.minute, current - self.history.maxlen)
+        while self.minute < current:
+            end = (self.minute + 1) * 60
+            self.history.append(
+                {
+                    "minute": datetime.fromtimestamp(self.minute * 60, timezone.utc),
+                    **self.snapshot(end - 1e-6),
+                    "spawned": self.events["spawned"],
+                    "collected_events": self.events["collected"],
+                    "removed": self.events["removed"],
+                }
+            )
+            self.events.clear()
+            self.minute += 1
+
+    def add_expiry(self, expires_at: Optional[float], now: float):
+        if expires_at is None:
+            return
+        if expires_at <= now:
+            self.expired_base += 1
+            return
+        minute = _minute(expires_at)
+        if minute not in self.upcoming:
+            heapq.heappush(self._due, minute)
+        self.upcoming[minute] = self.upcoming.get(minute, 0) + 1
+
+    def drop_expiry(self, expires_at: Optional[float]):
+        if expires_at is None:
+            return
+        minute = _minute(expires_at)
+        if self.upcoming.get(minute, 0) > 0:
+            # Emptied minutes stay queued and count nothing when due
+            self.upcoming[minute] -= 1
+        elif self.expired_base > 0:
+            self.expired_base -= 1
+
+    def spawned(self, expires_at: Optional[float], now: float):
+        self.total += 1
+        self.available += 1
+        self.add_expiry(expires_at, now)
+
+    def collected(self, player_id: UUID):
+        self.available -= 1
+        self.owners[player_id] += 1
+
+    def removed(self, owner_id: Optional[UUID], expires_at: Optional[float]):
+        self.total -= 1
+        if owner_id is None:
+            self.available -= 1
+        else:
+            self.owners[owner_id] -= 1
+            if self.owners[owner_id] <= 0:
+                del self.owners[owner_id]
+        self.drop_expiry(expires_at)
+
+
+class MapStats:
+    """
+    Per-map item statistics kept current by item events.
+
+    A map's counters are loaded on first read. After that, spawn, collect,
+    use, delete and expiry events update them in memory, and
+    ``GET /maps/{id}/stats`` never scans ``items``. ``reconcile`` reloads
+    every loaded map every ``interval`` seconds so counts cannot drift (e.g.
+    from writes on other workers). History rows are closed lazily on the
+    next event or read, so idle maps cost nothing.
+    """
+
+    # Upcoming expiries come back per minute (see ``MapCounters``), so a
+    # reload ships at most one row per minute of item lifetime
+    _COUNTS_QUERY = """
+    WITH upcoming AS (
+        SELECT CAST(CEIL(EXTRACT(EPOCH FROM expires_at) / 60) AS bigint) as minute,
+               COUNT(*) as items
+        FROM items
+        WHERE map_id = :map_id AND expires_at > NOW()
+        GROUP BY 1
+    )
+    SELECT COUNT(*) as total,
+           COUNT(*) FILTER (WHERE owner_id IS NULL) as available,
+           COUNT(*) FILTER (WHERE expires_at <= NOW()) as expired,
+           (SELECT COALESCE(array_agg(minute ORDER BY minute), '{}') FROM upcoming)
+               as upcoming_minutes,
+           (SELECT COALESCE(array_agg(items ORDER BY minute), '{}') FROM upcoming)
+               as upcoming_items
+    FROM items
+    WHERE map_id = :map_id
+    """
+
+    _OWNERS_QUERY = """
+    SELECT owner_id, COUNT(*) as items
+    FROM items
+    WHERE map_id = :map_id AND owner_id IS NOT NULL
+    GROUP BY owner_id
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        interval: float = 60.0,
+        history_minutes: int = 360,
+        enabled: bool = True,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.db = db
+        self.interval = interval
+        self.history_minutes = history_minutes
+        self.enabled = enabled
+        self.clock = clock
+        self._maps: Dict[UUID, MapCounters] = {}
+        self._loading: Dict[UUID, asyncio.Task] = {}
+        # Events seen while a map's counters are being read from ``items``
+        self._racing: Dict[UUID, list] = {}
+        self._stale: Set[UUID] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def _counters(self, map_id) -> Optional[MapCounters]:
+        if map_id is None:
+            return None
+        counters = self._maps.get(_key(map_id))
+        if counters is not None:
+            counters.roll(self.clock())
+        return counters
+
+    # Events
+
+    def spawned(self, map_id, expires_at: Optional[datetime] = None):
+        self._event(map_id, "spawned", MapCounters.spawned, _timestamp(expires_at), self.clock())
+
+    def collected(self, map_id, player_id):
+        self._event(map_id, "collected", MapCounters.collected, _key(player_id))
+
+    def removed(self, map_id, owner_id=None, expires_at: Optional[datetime] = None):
+        """An item was used, deleted or reaped"""
+        owner_id = None if owner_id is None else _key(owner_id)
+        self._event(map_id, "removed", MapCounters.removed, owner_id, _timestamp(expires_at))
+
+    def _event(self, map_id, name: str, apply: Callable, *args):
+        if map_id is None:
+            return
+        racing = self._racing.get(_key(map_id))
+        if racing is not None:
+            racing.append((apply, args))
+        counters = self._counters(map_id)
+        if counters is None:
+            return
+        apply(counters, *args)
+        counters.events[name] += 1
+
+    def invalidate(self, map_id=None):
+        """Reload one map's counters (or all) from ``items`` on next read"""
+        if map_id is None:
+            self._stale.update(self._maps)
+        else:
+            self._stale.add(_key(map_id))
+
+    # Reads
+
+    async def current(self, map_id) -> dict:
+        map_id = _key(map_id)
+        counters = await self._get(map_id)
+        return counters.snapshot(self.clock())
+
+    async def history(self, map_id, minutes: int = 60) -> List[dict]:
+        """Closed per-minute rows, oldest first, for at most ``minutes``"""
+        counters = await self._get(_key(map_id))
+        counters.roll(self.clock())
+        rows = list(counters.history)
+        return rows[-minutes:] if minutes > 0 else []
+
+    async def _get(self, map_id: UUID) -> MapCounters:
+        if not self.enabled:
+            return await self._load(map_id)
+        counters = self._counters(map_id)
+        if counters is not None and map_id not in self._stale:
+            return counters
+        return await self._ensure_loaded(map_id)
+
+    async def _ensure_loaded(self, map_id: UUID) -> MapCounters:
+        # Concurrent first reads share one load
+        task = self._loading.get(map_id)
+        if task is None:
+            task = asyncio.ensure_future(self._install(map_id))
+            self._loading[map_id] = task
+            task.add_done_callback(lambda _: self._loading.pop(map_id, None))
+        return await task
+
+    async def _load(self, map_id: UUID, previous: Optional[MapCounters] = None) -> MapCounters:
+        values = {"map_id": map_id}
+        counts = await self.db.fetch_one(self._COUNTS_QUERY, values)
+        owners = await self.db.fetch_all(self._OWNERS_QUERY, values)
+
+        now = self.clock()
+        counters = MapCounters(self.history_minutes, now)
+        if previous is not None:
+            previous.roll(now)
+            counters.history = previous.history
+            counters.minute = previous.minute
+            counters.events = previous.events
+        counters.total = counts["total"]
+        counters.available = counts["available"]
+        counters.expired_base = counts["expired"]
+        counters.set_upcoming(dict(zip(counts["upcoming_minutes"], counts["upcoming_items"])))
+        counters.owners = Counter({_key(row["owner_id"]): row["items"] for row in owners})
+        return counters
+
+    async def _install(self, map_id: UUID) -> MapCounters:
+        # Events seen while the snapshot is being read are replayed on top of
+        # it; the old counters already counted them in the history
+        self._racing[map_id] = []
+        self._stale.discard(map_id)
+        try:
+            counters = await self._load(map_id, self._maps.get(map_id))
+        finally:
+            racing = self._racing.pop(map_id)
+        for apply, args in racing:
+            apply(counters, *args)
+        self._maps[map_id] = counters
+        return counters
+
+    async def reconcile(self) -> int:
+        """Reload every loaded map's counters; returns how many"""
+        for map_id in list(self._maps):
+            await self._ensure_loaded(map_id)
+        return len(self._maps)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.reconcile()
+            except Exception:
+                logger.exception("Map stats reconciliation failed")
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+map_stats = MapStats(
+    database,
+    interval=settings.map_stats_reconcile_interval_seconds,
+    history_minutes=settings.map_stats_history_minutes,
+    enabled=settings.map_stats_enabled,
+)
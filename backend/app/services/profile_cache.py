@@ -0,0 +1,136 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+from uuid import UUID
+
+from app.core.config import settings
+from app.services.item_index import _key
+
+
+class ProfileCache:
+    """
+    Bounded read-through cache of profile rows, keyed by id and by name.
+
+    Entries are evicted least-recently-used beyond ``max_entries`` and
+    expire ``ttl`` seconds after they were loaded. Every writer to
+    ``profiles`` must call ``invalidate`` (or ``update_position`` for GPS
+    fixes, which keeps the entry). Rows are plain dicts as returned by the
+    profile queries: id, name, description, level, wins, losses, gems,
+    latitude, longitude.
+
+    Readers take ``version`` before querying and pass it to ``put``, so a
+    row read before a concurrent invalidation is not cached.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        ttl: float = 30.0,
+        enabled: bool = True,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = enabled
+        self.clock = clock
+        self._entries: "OrderedDict[UUID, Tuple[float, dict]]" = OrderedDict()
+        self._names: Dict[str, UUID] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.version = 0
+
+    def get(self, player_id) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        player_id = _key(player_id)
+        entry = self._entries.get(player_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        loaded_at, row = entry
+        if self.clock() - loaded_at > self.ttl:
+            self._drop(player_id)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(player_id)
+        self.hits += 1
+        return row
+
+    def get_by_name(self, name: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        player_id = self._names.get(name)
+        if player_id is None:
+            self.misses += 1
+            return None
+        return self.get(player_id)
+
+    def put(self, row, version: Optional[int] = None) -> dict:
+        """Cache a profile row read at ``version``; returns it as a dict"""
+        row = dict(row)
+        if not self.enabled or (version is not None and version != self.version):
+            return row
+        player_id = _key(row["id"])
+        self._drop(player_id)
+        self._entries[player_id] = (self.clock(), row)
+        self._names[row["name"]] = player_id
+        while len(self._entries) > self.max_entries:
+            oldest, (_, evicted) = self._entries.popitem(last=False)
+            self._forget_name(oldest, evicted["name"])
+            self.evictions += 1
+        return row
+
+    def update_position(self, player_id, latitude: float, longitude: float):
+        """Apply a GPS fix to a cached profile without reloading it"""
+        entry = self._entries.get(_key(player_id))
+        if entry is not None:
+            entry[1]["latitude"] = latitude
+            entry[1]["longitude"] = longitude
+
+    def invalidate(self, *player_ids):
+        self.version += 1
+        for player_id in player_ids:
+            if self._drop(_key(player_id)):
+                self.invalidations += 1
+
+    def clear(self):
+        self.version += 1
+        self._entries.clear()
+        self._names.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+    def _drop(self, player_id: UUID) -> bool:
+        entry = self._entries.pop(player_id, None)
+        if entry is None:
+            return False
+        self._forget_name(player_id, entry[1]["name"])
+        return True
+
+    def _forget_name(self, player_id: UUID, name: str):
+        if self._names.get(name) == player_id:
+            del self._names[name]
+
+
+profile_cache = ProfileCache(
+    max_entries=settings.profile_cache_max_entries,
+    ttl=settings.profile_cache_ttl_seconds,
+    enabled=settings.profile_cache_enabled,
+)
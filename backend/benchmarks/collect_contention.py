@@ -0,0 +1,95 @@
+"""
+Race N clients for the same item and measure collection throughput.
+
+Each round spawns one item and fires N concurrent POST /api/items/collect
+calls for it from N different players standing on top of it. Exactly one
+must succeed; any round with more or fewer winners is a correctness failure.
+
+Run against a live backend (e.g. ``docker compose up``):
+
+    python -m benchmarks.collect_contention --base-url http://localhost:8000 \\
+        --clients 50 --rounds 200
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+import httpx
+
+from benchmarks.common import create_map, create_players, percentile
+
+LATITUDE = 33.9510
+LONGITUDE = -83.3753
+
+
+async def race(client: httpx.AsyncClient, map_id: str, players: list, latencies: list) -> Counter:
+    spawned = await client.post(
+        "/api/items/spawn",
+        json={
+            "type": "Chest",
+            "subtype": "Iron Crate",
+            "map_id": map_id,
+            "latitude": LATITUDE,
+            "longitude": LONGITUDE,
+        },
+    )
+    item_id = spawned.json()["item_id"]
+
+    async def collect(player):
+        start = time.perf_counter()
+        response = await client.post(
+            "/api/items/collect",
+            json={
+                "item_id": item_id,
+                "player_id": player["id"],
+                "player_latitude": LATITUDE,
+                "player_longitude": LONGITUDE,
+            },
+        )
+        latencies.append(time.perf_counter() - start)
+        if response.status_code == 200:
+            return "collected"
+        return response.json().get("detail", str(response.status_code))
+
+    return Counter(await asyncio.gather(*(collect(player) for player in players)))
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30) as client:
+        map_data = await create_map(client, "contention-bench")
+        players = await create_players(client, "racer", args.clients)
+
+        latencies = []
+        outcomes = Counter()
+        bad_rounds = 0
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            result = await race(client, map_data["id"], players, latencies)
+            outcomes.update(result)
+            if result["collected"] != 1:
+                bad_rounds += 1
+        elapsed = time.perf_counter() - start
+
+    total = args.rounds * args.clients
+    print(f"{args.rounds} rounds x {args.clients} clients in {elapsed:.2f}s")
+    print(f"collect attempts/s: {total / elapsed:.1f}")
+    print(
+        "latency ms: "
+        f"p50={percentile(latencies, 50) * 1000:.1f} "
+        f"p95={percentile(latencies, 95) * 1000:.1f} "
+        f"p99={percentile(latencies, 99) * 1000:.1f}"
+    )
+    for outcome, count in outcomes.most_common():
+        print(f"  {outcome}: {count}")
+    print(f"rounds with != 1 winner: {bad_rounds}")
+    return 1 if bad_rounds else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=100)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
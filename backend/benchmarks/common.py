@@ -0,0 +1,68 @@
+import math
+import time
+import uuid
+from typing import Dict, List, Sequence
+
+import httpx
+
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of ``samples`` (``pct`` in 0-100)"""
+    if not samples:
+        return float("nan")
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies: Dict[str, List[float]], elapsed: float) -> str:
+    """Per-endpoint throughput and p50/p95/p99 (milliseconds) as a table"""
+    lines = [
+        f"{'endpoint':<32}{'count':>8}{'req/s':>10}{'p50':>9}{'p95':>9}{'p99':>9}"
+    ]
+    for name in sorted(latencies):
+        samples = latencies[name]
+        lines.append(
+            f"{name:<32}{len(samples):>8}{len(samples) / elapsed:>10.1f}"
+            f"{percentile(samples, 50) * 1000:>9.1f}"
+            f"{percentile(samples, 95) * 1000:>9.1f}"
+            f"{percentile(samples, 99) * 1000:>9.1f}"
+        )
+    return "\n".join(lines)
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+async def create_map(client: httpx.AsyncClient, label: str) -> dict:
+    """Create a throwaway institution and map to run a benchmark on"""
+    suffix = uuid.uuid4().hex[:8]
+    institution = (
+        await client.post(
+            "/api/institutions",
+            json={"name": f"{label}-{suffix}", "password": suffix},
+        )
+    ).json()
+    return (
+        await client.post(
+            "/api/maps",
+            json={"name": f"{label} map", "institution_id": institution["id"]},
+        )
+    ).json()
+
+
+async def create_players(client: httpx.AsyncClient, label: str, count: int) -> List[dict]:
+    suffix = uuid.uuid4().hex[:8]
+    players = []
+    for i in range(count):
+        response = await client.post(
+            "/api/auth/user/login", json={"name": f"{label}-{suffix}-{i}"}
+        )
+        players.append(response.json())
+    return players
@@ -0,0 +1,454 @@
+"""
+Bulk-load a large synthetic dataset for scale testing.
+
+Generates institutions, maps, profiles, ``map_access`` grants, items and
+``battle_logs`` in the volumes given on the command line and streams them
+into Postgres with ``COPY``. Rows are generated in fixed-size chunks by a
+pool of worker processes while the main process copies finished chunks over
+several connections, so tens of millions of rows load in minutes.
+
+The data is shaped like the real game:
+
+- every institution sits on a real campus and its maps lie around it
+- unowned items cluster around a few hotspots per map, with some scattered
+  over the whole map; maps differ in size, a few being much busier
+- their expiry follows a steady spawn rate: most expire within the next
+  day, some already have (waiting for the reaper) and some never do
+- owned items belong to players with access to the item's map and, as
+  owned items do, have no location of their own
+- a few players are much more active than the rest, and they fight
+  players from their own map
+
+Output is deterministic: each chunk is generated from the seed, its table
+and its position alone, and ids are derived from the seed and row number.
+Timestamps are relative to ``--now``, which defaults to the start of the
+current hour; pass it explicitly for byte-identical data.
+
+Secondary indexes on the loaded tables are dropped for the load and rebuilt
+afterwards (unless ``--keep-indexes``), then the tables are analyzed. Run it
+with the backend stopped:
+
+    python -m benchmarks.dataset --players 1000000 --items 20000000 \\
+        --battles 5000000 --seed 42
+"""
+import argparse
+import asyncio
+import io
+import math
+import os
+import random
+import time
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import asyncpg
+
+from app.database import DATABASE_URL
+from app.services.item_spawner import ITEM_SUBTYPES
+
+METERS_PER_DEGREE = 111_320.0
+
+CAMPUSES = (
+    ("University of Georgia", 33.9480, -83.3773),
+    ("Georgia Tech", 33.7756, -84.3963),
+    ("Emory University", 33.7925, -84.3240),
+    ("University of Michigan", 42.2780, -83.7382),
+    ("UT Austin", 30.2849, -97.7341),
+    ("UCLA", 34.0689, -118.4452),
+    ("Stanford University", 37.4275, -122.1697),
+    ("MIT", 42.3601, -71.0942),
+)
+
+# Same defaults as map_spawn_settings.type_weights
+TYPE_WEIGHTS = {"Potion": 3, "Gem": 2, "Chest": 1, "Wand": 1, "Scroll": 2}
+
+# Loaded together in this order; tables in one phase only reference earlier ones
+PHASES = (
+    ("institutions", "maps"),
+    ("profiles",),
+    ("map_access", "items", "battle_logs"),
+)
+
+COLUMNS = {
+    "institutions": ("id", "name", "password_hash"),
+    "maps": ("id", "name", "institution_id"),
+    "profiles": ("id", "name", "description", "level", "wins", "losses", "gems", "location"),
+    "map_access": ("id", "profile_id", "map_id", "granted_at"),
+    "items": ("id", "type", "subtype", "owner_id", "map_id", "location", "expires_at"),
+    "battle_logs": ("id", "attacker_id", "defender_id", "winner_id", "created_at"),
+}
+
+# Distinguishes the ids of each table's generated rows
+TABLE_TAGS = {table: index + 1 for index, table in enumerate(COLUMNS)}
+
+SECONDARY_INDEXES = """
+SELECT c.relname AS name, pg_get_indexdef(i.indexrelid) AS definition
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+WHERE i.indrelid = ANY($1::regclass[])
+  AND NOT EXISTS (SELECT 1 FROM pg_constraint k WHERE k.conindid = i.indexrelid)
+ORDER BY c.relname
+"""
+
+
+def id_prefix(table: str, seed: int) -> str:
+    """Generated ids are this prefix followed by the row number in hex"""
+    return f"da7a{TABLE_TAGS[table]:04x}-{seed & 0xFFFF:04x}-4000-8000-"
+
+
+def row_count(args, table: str) -> int:
+    return {
+        "institutions": args.institutions,
+        "maps": args.institutions * args.maps_per_institution,
+        "profiles": args.players,
+        "map_access": args.players * min(args.maps_per_player, args.institutions * args.maps_per_institution),
+        "items": args.items,
+        "battle_logs": args.battles if args.players > 1 else 0,
+    }[table]
+
+
+def ewkt(latitude: float, longitude: float) -> str:
+    return f"SRID=4326;POINT({longitude:.7f} {latitude:.7f})"
+
+
+def timestamp(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+
+def offset(latitude: float, longitude: float, north: float, east: float) -> Tuple[float, float]:
+    return (
+        latitude + north / METERS_PER_DEGREE,
+        longitude + east / (METERS_PER_DEGREE * math.cos(math.radians(latitude))),
+    )
+
+
+class MapLayout:
+    """Where a map lies, its item hotspots and how busy it is"""
+
+    __slots__ = ("latitude", "longitude", "hotspots", "weight")
+
+    def __init__(self, args, index: int):
+        rng = random.Random(f"{args.seed}:map:{index}")
+        institution = index // args.maps_per_institution
+        _, latitude, longitude = CAMPUSES[institution % len(CAMPUSES)]
+        # Institutions that share a campus sit 5 km apart
+        latitude, longitude = offset(latitude, longitude, 5000 * (institution // len(CAMPUSES)), 0)
+        reach = rng.uniform(0, args.map_radius * 1.5)
+        angle = rng.uniform(0, 2 * math.pi)
+        self.latitude, self.longitude = offset(
+            latitude, longitude, reach * math.cos(angle), reach * math.sin(angle)
+        )
+        self.hotspots = [
+            offset(
+                self.latitude,
+                self.longitude,
+                rng.gauss(0, args.map_radius / 2),
+                rng.gauss(0, args.map_radius / 2),
+            )
+            for _ in range(args.hotspots)
+        ]
+        # Heavy-tailed, so a few maps hold most of the items
+        self.weight = rng.paretovariate(1.5)
+
+
+def map_layouts(args) -> List[MapLayout]:
+    return [MapLayout(args, index) for index in range(row_count(args, "maps"))]
+
+
+class Generator:
+    """Rows of one table for one chunk, as CSV"""
+
+    def __init__(self, args, table: str, chunk: int):
+        self.args = args
+        self.table = table
+        self.rng = random.Random(f"{args.seed}:{table}:{chunk}")
+        self.start = chunk * args.chunk_size
+        self.stop = min(self.start + args.chunk_size, row_count(args, table))
+        self.now = args.now.timestamp()
+        self.map_count = row_count(args, "maps")
+        self.ids = {name: id_prefix(name, args.seed) for name in COLUMNS}
+
+    def csv(self) -> bytes:
+        lines = getattr(self, self.table)()
+        return ("\n".join(lines) + "\n").encode() if lines else b""
+
+    def ident(self, table: str, index: int) -> str:
+        return f"{self.ids[table]}{index:012x}"
+
+    def player_on(self, map_index: int, skew: float = 2.0) -> Optional[int]:
+        """A player whose first map is ``map_index``, favouring the most active"""
+        players = self.args.players
+        if map_index >= players:
+            return None
+        peers = (players - map_index + self.map_count - 1) // self.map_count
+        return map_index + self.map_count * int(peers * self.rng.random() ** skew)
+
+    def institutions(self) -> List[str]:
+        lines = []
+        for index in range(self.start, self.stop):
+            campus = CAMPUSES[index % len(CAMPUSES)][0]
+            lines.append(f"{self.ident('institutions', index)},{campus} {self.args.seed}-{index},")
+        return lines
+
+    def maps(self) -> List[str]:
+        per_institution = self.args.maps_per_institution
+        return [
+            f"{self.ident('maps', index)},Map {index % per_institution + 1},"
+            f"{self.ident('institutions', index // per_institution)}"
+            for index in range(self.start, self.stop)
+        ]
+
+    def profiles(self) -> List[str]:
+        rng = self.rng
+        layouts = map_layouts(self.args)
+        lines = []
+        for index in range(self.start, self.stop):
+            level = 1 + int(rng.expovariate(0.4))
+            battles = int(rng.expovariate(1 / (level * 4)))
+            wins = sum(1 for _ in range(min(battles, 50)) if rng.random() < 0.5)
+            if battles > 50:
+                wins = int(battles * wins / 50)
+            location = ""
+            if rng.random() < 0.9 and layouts:
+                layout = layouts[index % len(layouts)]
+                location = ewkt(
+                    *offset(layout.latitude, layout.longitude, rng.gauss(0, 150), rng.gauss(0, 150))
+                )
+            lines.append(
+                f"{self.ident('profiles', index)},wizard-{self.args.seed}-{index},,"
+                f"{level},{wins},{battles - wins},{int(rng.expovariate(0.01))},{location}"
+            )
+        return lines
+
+    def map_access(self) -> List[str]:
+        rng = self.rng
+        grants = min(self.args.maps_per_player, self.map_count)
+        stride = self.map_count // grants
+        lines = []
+        for index in range(self.start, self.stop):
+            player, grant = divmod(index, grants)
+            # The first grant is the player's own map; the others are spread out
+            map_index = (player + grant * stride) % self.map_count
+            lines.append(
+                f"{self.ident('map_access', index)},{self.ident('profiles', player)},"
+                f"{self.ident('maps', map_index)},"
+                f"{timestamp(self.now - rng.uniform(0, 365) * 86400)}"
+            )
+        return lines
+
+    def items(self) -> List[str]:
+        args, rng = self.args, self.rng
+        layouts = map_layouts(args)
+        cumulative, total = [], 0.0
+        for layout in layouts:
+            total += layout.weight
+            cumulative.append(total)
+        types = list(TYPE_WEIGHTS)
+        type_weights = list(TYPE_WEIGHTS.values())
+        lines = []
+        for index in range(self.start, self.stop):
+            map_index = min(bisect_left(cumulative, rng.random() * total), len(layouts) - 1)
+            layout = layouts[map_index]
+            item_type = rng.choices(types, type_weights)[0]
+
+            roll = rng.random()
+            if roll < args.permanent_fraction:
+                expires_at = ""
+            elif roll < args.permanent_fraction + args.expired_fraction:
+                expires_at = timestamp(self.now - rng.uniform(0, 48 * 3600))
+            else:
+                # Spawned at a steady rate with a one day lifetime
+                expires_at = timestamp(self.now + rng.uniform(0, 24 * 3600))
+
+            owner = None
+            if rng.random() < args.owned_fraction:
+                owner = self.player_on(map_index)
+            if owner is not None:
+                owner_id, location = self.ident("profiles", owner), ""
+            else:
+                owner_id = ""
+                if rng.random() < args.clustered_fraction and layout.hotspots:
+                    latitude, longitude = rng.choice(layout.hotspots)
+                    spread = args.hotspot_radius
+                else:
+                    latitude, longitude = layout.latitude, layout.longitude
+                    spread = args.map_radius
+                location = ewkt(
+                    *offset(latitude, longitude, rng.gauss(0, spread), rng.gauss(0, spread))
+                )
+            lines.append(
+                f"{self.ident('items', index)},{item_type},{ITEM_SUBTYPES[item_type]},"
+                f"{owner_id},{self.ident('maps', map_index)},{location},{expires_at}"
+            )
+        return lines
+
+    def battle_logs(self) -> List[str]:
+        args, rng = self.args, self.rng
+        window = args.battle_days * 86400
+        lines = []
+        for index in range(self.start, self.stop):
+            attacker = int(args.players * rng.random() ** 2)
+            defender = self.player_on(attacker % self.map_count, skew=1.0)
+            if defender is None or defender == attacker:
+                defender = (attacker + 1 + rng.randrange(args.players - 1)) % args.players
+            winner = attacker if rng.random() < 0.5 else defender
+            lines.append(
+                f"{self.ident('battle_logs', index)},{self.ident('profiles', attacker)},"
+                f"{self.ident('profiles', defender)},{self.ident('profiles', winner)},"
+                # Most battles are recent
+                f"{timestamp(self.now - window * rng.random() ** 2)}"
+            )
+        return lines
+
+
+def generate(args, table: str, chunk: int) -> bytes:
+    return Generator(args, table, chunk).csv()
+
+
+class Loader:
+    def __init__(self, args):
+        self.args = args
+        self.pool: Optional[asyncpg.Pool] = None
+        self.fk_checks_skipped = True
+        self.rows: Dict[str, int] = {}
+
+    async def _init_connection(self, connection):
+        try:
+            # Skips foreign key triggers during the load; needs superuser
+            await connection.execute("SET session_replication_role = replica")
+        except asyncpg.InsufficientPrivilegeError:
+            self.fk_checks_skipped = False
+
+    async def run(self):
+        args = self.args
+        self.pool = await asyncpg.create_pool(
+            args.dsn,
+            min_size=args.connections,
+            max_size=args.connections,
+            init=self._init_connection,
+            server_settings={"maintenance_work_mem": args.maintenance_work_mem},
+        )
+        try:
+            if args.truncate:
+                await self.pool.execute(
+                    "TRUNCATE " + ", ".join(reversed(list(COLUMNS))) + " CASCADE"
+                )
+            indexes = [] if args.keep_indexes else await self.drop_indexes()
+            try:
+                with ProcessPoolExecutor(args.workers) as executor:
+                    for phase in PHASES:
+                        await self.load_phase(executor, phase)
+            finally:
+                await self.create_indexes(indexes)
+            started = time.perf_counter()
+            await self.pool.execute("ANALYZE " + ", ".join(COLUMNS))
+            print(f"analyzed in {time.perf_counter() - started:.1f}s")
+        finally:
+            await self.pool.close()
+
+    async def drop_indexes(self) -> List[Tuple[str, str]]:
+        indexes = [
+            (row["name"], row["definition"])
+            for row in await self.pool.fetch(SECONDARY_INDEXES, list(COLUMNS))
+        ]
+        for name, _ in indexes:
+            await self.pool.execute(f'DROP INDEX IF EXISTS "{name}"')
+        if indexes:
+            print(f"dropped {len(indexes)} secondary indexes for the load")
+        return indexes
+
+    async def create_indexes(self, indexes: List[Tuple[str, str]]):
+        if not indexes:
+            return
+        started = time.perf_counter()
+        await asyncio.gather(*(self.pool.execute(definition) for _, definition in indexes))
+        print(f"rebuilt {len(indexes)} indexes in {time.perf_counter() - started:.1f}s")
+
+    async def load_phase(self, executor: ProcessPoolExecutor, tables: Tuple[str, ...]):
+        loop = asyncio.get_running_loop()
+        # Bounds the chunks generated but not yet copied
+        pending = asyncio.Semaphore(self.args.connections * 2)
+        started = time.perf_counter()
+
+        async def load(table: str, chunk: int):
+            async with pending:
+                data = await loop.run_in_executor(executor, generate, self.args, table, chunk)
+                if data:
+                    async with self.pool.acquire() as connection:
+                        await connection.copy_to_table(
+                            table, source=io.BytesIO(data), columns=COLUMNS[table], format="csv"
+                        )
+
+        jobs = []
+        for table in tables:
+            count = row_count(self.args, table)
+            self.rows[table] = count
+            chunks = math.ceil(count / self.args.chunk_size)
+            jobs.extend(load(table, chunk) for chunk in range(chunks))
+        await asyncio.gather(*jobs)
+        elapsed = time.perf_counter() - started
+        total = sum(self.rows[table] for table in tables)
+        print(
+            ", ".join(f"{self.rows[table]:,} {table}" for table in tables)
+            + f" in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)"
+        )
+
+
+def current_hour() -> datetime:
+    return datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dsn", default=DATABASE_URL)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--institutions", type=int, default=20)
+    parser.add_argument("--maps-per-institution", type=int, default=5)
+    parser.add_argument("--players", type=int, default=100_000)
+    parser.add_argument("--maps-per-player", type=int, default=2, help="map_access grants per player")
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--battles", type=int, default=500_000)
+    parser.add_argument("--owned-fraction", type=float, default=0.3, help="share of items in inventories")
+    parser.add_argument("--clustered-fraction", type=float, default=0.8, help="share of map items near hotspots")
+    parser.add_argument("--permanent-fraction", type=float, default=0.1, help="share of items that never expire")
+    parser.add_argument("--expired-fraction", type=float, default=0.15, help="share of items already expired")
+    parser.add_argument("--hotspots", type=int, default=8, help="item hotspots per map")
+    parser.add_argument("--hotspot-radius", type=float, default=40.0, help="meters")
+    parser.add_argument("--map-radius", type=float, default=600.0, help="meters")
+    parser.add_argument("--battle-days", type=float, default=90.0, help="how far back battles go")
+    parser.add_argument(
+        "--now",
+        type=lambda value: datetime.fromisoformat(value).astimezone(timezone.utc),
+        default=current_hour(),
+        help="ISO timestamp generated times are relative to",
+    )
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="rows per COPY")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="generating processes")
+    parser.add_argument("--connections", type=int, default=4, help="concurrent COPY connections")
+    parser.add_argument("--maintenance-work-mem", default="512MB", help="for rebuilding indexes")
+    parser.add_argument("--keep-indexes", action="store_true", help="load with indexes in place")
+    parser.add_argument(
+        "--truncate", action="store_true", help="empty the tables first, deleting ALL their rows"
+    )
+    args = parser.parse_args(argv)
+    if args.players and args.institutions * args.maps_per_institution == 0:
+        parser.error("players need at least one map")
+    if args.items and args.institutions * args.maps_per_institution == 0:
+        parser.error("items need at least one map")
+    return args
+
+
+def main(args):
+    started = time.perf_counter()
+    loader = Loader(args)
+    asyncio.run(loader.run())
+    if not loader.fk_checks_skipped:
+        print("not a superuser: foreign keys were checked during the load")
+    total = sum(loader.rows.values())
+    print(f"{total:,} rows in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main(parse_args())
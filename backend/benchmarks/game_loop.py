@@ -0,0 +1,429 @@
+"""
+Simulated players walking a map, to measure capacity of the whole game loop.
+
+Each simulated player walks around its map at walking pace and, like the
+frontend, syncs its position at the ``watchPosition`` cadence
+(``PATCH /api/player/sync``), polls ``GET /api/map/{id}/proximity`` for
+nearby items, heads for the nearest one and tries to collect it (players
+near the same item race for it), uses some of what it collects and now and
+then reports a battle against another player. Every map's institution
+spawns items around its players at a steady rate.
+
+Before the run each map is seeded with ``--seed-items`` items scattered over
+its area, so the same load can be measured against small and large tables.
+Run it against the stack from ``docker-compose.yml``:
+
+    docker compose up -d db db-seeder backend
+    python -m benchmarks.game_loop --base-url http://localhost:8000 \\
+        --players 200 --maps 2 --seed-items 5000 --duration 120
+
+Prints throughput and p50/p95/p99 per endpoint, response statuses and
+collect outcomes. ``--output`` also writes them as JSON so runs can be
+compared. Exits non-zero if seeding fails, or if any request failed with a
+transport error or an error status other than the 400s a collect gets when
+another player was first or the item is out of reach.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.common import create_map, create_players, percentile, summarize
+
+LATITUDE = 33.9510
+LONGITUDE = -83.3753
+METERS_PER_DEGREE = 111_320.0
+WALKING_SPEED = 1.4  # meters per second
+
+ITEM_KINDS = (
+    ("Chest", "Iron Crate"),
+    ("Potion", "Health Potion"),
+    ("Gem", "Ruby"),
+    ("Scroll", "Fire Scroll"),
+    ("Wand", "Oak Wand"),
+)
+
+# Collect errors that are part of normal play, not failures
+EXPECTED_OUTCOMES = ("Item already owned", "Item too far away to collect")
+
+
+def offset(latitude: float, longitude: float, north: float, east: float):
+    """The position ``north`` and ``east`` meters away"""
+    latitude_delta = north / METERS_PER_DEGREE
+    longitude_delta = east / (METERS_PER_DEGREE * math.cos(math.radians(latitude)))
+    return latitude + latitude_delta, longitude + longitude_delta
+
+
+def distance(a_latitude: float, a_longitude: float, b_latitude: float, b_longitude: float) -> float:
+    """Approximate distance in meters, fine at map scale"""
+    north = (b_latitude - a_latitude) * METERS_PER_DEGREE
+    east = (b_longitude - a_longitude) * METERS_PER_DEGREE * math.cos(math.radians(a_latitude))
+    return math.hypot(north, east)
+
+
+def random_position(rng: random.Random, radius: float):
+    """Uniformly random position within ``radius`` meters of the map center"""
+    reach = radius * math.sqrt(rng.random())
+    angle = rng.uniform(0, 2 * math.pi)
+    return offset(LATITUDE, LONGITUDE, reach * math.cos(angle), reach * math.sin(angle))
+
+
+class Recorder:
+    """Latency, status and outcome counts per endpoint"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self.outcomes = Counter()
+        self.recording = False
+
+    async def request(
+        self, client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs
+    ) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as exc:
+            if self.recording:
+                self.statuses[name][type(exc).__name__] += 1
+            return None
+        if self.recording:
+            self.latencies[name].append(time.perf_counter() - start)
+            self.statuses[name][response.status_code] += 1
+        return response
+
+    def failures(self) -> int:
+        errors = sum(
+            count
+            for statuses in self.statuses.values()
+            for status, count in statuses.items()
+            if not isinstance(status, int) or status >= 400
+        )
+        return errors - sum(self.outcomes[outcome] for outcome in EXPECTED_OUTCOMES)
+
+    def report(self, elapsed: float) -> dict:
+        return {
+            "elapsed": elapsed,
+            "endpoints": {
+                name: {
+                    "count": len(samples),
+                    "per_second": len(samples) / elapsed,
+                    "p50_ms": percentile(samples, 50) * 1000,
+                    "p95_ms": percentile(samples, 95) * 1000,
+                    "p99_ms": percentile(samples, 99) * 1000,
+                    "statuses": {str(status): count for status, count in self.statuses[name].items()},
+                }
+                for name, samples in sorted(self.latencies.items())
+            },
+            "collect_outcomes": dict(self.outcomes),
+            "failures": self.failures(),
+        }
+
+
+class SimulatedPlayer:
+    def __init__(self, profile: dict, map_data: dict, rng: random.Random, args, players: list):
+        self.id = profile["id"]
+        self.map_id = map_data["id"]
+        self.rng = rng
+        self.args = args
+        self.players = players
+        self.latitude, self.longitude = random_position(rng, args.map_radius)
+        self.heading = rng.uniform(0, 2 * math.pi)
+        self.cursor: Optional[str] = None
+        self.visible: Dict[str, tuple] = {}
+        self.inventory: List[str] = []
+
+    def walk(self, seconds: float):
+        target = self.nearest_item()
+        if target is not None:
+            north = (target[1] - self.latitude) * METERS_PER_DEGREE
+            east = (target[2] - self.longitude) * METERS_PER_DEGREE * math.cos(
+                math.radians(self.latitude)
+            )
+            self.heading = math.atan2(east, north)
+        elif distance(self.latitude, self.longitude, LATITUDE, LONGITUDE) > self.args.map_radius:
+            # Wander back towards the middle of the map
+            north = (LATITUDE - self.latitude) * METERS_PER_DEGREE
+            east = (LONGITUDE - self.longitude) * METERS_PER_DEGREE
+            self.heading = math.atan2(east, north)
+        else:
+            self.heading += self.rng.gauss(0, 0.4)
+        step = WALKING_SPEED * seconds
+        if target is not None:
+            step = min(step, target[0])
+        self.latitude, self.longitude = offset(
+            self.latitude,
+            self.longitude,
+            step * math.cos(self.heading),
+            step * math.sin(self.heading),
+        )
+
+    def nearest_item(self):
+        """(meters, latitude, longitude, item_id) of the closest visible item"""
+        nearest = None
+        for item_id, (latitude, longitude) in self.visible.items():
+            meters = distance(self.latitude, self.longitude, latitude, longitude)
+            if nearest is None or meters < nearest[0]:
+                nearest = (meters, latitude, longitude, item_id)
+        return nearest
+
+    async def sync(self, client: httpx.AsyncClient, recorder: Recorder):
+        await recorder.request(
+            client,
+            "PATCH /player/sync",
+            "PATCH",
+            "/api/player/sync",
+            json={"player_id": self.id, "latitude": self.latitude, "longitude": self.longitude},
+        )
+
+    async def poll(self, client: httpx.AsyncClient, recorder: Recorder):
+        params = {
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "radius": self.args.radius,
+        }
+        if self.args.deltas and self.cursor is not None:
+            params["since"] = self.cursor
+        response = await recorder.request(
+            client,
+            "GET /map/{id}/proximity",
+            "GET",
+            f"/api/map/{self.map_id}/proximity",
+            params=params,
+        )
+        if response is None or response.status_code != 200:
+            return
+        self.cursor = response.headers.get("X-Map-Cursor")
+        body = response.json()
+        if isinstance(body, list):
+            self.visible = {}
+            added = body
+        else:
+            if body["reset"]:
+                self.visible = {}
+            for item_id in body["removed"]:
+                self.visible.pop(str(item_id), None)
+            added = body["added"]
+        for item in added:
+            longitude, latitude = item["location"]["coordinates"]
+            self.visible[str(item["id"])] = (latitude, longitude)
+
+    async def collect(self, client: httpx.AsyncClient, recorder: Recorder, item_id: str):
+        self.visible.pop(item_id, None)
+        response = await recorder.request(
+            client,
+            "POST /items/collect",
+            "POST",
+            "/api/items/collect",
+            json={
+                "item_id": item_id,
+                "player_id": self.id,
+                "player_latitude": self.latitude,
+                "player_longitude": self.longitude,
+            },
+        )
+        if response is None:
+            return
+        if response.status_code == 200:
+            outcome = "collected"
+            self.inventory.append(item_id)
+        else:
+            outcome = response.json().get("detail", str(response.status_code))
+        if recorder.recording:
+            recorder.outcomes[outcome] += 1
+
+    async def use(self, client: httpx.AsyncClient, recorder: Recorder):
+        item_id = self.inventory.pop(self.rng.randrange(len(self.inventory)))
+        await recorder.request(
+            client,
+            "POST /items/use",
+            "POST",
+            "/api/items/use",
+            json={"item_id": item_id, "player_id": self.id},
+        )
+
+    async def battle(self, client: httpx.AsyncClient, recorder: Recorder):
+        defender = self.rng.choice(self.players)
+        if defender is self:
+            return
+        winner = self.id if self.rng.random() < 0.5 else defender.id
+        await recorder.request(
+            client,
+            "POST /battle/report",
+            "POST",
+            "/api/battle/report",
+            json={"attacker_id": self.id, "defender_id": defender.id, "winner_id": winner},
+        )
+
+    async def run(self, client: httpx.AsyncClient, recorder: Recorder, stop_at: float):
+        args = self.args
+        # Spread the first syncs out instead of firing them all at once
+        await asyncio.sleep(self.rng.uniform(0, args.sync_interval))
+        await self.poll(client, recorder)
+        last_poll = time.perf_counter()
+        while time.perf_counter() < stop_at:
+            interval = args.sync_interval * self.rng.uniform(0.8, 1.2)
+            await asyncio.sleep(interval)
+            self.walk(interval)
+            await self.sync(client, recorder)
+
+            if time.perf_counter() - last_poll >= args.proximity_interval:
+                last_poll = time.perf_counter()
+                await self.poll(client, recorder)
+
+            target = self.nearest_item()
+            if target is not None and target[0] <= args.collect_distance:
+                await self.collect(client, recorder, target[3])
+            if self.inventory and self.rng.random() < args.use_probability:
+                await self.use(client, recorder)
+            if self.rng.random() < args.battle_probability:
+                await self.battle(client, recorder)
+
+
+async def spawn_item(
+    client: httpx.AsyncClient, recorder: Recorder, map_data: dict, rng, latitude, longitude
+) -> Optional[httpx.Response]:
+    item_type, subtype = rng.choice(ITEM_KINDS)
+    return await recorder.request(
+        client,
+        "POST /institution/{id}/items",
+        "POST",
+        f"/api/institution/institution/{map_data['institution_id']}/items",
+        json={
+            "type": item_type,
+            "subtype": subtype,
+            "map_id": map_data["id"],
+            "latitude": latitude,
+            "longitude": longitude,
+            "expires_in_hours": rng.choice((1, 6, 24, 0)),
+        },
+    )
+
+
+async def seed(client: httpx.AsyncClient, recorder: Recorder, maps: list, args, rng):
+    """Scatter ``--seed-items`` items over each map, a bounded number at a time"""
+    limit = asyncio.Semaphore(args.concurrency)
+    failed: List[Optional[httpx.Response]] = []
+
+    async def spawn(map_data):
+        async with limit:
+            if failed:
+                return
+            latitude, longitude = random_position(rng, args.map_radius)
+            response = await spawn_item(client, recorder, map_data, rng, latitude, longitude)
+            if response is None or not response.is_success:
+                failed.append(response)
+
+    await asyncio.gather(
+        *(spawn(map_data) for map_data in maps for _ in range(args.seed_items))
+    )
+    if failed:
+        response = failed[0]
+        reason = "no response" if response is None else f"{response.status_code} {response.text}"
+        raise SystemExit(f"Seeding failed: POST /institution/{{id}}/items got {reason}")
+
+
+async def institution(
+    client: httpx.AsyncClient, recorder: Recorder, map_data: dict, players: list, args, rng, stop_at: float
+):
+    """Spawn items next to random players at ``--spawn-rate`` per second"""
+    while time.perf_counter() < stop_at:
+        await asyncio.sleep(rng.expovariate(args.spawn_rate))
+        player = rng.choice(players)
+        reach = rng.uniform(0, args.radius)
+        angle = rng.uniform(0, 2 * math.pi)
+        latitude, longitude = offset(
+            player.latitude, player.longitude, reach * math.cos(angle), reach * math.sin(angle)
+        )
+        await spawn_item(client, recorder, map_data, rng, latitude, longitude)
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30) as client:
+        maps = [await create_map(client, f"game-loop-{i}") for i in range(args.maps)]
+        profiles = await create_players(client, "walker", args.players)
+        with_maps = [(profile, maps[i % len(maps)]) for i, profile in enumerate(profiles)]
+
+        started = time.perf_counter()
+        await seed(client, recorder, maps, args, rng)
+        print(f"seeded {args.seed_items} items on each of {args.maps} maps in {time.perf_counter() - started:.1f}s")
+
+        players = []
+        by_map = defaultdict(list)
+        for profile, map_data in with_maps:
+            player = SimulatedPlayer(profile, map_data, random.Random(rng.random()), args, players)
+            players.append(player)
+            by_map[map_data["id"]].append(player)
+
+        recorder.recording = True
+        started = time.perf_counter()
+        stop_at = started + args.duration
+        tasks = [player.run(client, recorder, stop_at) for player in players]
+        tasks += [
+            institution(client, recorder, map_data, by_map[map_data["id"]], args, random.Random(rng.random()), stop_at)
+            for map_data in maps
+            if by_map[map_data["id"]]
+        ]
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    print(
+        f"{args.players} players on {args.maps} maps for {elapsed:.1f}s "
+        f"(sync every {args.sync_interval}s, proximity every {args.proximity_interval}s)"
+    )
+    total = sum(len(samples) for samples in recorder.latencies.values())
+    print(f"total requests/s: {total / elapsed:.1f}\n")
+    print(summarize(recorder.latencies, elapsed))
+    print("\nstatuses:")
+    for name in sorted(recorder.statuses):
+        counts = ", ".join(f"{status}: {count}" for status, count in recorder.statuses[name].most_common())
+        print(f"  {name}: {counts}")
+    print("collect outcomes:")
+    for outcome, count in recorder.outcomes.most_common():
+        print(f"  {outcome}: {count}")
+
+    if args.output:
+        report = recorder.report(elapsed)
+        report["parameters"] = vars(args)
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+    failures = recorder.failures()
+    if failures:
+        print(f"{failures} requests failed with a transport error or an unexpected status")
+    return 1 if failures else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--players", type=int, default=100)
+    parser.add_argument("--maps", type=int, default=1)
+    parser.add_argument("--seed-items", type=int, default=1000, help="items seeded on each map before the run")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds of simulated play")
+    parser.add_argument("--map-radius", type=float, default=500.0, help="meters from the map center players roam")
+    parser.add_argument("--radius", type=float, default=100.0, help="proximity search radius in meters")
+    parser.add_argument("--collect-distance", type=float, default=10.0, help="should match MAX_COLLECTION_DISTANCE_METERS")
+    parser.add_argument("--sync-interval", type=float, default=1.0, help="seconds between position syncs")
+    parser.add_argument("--proximity-interval", type=float, default=5.0, help="seconds between proximity polls")
+    parser.add_argument("--deltas", action="store_true", help="poll proximity with the since cursor")
+    parser.add_argument("--spawn-rate", type=float, default=1.0, help="items spawned per second on each map")
+    parser.add_argument("--use-probability", type=float, default=0.05, help="chance per tick to use an item held")
+    parser.add_argument("--battle-probability", type=float, default=0.01, help="chance per tick to report a battle")
+    parser.add_argument("--concurrency", type=int, default=200, help="most requests in flight")
+    parser.add_argument("--seed", type=int, default=0, help="random seed, for repeatable runs")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main(parse_args())))
@@ -0,0 +1,144 @@
+"""
+Per-row CPU cost of turning item rows into a response body.
+
+Compares the old path (parse ST_AsGeoJSON text per row, validate an Item,
+let FastAPI validate and serialize through ``response_model``, encode with
+the stdlib) with ``app.core.serialization`` (raw coordinates,
+``model_construct``, orjson), and with the packed formats from
+``app.core.packed``. No database or server is needed; every path runs on
+the same synthetic rows, the two JSON paths are checked to be identical and
+the packed ones to round-trip.
+
+    python -m benchmarks.serialization --rows 500 --repeat 200
+"""
+import argparse
+import asyncio
+import json
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import msgpack
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.core.packed import MSGPACK, PACKED_JSON, items_response, unpack_items
+from app.core.serialization import FastJSONResponse, item_from_row
+from app.schemas.schemas import Item
+from benchmarks.common import Timer
+
+ITEM_TYPES = ["Potion", "Gem", "Chest", "Wand", "Scroll"]
+
+
+def make_rows(count: int, rng: random.Random):
+    """Matching (GeoJSON text, raw coordinate) rows for the same items"""
+    map_id = uuid.uuid4()
+    now = datetime.now(timezone.utc)
+    geojson_rows, coordinate_rows = [], []
+    for _ in range(count):
+        latitude = round(33.951 + rng.uniform(-0.002, 0.002), 9)
+        longitude = round(-83.3753 + rng.uniform(-0.002, 0.002), 9)
+        base = {
+            "id": uuid.uuid4(),
+            "type": rng.choice(ITEM_TYPES),
+            "subtype": "Iron Crate",
+            "owner_id": None,
+            "map_id": map_id,
+            "expires_at": now + timedelta(seconds=rng.randint(60, 86400)),
+        }
+        geojson_rows.append(
+            {
+                **base,
+                "location": json.dumps(
+                    {"type": "Point", "coordinates": [longitude, latitude]}
+                ),
+            }
+        )
+        coordinate_rows.append({**base, "latitude": latitude, "longitude": longitude})
+    return geojson_rows, coordinate_rows
+
+
+FIELD = create_response_field(name="Response_get_nearby_items", type_=List[Item])
+
+
+async def old_path(rows) -> bytes:
+    items = []
+    for result in rows:
+        location = None
+        if result["location"]:
+            location_data = json.loads(result["location"])
+            location = {
+                "type": location_data["type"],
+                "coordinates": location_data["coordinates"],
+            }
+        items.append(
+            Item(
+                id=result["id"],
+                type=result["type"],
+                subtype=result["subtype"],
+                owner_id=result["owner_id"],
+                map_id=result["map_id"],
+                location=location,
+                expires_at=result["expires_at"],
+            )
+        )
+    content = await serialize_response(field=FIELD, response_content=items)
+    return JSONResponse(content).body
+
+
+async def new_path(rows) -> bytes:
+    return FastJSONResponse([item_from_row(result) for result in rows]).body
+
+
+def packed_path(media_type: str):
+    async def path(rows) -> bytes:
+        return items_response(media_type, rows, item_from_row).body
+
+    return path
+
+
+async def measure(path, rows, repeat: int) -> float:
+    with Timer() as timer:
+        for _ in range(repeat):
+            await path(rows)
+    return timer.elapsed / (repeat * len(rows))
+
+
+async def main(args):
+    geojson_rows, coordinate_rows = make_rows(args.rows, random.Random(args.seed))
+
+    old_body = await old_path(geojson_rows)
+    new_body = await new_path(coordinate_rows)
+    if json.loads(old_body) != json.loads(new_body):
+        raise SystemExit("Serialized output differs between the two paths")
+
+    paths = {
+        "old": (old_path, geojson_rows),
+        "json": (new_path, coordinate_rows),
+        "msgpack": (packed_path(MSGPACK), coordinate_rows),
+        "packed": (packed_path(PACKED_JSON), coordinate_rows),
+    }
+    msgpack_body = await paths["msgpack"][0](coordinate_rows)
+    if len(unpack_items(msgpack.unpackb(msgpack_body))) != args.rows:
+        raise SystemExit("Packed payload did not round-trip")
+
+    print(f"{'path':<10}{'us/row':>10}{'bytes':>10}")
+    baseline = None
+    for name, (path, rows) in paths.items():
+        per_row = await measure(path, rows, args.repeat)
+        body = await path(rows)
+        baseline = baseline or per_row
+        print(
+            f"{name:<10}{per_row * 1e6:>10.2f}{len(body):>10}"
+            f"{baseline / per_row:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
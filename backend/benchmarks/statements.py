@@ -0,0 +1,160 @@
+"""
+Per-call latency of the hot statements as plain text vs prepared.
+
+Runs each statement declared in ``app.core.statements`` against a real
+database in three modes:
+
+- ``uncached``: plain text through ``databases`` with asyncpg's statement
+  cache off, so Postgres parses and plans every call
+- ``text``: plain text through ``databases`` as before statements existed
+  (SQLAlchemy compiles every call; asyncpg's cache already reuses the plan)
+- ``prepared``: the statement registry, straight on the asyncpg connection
+
+Each mode runs inside one transaction that is rolled back, so the writes
+among the statements leave nothing behind. If ``pg_stat_statements`` is
+installed, server-side planning and execution time per mode is printed too.
+
+    python -m benchmarks.statements --repeat 2000
+"""
+import argparse
+import asyncio
+import time
+from collections import defaultdict
+
+from databases import Database
+
+import main  # noqa: F401  (declares every statement)
+from app.core.statements import statements
+from app.database import DATABASE_URL
+from benchmarks.common import percentile
+
+SAMPLE_QUERY = """
+SELECT p.id as player_id, p.name,
+       ST_Y(p.location::geometry) as latitude, ST_X(p.location::geometry) as longitude,
+       i.id as item_id, i.map_id
+FROM items i
+JOIN profiles p ON p.id = i.owner_id
+WHERE p.location IS NOT NULL
+LIMIT 1
+"""
+
+SERVER_TIME_QUERY = """
+SELECT COALESCE(SUM(total_plan_time), 0) as plan_ms,
+       COALESCE(SUM(total_exec_time), 0) as exec_ms
+FROM pg_stat_statements
+WHERE query NOT LIKE '%pg_stat_statements%'
+"""
+
+
+def workload(sample) -> dict:
+    """Arguments for every benchmarked statement"""
+    player = {"player_id": sample["player_id"]}
+    return {
+        "player_profile": player,
+        "player_exists": player,
+        "player_inventory": player,
+        "profile_by_name": {"name": sample["name"]},
+        "nearby_items": {
+            "map_id": sample["map_id"],
+            "latitude": sample["latitude"],
+            "longitude": sample["longitude"],
+            "radius": 100.0,
+        },
+        "owned_item": {"item_id": sample["item_id"], **player},
+        "add_gems": {"gems_awarded": 1, **player},
+        "sync_location": {
+            "latitude": sample["latitude"],
+            "longitude": sample["longitude"],
+            **player,
+        },
+    }
+
+
+async def server_time(db: Database):
+    try:
+        row = await db.fetch_one(SERVER_TIME_QUERY)
+    except Exception:
+        return None
+    return row["plan_ms"], row["exec_ms"]
+
+
+async def run_mode(db: Database, enabled: bool, calls: dict, repeat: int) -> dict:
+    registry = statements.using(db, enabled=enabled)
+    latencies = defaultdict(list)
+    before = await server_time(db)
+    transaction = await db.transaction()
+    try:
+        for name, values in calls.items():
+            method = registry.execute if name in ("add_gems", "sync_location") else registry.fetch_all
+            await method(name, values)  # warm up the connection
+            for _ in range(repeat):
+                start = time.perf_counter()
+                await method(name, values)
+                latencies[name].append(time.perf_counter() - start)
+    finally:
+        await transaction.rollback()
+    after = await server_time(db)
+    server = None
+    if before is not None and after is not None:
+        server = (after[0] - before[0], after[1] - before[1])
+    return {"latencies": latencies, "server": server}
+
+
+async def main_async(args):
+    databases = {
+        "uncached": Database(DATABASE_URL, min_size=1, max_size=1, statement_cache_size=0),
+        "text": Database(DATABASE_URL, min_size=1, max_size=1),
+        "prepared": Database(DATABASE_URL, min_size=1, max_size=1),
+    }
+    for db in databases.values():
+        await db.connect()
+    try:
+        sample = await databases["text"].fetch_one(SAMPLE_QUERY)
+        if sample is None:
+            raise SystemExit("Needs at least one owned item whose owner has a location")
+        calls = workload(sample)
+
+        results = {}
+        for mode, db in databases.items():
+            results[mode] = await run_mode(db, mode == "prepared", calls, args.repeat)
+    finally:
+        for db in databases.values():
+            await db.disconnect()
+
+    print(f"{args.repeat} calls per statement; p50 / p95 in microseconds")
+    header = f"{'statement':<20}" + "".join(f"{mode:>22}" for mode in results)
+    print(header)
+    for name in calls:
+        cells = []
+        for mode in results:
+            samples = results[mode]["latencies"][name]
+            cells.append(
+                f"{percentile(samples, 50) * 1e6:>11.0f} /{percentile(samples, 95) * 1e6:>8.0f}"
+            )
+        print(f"{name:<20}" + "".join(f"{cell:>22}" for cell in cells))
+
+    totals = {
+        mode: sum(sum(samples) for samples in result["latencies"].values())
+        for mode, result in results.items()
+    }
+    print("\ntotal wall time: " + ", ".join(f"{m} {t:.2f}s" for m, t in totals.items()))
+    if all(result["server"] is not None for result in results.values()):
+        print(
+            "server time (plan + exec): "
+            + ", ".join(
+                f"{mode} {result['server'][0]:.0f} + {result['server'][1]:.0f} ms"
+                for mode, result in results.items()
+            )
+        )
+    else:
+        print("pg_stat_statements not available; server time not measured")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=1000)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(parse_args()))
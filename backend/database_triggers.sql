@@ -1,31 +1,20 @@
--- PostgreSQL Trigger for Automatic Location Updates
--- This file contains the SQL for the spatial trigger mentioned in Claude.md
+-- PostgreSQL Triggers
+-- This file contains the SQL for the spatial triggers mentioned in Claude.md
 
--- Create the trigger function to update owned item locations when player moves
-CREATE OR REPLACE FUNCTION update_owned_items_location()
-RETURNS TRIGGER AS $$
-BEGIN
-    -- Update all items owned by this player to match the player's new location
-    UPDATE items 
-    SET location = NEW.location 
-    WHERE owner_id = NEW.id;
-    RETURN NEW;
-END;
-$$ LANGUAGE plpgsql;
-
--- Create the trigger
-CREATE TRIGGER trigger_update_owned_items
-    AFTER UPDATE OF location ON profiles
-    FOR EACH ROW
-    EXECUTE FUNCTION update_owned_items_location();
+-- Owned items take their position from their owner's profile at read time,
+-- so there is no longer a trigger copying player locations onto items
+DROP TRIGGER IF EXISTS trigger_update_owned_items ON profiles;
+DROP FUNCTION IF EXISTS update_owned_items_location();
 
 -- Optional: Create a trigger function for cascading deletes
 CREATE OR REPLACE FUNCTION cleanup_player_items()
 RETURNS TRIGGER AS $$
 BEGIN
-    -- Either delete owned items or make them available on the map again
+    -- Either delete owned items or make them available on the map again,
+    -- dropped where the player last was
     UPDATE items 
     SET owner_id = NULL, 
+        location = OLD.location,
         expires_at = NOW() + INTERVAL '24 hours'
     WHERE owner_id = OLD.id;
     RETURN OLD;
@@ -47,11 +47,11 @@ ON CONFLICT (id) DO NOTHING;
 
 -- Insert items owned by players
 INSERT INTO items (id, type, subtype, owner_id, location, expires_at) VALUES
-('550e8400-e29b-41d4-a716-446655440501', 'Potion', 'Stun Brew', '550e8400-e29b-41d4-a716-446655440101', ST_SetSRID(ST_MakePoint(-83.3753, 33.9510), 4326), NULL),
-('550e8400-e29b-41d4-a716-446655440502', 'Wand', 'Oak Branch', '550e8400-e29b-41d4-a716-446655440101', ST_SetSRID(ST_MakePoint(-83.3753, 33.9510), 4326), NULL),
-('550e8400-e29b-41d4-a716-446655440503', 'Gem', 'Focus Crystal', '550e8400-e29b-41d4-a716-446655440102', ST_SetSRID(ST_MakePoint(-83.3748, 33.9508), 4326), NULL),
-('550e8400-e29b-41d4-a716-446655440504', 'Chest', 'Iron Crate', '550e8400-e29b-41d4-a716-446655440103', ST_SetSRID(ST_MakePoint(-83.3760, 33.9512), 4326), NULL),
-('550e8400-e29b-41d4-a716-446655440505', 'Scroll', 'Mirror Image', '550e8400-e29b-41d4-a716-446655440104', ST_SetSRID(ST_MakePoint(-83.3745, 33.9515), 4326), NULL)
+('550e8400-e29b-41d4-a716-446655440501', 'Potion', 'Stun Brew', '550e8400-e29b-41d4-a716-446655440101', NULL, NULL),
+('550e8400-e29b-41d4-a716-446655440502', 'Wand', 'Oak Branch', '550e8400-e29b-41d4-a716-446655440101', NULL, NULL),
+('550e8400-e29b-41d4-a716-446655440503', 'Gem', 'Focus Crystal', '550e8400-e29b-41d4-a716-446655440102', NULL, NULL),
+('550e8400-e29b-41d4-a716-446655440504', 'Chest', 'Iron Crate', '550e8400-e29b-41d4-a716-446655440103', NULL, NULL),
+('550e8400-e29b-41d4-a716-446655440505', 'Scroll', 'Mirror Image', '550e8400-e29b-41d4-a716-446655440104', NULL, NULL)
 ON CONFLICT (id) DO NOTHING;
 
 -- Insert some battle history
@@ -62,19 +62,7 @@ INSERT INTO battle_logs (id, attacker_id, defender_id, winner_id, created_at) VA
 ('660e8400-e29b-41d4-a716-446655440004', '550e8400-e29b-41d4-a716-446655440101', '550e8400-e29b-41d4-a716-446655440105', '550e8400-e29b-41d4-a716-446655440101', NOW() - INTERVAL '15 minutes')
 ON CONFLICT (id) DO NOTHING;
 
--- Trigger for automatic item location updates (idempotent)
-CREATE OR REPLACE FUNCTION update_owned_items_location()
-RETURNS TRIGGER AS $$
-BEGIN
-    UPDATE items
-    SET location = NEW.location
-    WHERE owner_id = NEW.id;
-    RETURN NEW;
-END;
-$$ LANGUAGE plpgsql;
-
+-- Owned items take their position from their owner's profile at read time,
+-- so player movement no longer rewrites them
 DROP TRIGGER IF EXISTS trigger_update_owned_items ON profiles;
-CREATE TRIGGER trigger_update_owned_items
-    AFTER UPDATE OF location ON profiles
-    FOR EACH ROW
-    EXECUTE FUNCTION update_owned_items_location();
+DROP FUNCTION IF EXISTS update_owned_items_location();
@@ -8,7 +8,7 @@ ON CONFLICT (id) DO NOTHING;
 
 -- Give the guest user some starting items
 INSERT INTO items (id, type, subtype, owner_id, location, expires_at) VALUES
-('00000000-0000-0000-0000-000000000101', 'Potion', 'Stun Brew', '00000000-0000-0000-0000-000000000001', ST_SetSRID(ST_MakePoint(-83.3753, 33.9510), 4326), NULL),
-('00000000-0000-0000-0000-000000000102', 'Wand', 'Oak Branch', '00000000-0000-0000-0000-000000000001', ST_SetSRID(ST_MakePoint(-83.3753, 33.9510), 4326), NULL),
-('00000000-0000-0000-0000-000000000103', 'Gem', 'Focus Crystal', '00000000-0000-0000-0000-000000000001', ST_SetSRID(ST_MakePoint(-83.3753, 33.9510), 4326), NULL)
+('00000000-0000-0000-0000-000000000101', 'Potion', 'Stun Brew', '00000000-0000-0000-0000-000000000001', NULL, NULL),
+('00000000-0000-0000-0000-000000000102', 'Wand', 'Oak Branch', '00000000-0000-0000-0000-000000000001', NULL, NULL),
+('00000000-0000-0000-0000-000000000103', 'Gem', 'Focus Crystal', '00000000-0000-0000-0000-000000000001', NULL, NULL)
 ON CONFLICT (id) DO NOTHING;
\ No newline at end of file
@@ -1,16 +1,48 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
 import os
 
-from app.routers import players, items, battles, maps, auth, institution
+from app.routers import players, items, battles, maps, auth, institution, live, diagnostics
+from app.core.metrics import CONTENT_TYPE, Exposition, MetricsMiddleware, http_metrics
+from app.core.pool import PoolExhausted
 from app.database import database
+from app.services.battle_feed import battle_feed
+from app.services.change_bus import change_bus
+from app.services.expiry_reaper import expiry_reaper
+from app.services.game_engine import game_engine
+from app.services.item_index import item_index
+from app.services.item_spawner import item_spawner
+from app.services.leaderboard import leaderboard
+from app.services.location_buffer import location_buffer
+from app.services.map_stats import map_stats
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await database.connect()
+    # Listening before the caches load, so no other worker's write falls between
+    await change_bus.start()
+    # Replays what the last run left in the journal before the index loads,
+    # so items collected but not yet written are not served as unowned
+    await game_engine.start()
+    await item_index.load_all(database)
+    location_buffer.start()
+    item_spawner.start()
+    expiry_reaper.start()
+    leaderboard.start()
+    map_stats.start()
+    battle_feed.start()
     yield
+    await battle_feed.stop()
+    await map_stats.stop()
+    await leaderboard.stop()
+    await expiry_reaper.stop()
+    await item_spawner.stop()
+    await location_buffer.stop()
+    await game_engine.stop()
+    await change_bus.stop()
     await database.disconnect()
 
 
@@ -27,14 +59,30 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let browser clients read the polling and paging cursors
+    expose_headers=["X-Map-Cursor", "X-Next-Cursor"],
 )
+app.add_middleware(MetricsMiddleware, metrics=http_metrics)
+
+
+@app.exception_handler(PoolExhausted)
+async def pool_exhausted_handler(request: Request, exc: PoolExhausted):
+    # Shed load rather than queue requests behind a saturated pool
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Database busy, please retry"},
+        headers={"Retry-After": "1"},
+    )
+
 
 app.include_router(players.router, prefix="/api", tags=["players"])
 app.include_router(items.router, prefix="/api", tags=["items"])
+app.include_router(live.router, prefix="/api", tags=["live"])
 app.include_router(battles.router, prefix="/api", tags=["battles"])
 app.include_router(maps.router, prefix="/api", tags=["maps"])
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(institution.router, prefix="/api/institution", tags=["institution"])
+app.include_router(diagnostics.router, prefix="/api", tags=["diagnostics"])
 
 
 @app.get("/")
@@ -44,4 +92,13 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Request, database and pool metrics in the Prometheus text format"""
+    exposition = Exposition()
+    http_metrics.collect(exposition)
+    database.collect_metrics(exposition)
+    return PlainTextResponse(exposition.text(), media_type=CONTENT_TYPE)
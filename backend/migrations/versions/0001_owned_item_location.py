@@ -0,0 +1,76 @@
+"""Owned items take their location from their owner
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS trigger_update_owned_items ON profiles")
+    op.execute("DROP FUNCTION IF EXISTS update_owned_items_location()")
+    op.execute(
+        """
+        UPDATE items
+        SET location = NULL
+        WHERE owner_id IS NOT NULL AND location IS NOT NULL
+        """
+    )
+    # Items released by a deleted player are dropped where the player last was
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION cleanup_player_items()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            UPDATE items
+            SET owner_id = NULL,
+                location = OLD.location,
+                expires_at = NOW() + INTERVAL '24 hours'
+            WHERE owner_id = OLD.id;
+            RETURN OLD;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        UPDATE items AS i
+        SET location = p.location
+        FROM profiles AS p
+        WHERE i.owner_id = p.id
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_owned_items_location()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            UPDATE items
+            SET location = NEW.location
+            WHERE owner_id = NEW.id;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER trigger_update_owned_items
+            AFTER UPDATE OF location ON profiles
+            FOR EACH ROW
+            EXECUTE FUNCTION update_owned_items_location()
+        """
+    )
@@ -0,0 +1,48 @@
+"""Per-map procedural spawn settings
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS map_spawn_settings (
+          map_id UUID PRIMARY KEY REFERENCES maps(id) ON DELETE CASCADE,
+          center_latitude DOUBLE PRECISION NOT NULL,
+          center_longitude DOUBLE PRECISION NOT NULL,
+          radius_meters DOUBLE PRECISION NOT NULL DEFAULT 150,
+          items_per_hectare DOUBLE PRECISION NOT NULL DEFAULT 5,
+          respawn_per_minute INT NOT NULL DEFAULT 60,
+          item_lifetime_hours INT NOT NULL DEFAULT 24,
+          type_weights JSONB NOT NULL DEFAULT '{"Potion": 3, "Gem": 2, "Chest": 1, "Wand": 1, "Scroll": 2}',
+          enabled BOOLEAN NOT NULL DEFAULT true
+        )
+        """
+    )
+    # Main Campus spawns around the UGA MLC grounds, where the seed data exists
+    op.execute(
+        """
+        INSERT INTO map_spawn_settings (map_id, center_latitude, center_longitude, radius_meters)
+        SELECT id, 33.9510, -83.3753, 150
+        FROM maps
+        WHERE id = '550e8400-e29b-41d4-a716-446655440011'
+        ON CONFLICT (map_id) DO NOTHING
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS map_spawn_settings")
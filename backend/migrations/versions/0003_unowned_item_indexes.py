@@ -0,0 +1,38 @@
+"""Partial indexes over unowned items for proximity and expiry
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_items_unowned_location
+          ON items USING GIST (location)
+          WHERE owner_id IS NULL
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_items_unowned_expires_at
+          ON items (expires_at)
+          WHERE owner_id IS NULL AND expires_at IS NOT NULL
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_items_unowned_expires_at")
+    op.execute("DROP INDEX IF EXISTS idx_items_unowned_location")
@@ -0,0 +1,64 @@
+"""Indexes matched to the routers' hot queries
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 00:00:00
+
+Each index names the queries it serves; tests/test_query_plans.py fails if
+one of those queries stops using it. Built CONCURRENTLY so the migration
+can run against a live database.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    # GET /map/{id}/proximity and the spatial index's per-map load
+    "idx_items_unowned_map_location": (
+        "items USING GIST (map_id, location) WHERE owner_id IS NULL"
+    ),
+    # GET /player/{id}/inventory and the leaderboard's per-player EXISTS
+    "idx_items_owner_map": "items (owner_id, map_id) WHERE owner_id IS NOT NULL",
+    # GET /maps/{id}/stats and GET /institution/{id}/items
+    "idx_items_map_owner": "items (map_id, owner_id)",
+    # GET /player/{id}/battles (one index per side of the OR)
+    "idx_battle_logs_attacker_created": "battle_logs (attacker_id, created_at DESC)",
+    "idx_battle_logs_defender_created": "battle_logs (defender_id, created_at DESC)",
+    # GET /battle/recent
+    "idx_battle_logs_created_at": "battle_logs (created_at DESC)",
+    # GET /maps?institution_id= and GET /institution/{id}/maps
+    "idx_maps_institution_name": "maps (institution_id, name)",
+}
+
+# Superseded by the indexes above. Collects set ``location = NULL``, so
+# every extra GiST index on ``location`` is maintained on the hottest write.
+SUPERSEDED = {
+    # db-init/01_init.sql; proximity reads idx_items_unowned_map_location
+    "idx_items_location": "items USING GIST (location)",
+    # 0003; the same, without map_id
+    "idx_items_unowned_location": "items USING GIST (location) WHERE owner_id IS NULL",
+}
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    with op.get_context().autocommit_block():
+        for name, definition in INDEXES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}")
+        for name in SUPERSEDED:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, definition in SUPERSEDED.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}")
+        for name in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -0,0 +1,65 @@
+"""Covering indexes for keyset-paginated battle history
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 00:00:00
+
+Battle history pages on ``(created_at, id)``, so each index ends with both
+in that order and INCLUDEs the remaining columns the routes return, making
+every page an index-only range scan. ``created_at`` becomes NOT NULL since
+a NULL sort key cannot be paged past; rows logged without one get the epoch
+so they sort last instead of surfacing as new.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    # GET /player/{id}/battles (one index per side of the UNION)
+    "idx_battle_logs_attacker_keyset": (
+        "battle_logs (attacker_id, created_at DESC, id DESC) "
+        "INCLUDE (defender_id, winner_id)"
+    ),
+    "idx_battle_logs_defender_keyset": (
+        "battle_logs (defender_id, created_at DESC, id DESC) "
+        "INCLUDE (attacker_id, winner_id)"
+    ),
+    # GET /battle/recent
+    "idx_battle_logs_keyset": (
+        "battle_logs (created_at DESC, id DESC) "
+        "INCLUDE (attacker_id, defender_id, winner_id)"
+    ),
+}
+
+# From 0004; each is a prefix of its replacement above
+SUPERSEDED = {
+    "idx_battle_logs_attacker_created": "battle_logs (attacker_id, created_at DESC)",
+    "idx_battle_logs_defender_created": "battle_logs (defender_id, created_at DESC)",
+    "idx_battle_logs_created_at": "battle_logs (created_at DESC)",
+}
+
+
+def upgrade() -> None:
+    op.execute("UPDATE battle_logs SET created_at = to_timestamp(0) WHERE created_at IS NULL")
+    op.execute("ALTER TABLE battle_logs ALTER COLUMN created_at SET NOT NULL")
+    with op.get_context().autocommit_block():
+        for name, definition in INDEXES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}")
+        for name in SUPERSEDED:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, definition in SUPERSEDED.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}")
+        for name in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    op.execute("ALTER TABLE battle_logs ALTER COLUMN created_at DROP NOT NULL")
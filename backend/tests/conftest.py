@@ -2,6 +2,7 @@ import pytest
 import asyncio
 from httpx import AsyncClient
 from main import app
+from databases import Database
 from app.database import database, metadata
 from sqlalchemy import create_engine, MetaData, text
 from app.core.config import settings
@@ -255,4 +255,19 @@ class TestMaps:
         data = response.json()
         assert data["name"] == map_data["name"]
         assert data["institution_id"] == map_data["institution_id"]
-        assert "id" in data
\ No newline at end of file
+        assert "id" in data
+
+    async def test_spawn_settings_reject_bad_weights(self, client: AsyncClient, sample_map):
+        """Test that spawn weights must be non-negative numbers, one of them positive"""
+        url = (
+            f"/api/institution/institution/{sample_map['institution_id']}"
+            f"/maps/{sample_map['id']}/spawning"
+        )
+        center = {"center_latitude": 33.951, "center_longitude": -83.3753}
+
+        for weights in ({"Potion": "3"}, {"Potion": None}, {"Potion": -1}, {"Potion": 0}):
+            response = await client.put(url, json={**center, "type_weights": weights})
+            assert response.status_code == 400
+
+        response = await client.put(url, json={**center, "type_weights": {"Potion": 0, "Gem": 2.5}})
+        assert response.status_code == 200
\ No newline at end of file
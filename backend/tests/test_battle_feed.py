@@ -0,0 +1,116 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from app.services.battle_feed import BattleFeed, feed_entry
+
+START = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def battle(minutes, names=None):
+    attacker, defender = uuid4(), uuid4()
+    names = names or {attacker: "attacker", defender: "defender"}
+    return feed_entry(
+        uuid4(), START + timedelta(minutes=minutes), attacker, defender, attacker, names
+    )
+
+
+class FeedDatabase:
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.notifications = []
+
+    async def fetch_all(self, query, values=None):
+        return sorted(self.rows, key=lambda r: (r["created_at"], r["id"]), reverse=True)[
+            : values["limit"]
+        ]
+
+    async def execute(self, query, values=None):
+        self.notifications.append(values)
+
+
+def ids(entries):
+    return [entry["id"] for entry in entries]
+
+
+class TestBattleFeed:
+    def test_keeps_newest_in_order(self):
+        feed = BattleFeed(FeedDatabase(), size=3)
+        entries = [battle(minute) for minute in range(5)]
+        late = battle(3.5)
+
+        feed.add(entries)
+        feed.add([late, entries[0], entries[4]])
+
+        assert ids(feed.recent(10)) == ids([entries[4], late, entries[3]])
+
+    def test_names_resolved_at_report_time(self):
+        entry = battle(0)
+        assert entry["winner_name"] == entry["attacker_name"] == "attacker"
+        assert entry["defender_name"] == "defender"
+
+    def test_since_returns_only_newer(self):
+        feed = BattleFeed(FeedDatabase(), size=10)
+        entries = [battle(minute) for minute in range(4)]
+        feed.add(entries)
+
+        assert ids(feed.recent(10, since=entries[1]["created_at"])) == ids(
+            [entries[3], entries[2]]
+        )
+
+    def test_warm_loads_most_recent(self):
+        rows = [battle(minute) for minute in range(5)]
+        feed = BattleFeed(FeedDatabase(rows), size=2)
+
+        asyncio.run(feed.warm())
+
+        assert feed.ready
+        assert ids(feed.recent(10)) == ids([rows[4], rows[3]])
+
+    def test_publish_reaches_other_workers(self):
+        here = BattleFeed(FeedDatabase(), size=10)
+        there = BattleFeed(FeedDatabase(), size=10)
+        entry = battle(0)
+
+        asyncio.run(here.publish([entry]))
+        payload = here.db.notifications[0]["payload"]
+        here._on_notify(payload)
+        there._on_notify(payload)
+
+        assert here.recent(10) == [entry]
+        assert there.recent(10) == [entry]
+
+    def test_oversized_publish_asks_for_reload(self):
+        rows = [battle(minute) for minute in range(100)]
+        here = BattleFeed(FeedDatabase(), size=200)
+        there = BattleFeed(FeedDatabase(rows), size=200)
+
+        async def run():
+            await here.publish(rows)
+            payload = here.db.notifications[0]["payload"]
+            there._on_notify(payload)
+            await there._reload
+            return json.loads(payload)
+
+        assert asyncio.run(run()).get("reload")
+        assert there.reloads == 1
+        assert len(there.recent(200)) == 100
+
+    def test_warm_keeps_battles_added_during_the_query(self):
+        rows = [battle(minute) for minute in range(3)]
+        db = FeedDatabase(rows)
+        feed = BattleFeed(db, size=3)
+        late = battle(10)
+        fetch_all = db.fetch_all
+
+        async def racing_fetch(query, values=None):
+            snapshot = await fetch_all(query, values)
+            # Announced by another worker after the snapshot was taken
+            feed._on_notify(json.dumps({"origin": "other", "entries": [late]}, default=str))
+            return snapshot
+
+        db.fetch_all = racing_fetch
+        asyncio.run(feed.warm())
+
+        assert ids(feed.recent(10)) == ids([late, rows[2], rows[1]])
@@ -0,0 +1,96 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import pytest
+
+from app.schemas.schemas import BattleBatchEntry
+from app.services.battle_service import BattleService, MissingPlayers
+
+
+class BattleDatabase:
+    """Records batch statements and serves profiles by id"""
+
+    def __init__(self, profiles):
+        self.profiles = {str(p["id"]): p for p in profiles}
+        self.statements = []
+        self.transactions = 0
+
+    @asynccontextmanager
+    async def _transaction(self):
+        self.transactions += 1
+        yield
+
+    def transaction(self):
+        return self._transaction()
+
+    async def fetch_all(self, query, values=None):
+        self.statements.append((query, values))
+        if "FOR UPDATE" in query:
+            return [{"id": self.profiles[i]["id"]} for i in values["ids"] if i in self.profiles]
+        if "INSERT INTO battle_logs" in query:
+            now = datetime.now(timezone.utc)
+            return [{"id": uuid4(), "created_at": c or now} for c in values["created"]]
+        rows = []
+        for player_id, wins, losses in zip(values["ids"], values["wins"], values["losses"]):
+            p = self.profiles[player_id]
+            rows.append(
+                {
+                    **p,
+                    "level": p["level"] + (p["wins"] + wins) // 3 - p["wins"] // 3,
+                    "wins": p["wins"] + wins,
+                    "losses": p["losses"] + losses,
+                }
+            )
+        return rows
+
+
+def profile(wins=0, level=1):
+    return {"id": uuid4(), "name": "p", "level": level, "wins": wins, "losses": 0}
+
+
+def fight(winner, loser, **extra):
+    return BattleBatchEntry(
+        attacker_id=winner["id"], defender_id=loser["id"], winner_id=winner["id"], **extra
+    )
+
+
+class TestReportBatch:
+    def test_one_update_per_player_with_summed_results(self):
+        a, b, c = profile(wins=2), profile(), profile()
+        db = BattleDatabase([a, b, c])
+        battles = [fight(a, b), fight(a, c), fight(b, a), fight(a, b)]
+
+        result = asyncio.run(BattleService(db).report_batch(battles))
+
+        assert len(result["battle_ids"]) == 4
+        assert db.transactions == 1
+        assert len(db.statements) == 3
+        _, update = db.statements[2]
+        deltas = dict(zip(update["ids"], zip(update["wins"], update["losses"])))
+        assert deltas == {str(a["id"]): (3, 1), str(b["id"]): (1, 2), str(c["id"]): (0, 1)}
+        assert update["ids"] == sorted(update["ids"])
+        players = {row["id"]: row for row in result["players"]}
+        # Five wins crosses the level-up at three once
+        assert players[a["id"]]["level"] == 2
+
+    def test_missing_players_abort_before_writing(self):
+        a, ghost = profile(), profile()
+        db = BattleDatabase([a])
+
+        with pytest.raises(MissingPlayers) as error:
+            asyncio.run(BattleService(db).report_batch([fight(a, ghost)]))
+
+        assert error.value.player_ids == [str(ghost["id"])]
+        assert len(db.statements) == 1
+
+    def test_naive_timestamps_are_utc(self):
+        a, b = profile(), profile()
+        db = BattleDatabase([a, b])
+        fought = datetime(2024, 5, 1, 12, 0)
+
+        asyncio.run(BattleService(db).report_batch([fight(a, b, created_at=fought), fight(b, a)]))
+
+        _, insert = db.statements[1]
+        assert insert["created"] == [fought.replace(tzinfo=timezone.utc), None]
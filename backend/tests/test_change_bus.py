@@ -0,0 +1,109 @@
+import asyncio
+import json
+from uuid import uuid4
+
+from app.services.change_bus import ITEM, MAP, PROFILE, ChangeBus
+
+
+class NotifyDatabase:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.notifications = []
+
+    async def execute(self, query, values=None):
+        if self.fail:
+            raise ConnectionError("connection reset")
+        self.notifications.extend(values["payloads"])
+
+
+def recording_bus(db=None):
+    bus = ChangeBus(db or NotifyDatabase())
+    seen, flushes = [], []
+    for entity in (ITEM, PROFILE, MAP):
+        bus.subscribe(entity, lambda id, map_id, entity=entity: seen.append((entity, id, map_id)))
+    bus.on_flush(lambda: flushes.append(True))
+    return bus, seen, flushes
+
+
+class TestChangeBus:
+    def test_events_reach_other_workers_once(self):
+        here, here_seen, _ = recording_bus()
+        there, there_seen, _ = recording_bus()
+        item_id, map_id, player_id = uuid4(), uuid4(), uuid4()
+
+        here.publish(ITEM, item_id, map_id)
+        here.publish(ITEM, item_id, map_id)
+        here.publish(PROFILE, player_id)
+        assert asyncio.run(here.send()) == 1
+        (payload,) = here.db.notifications
+        here._on_notify(payload)
+        there._on_notify(payload)
+
+        assert here_seen == []
+        assert there_seen == [(ITEM, str(item_id), str(map_id)), (PROFILE, str(player_id), None)]
+        assert asyncio.run(here.send()) == 0
+
+    def test_large_batches_split_under_the_payload_limit(self):
+        here, _, _ = recording_bus()
+        there, seen, flushes = recording_bus()
+        map_id = uuid4()
+        for _ in range(300):
+            here.publish(ITEM, uuid4(), map_id)
+
+        sent = asyncio.run(here.send())
+        assert sent == len(here.db.notifications) > 1
+        for payload in here.db.notifications:
+            assert len(payload.encode()) < 8000
+            there._on_notify(payload)
+        assert len(seen) == 300 and flushes == []
+
+    def test_failed_send_flushes_other_workers(self):
+        db = NotifyDatabase(fail=True)
+        here, _, _ = recording_bus(db)
+        there, seen, flushes = recording_bus()
+
+        here.publish(PROFILE, uuid4())
+        asyncio.run(here.send())
+        db.fail = False
+        here.publish(PROFILE, uuid4())
+        here.publish(PROFILE, uuid4())
+        asyncio.run(here.send())
+        here.publish(PROFILE, uuid4())
+        asyncio.run(here.send())
+
+        for payload in db.notifications:
+            there._on_notify(payload)
+        assert here.send_failures == 1
+        # The first notification a worker sees from a peer sets its baseline
+        assert [json.loads(p)["s"] for p in db.notifications] == [2, 3]
+        assert len(seen) == 3 and flushes == []
+
+        here.publish(PROFILE, uuid4())
+        db.fail = True
+        asyncio.run(here.send())
+        db.fail = False
+        here.publish(PROFILE, uuid4())
+        asyncio.run(here.send())
+        there._on_notify(db.notifications[-1])
+        assert flushes == [True] and len(seen) == 3
+
+    def test_disabled_publishes_nothing(self):
+        bus = ChangeBus(NotifyDatabase(), enabled=False)
+        bus.publish(ITEM, uuid4(), uuid4())
+        assert asyncio.run(bus.send()) == 0
+        assert bus.stats()["published"] == 0
+
+
+def test_item_index_is_not_reloaded_under_the_game_engine(monkeypatch):
+    from app.services import change_bus as module
+
+    map_id = uuid4()
+    monkeypatch.setattr(module.item_index, "_stale", set())
+    monkeypatch.setattr(module.game_engine, "enabled", True)
+    module._map_changed(None, str(map_id))
+    module._flush()
+    assert module.item_index._stale == set()
+
+    monkeypatch.setattr(module.game_engine, "enabled", False)
+    module._map_changed(None, str(map_id))
+    assert module.item_index._stale == {map_id}
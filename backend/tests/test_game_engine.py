@@ -0,0 +1,318 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+
+from app.schemas.schemas import BattleBatchEntry
+from app.services.battle_service import MissingPlayers
+from app.services.game_engine import GameEngine, Journal
+from app.services.item_index import IndexedItem, ItemIndex, MapGrid, _key
+
+LATITUDE = 33.9510
+LONGITUDE = -83.3753
+
+
+class EngineDatabase:
+    """Serves profiles and inventories; records the engine's writes"""
+
+    def __init__(self, profiles, inventory=()):
+        self.profiles = {str(p["id"]): p for p in profiles}
+        self.inventory = list(inventory)
+        self.reads = 0
+        self.writes = []
+
+    @asynccontextmanager
+    async def _transaction(self):
+        yield
+
+    def transaction(self):
+        return self._transaction()
+
+    async def fetch_one(self, query, values=None):
+        self.reads += 1
+        if "FROM profiles" in query:
+            return self.profiles.get(str(values["player_id"]))
+        return None
+
+    async def fetch_all(self, query, values=None):
+        self.reads += 1
+        return [i for i in self.inventory if str(i["owner_id"]) == str(values["player_id"])]
+
+    async def execute(self, query, values=None):
+        self.writes.append((query, values))
+
+
+def profile(**fields):
+    return {
+        "id": uuid4(), "name": "p", "description": None, "level": 1, "wins": 0,
+        "losses": 0, "gems": 0, "latitude": LATITUDE, "longitude": LONGITUDE, **fields,
+    }
+
+
+def engine_with(tmp_path, profiles, items=(), inventory=()):
+    index = ItemIndex()
+    map_id = uuid4()
+    grid = MapGrid(index.cell_meters)
+    for item in items:
+        grid.add(item)
+    index._install(map_id, grid)
+    db = EngineDatabase(profiles, inventory)
+    engine = GameEngine(
+        db, index, journal_path=str(tmp_path / "engine.journal"), fsync_interval=0, enabled=True
+    )
+    return engine, db, map_id
+
+
+def chest(map_id, latitude=LATITUDE, longitude=LONGITUDE):
+    return IndexedItem(uuid4(), "Chest", "Iron Crate", map_id, latitude, longitude)
+
+
+def run(engine, coroutine_function):
+    async def scenario():
+        engine.journal.recover()
+        engine.journal.start()
+        try:
+            return await coroutine_function()
+        finally:
+            await engine.journal.close()
+
+    return asyncio.run(scenario())
+
+
+class TestGameEngine:
+    def test_collect_race_has_one_winner(self, tmp_path):
+        first, second = profile(), profile()
+        engine, db, map_id = engine_with(tmp_path, [first, second])
+        item = chest(map_id)
+        engine.items.add(item)
+
+        async def scenario():
+            await engine.player(first["id"])
+            await engine.player(second["id"])
+            return await asyncio.gather(
+                engine.collect(item.id, first["id"], LATITUDE, LONGITUDE, 10),
+                engine.collect(item.id, second["id"], LATITUDE, LONGITUDE, 10),
+            )
+
+        won, lost = run(engine, scenario)
+        assert won["collected"] and not lost["collected"]
+        assert lost["owner_id"] == first["id"]
+        assert engine.items.get(item.id) is None
+        assert [i["id"] for i in asyncio.run(engine.inventory(first["id"]))] == [item.id]
+
+    def test_too_far_is_not_collected(self, tmp_path):
+        player = profile()
+        engine, db, map_id = engine_with(tmp_path, [player])
+        item = chest(map_id, latitude=LATITUDE + 0.001)
+        engine.items.add(item)
+
+        async def scenario():
+            return await engine.collect(item.id, player["id"], LATITUDE, LONGITUDE, 10)
+
+        result = run(engine, scenario)
+        assert not result["within_range"] and not result["collected"]
+        assert engine.items.get(item.id) is item
+
+    def test_reads_after_first_load_stay_in_memory(self, tmp_path):
+        player = profile(gems=5)
+        engine, db, map_id = engine_with(tmp_path, [player])
+        item = chest(map_id)
+        engine.items.add(item)
+
+        async def scenario():
+            await engine.collect(item.id, player["id"], LATITUDE, LONGITUDE, 10)
+            loads = db.reads
+            await engine.sync(player["id"], 34.0, -83.0)
+            used = await engine.use(item.id, player["id"])
+            state = await engine.profile(player["id"])
+            inventory = await engine.inventory(player["id"])
+            assert db.reads == loads
+            return used, state, inventory
+
+        used, state, inventory = run(engine, scenario)
+        assert 5 <= used["gems_awarded"] <= 15
+        assert state["gems"] == 5 + used["gems_awarded"]
+        assert (state["latitude"], state["longitude"]) == (34.0, -83.0)
+        assert inventory == []
+        assert db.writes == []
+
+    def test_battles_update_stats_like_the_database(self, tmp_path):
+        winner, loser = profile(wins=2), profile()
+        engine, db, _ = engine_with(tmp_path, [winner, loser])
+
+        async def scenario():
+            return await engine.report(winner["id"], loser["id"], winner["id"])
+
+        rows = run(engine, scenario)
+        assert rows[0]["id"] == winner["id"]
+        assert (rows[0]["wins"], rows[0]["level"]) == (3, 2)
+        assert rows[1]["losses"] == 1
+        assert rows[0]["battle_id"] == rows[1]["battle_id"]
+
+    def test_batch_with_unknown_player_changes_nothing(self, tmp_path):
+        known = profile()
+        engine, db, _ = engine_with(tmp_path, [known])
+        battle = BattleBatchEntry(
+            attacker_id=known["id"], defender_id=uuid4(), winner_id=known["id"]
+        )
+
+        async def scenario():
+            await engine.report_batch([battle])
+
+        with pytest.raises(MissingPlayers):
+            run(engine, scenario)
+        assert engine.journal.seq == 0
+
+    def test_flush_coalesces_into_one_write_per_table(self, tmp_path):
+        player, other = profile(), profile()
+        engine, db, map_id = engine_with(tmp_path, [player, other])
+        kept, used = chest(map_id), chest(map_id)
+        engine.items.add(kept)
+        engine.items.add(used)
+
+        async def scenario():
+            for latitude in (1.0, 2.0, 3.0):
+                await engine.sync(player["id"], latitude, 4.0)
+            await engine.collect(kept.id, player["id"], LATITUDE, LONGITUDE, 10)
+            await engine.collect(used.id, player["id"], LATITUDE, LONGITUDE, 10)
+            await engine.use(used.id, player["id"])
+            await engine.report(player["id"], other["id"], other["id"])
+            return await engine.flush()
+
+        assert run(engine, scenario) == 7
+        writes = {query.split()[0] + " " + query.split()[2]: values for query, values in db.writes}
+        assert len(db.writes) == 4
+        assert writes["INSERT items"]["ids"] == [str(kept.id)]
+        assert writes["DELETE items"]["ids"] == [str(used.id)]
+        profiles = writes["UPDATE AS"]
+        row = profiles["ids"].index(str(player["id"]))
+        assert profiles["latitudes"][row] == 3.0
+        assert profiles["losses"][row] == 1
+        assert engine.journal.backlog() == 0
+        assert (tmp_path / "engine.journal").read_text() == ""
+
+    def test_deleting_a_collected_item_is_not_undone_by_the_flush(self, tmp_path):
+        player = profile()
+        engine, db, map_id = engine_with(tmp_path, [player])
+        item = chest(map_id)
+        engine.items.add(item)
+
+        async def scenario():
+            await engine.collect(item.id, player["id"], LATITUDE, LONGITUDE, 10)
+            owner_id = await engine.delete(item.id)
+            await engine.flush()
+            return owner_id, await engine.inventory(player["id"])
+
+        owner_id, inventory = run(engine, scenario)
+        assert owner_id == player["id"] and inventory == []
+        assert item.id not in engine._owners
+        assert [query.split()[0] for query, _ in db.writes] == ["DELETE"]
+        assert db.writes[0][1]["ids"] == [str(item.id)]
+        assert asyncio.run(engine.use(item.id, player["id"])) is None
+
+    def test_players_are_bounded_and_misses_expire(self, tmp_path):
+        players = [profile() for _ in range(3)]
+        engine, db, _ = engine_with(tmp_path, players)
+        now = [0.0]
+        engine.max_players, engine.missing_ttl, engine.clock = 2, 30.0, lambda: now[0]
+        late = profile()
+
+        async def scenario():
+            # Unwritten changes keep a player in memory past the limit
+            for player in players:
+                await engine.sync(player["id"], 1.0, 2.0)
+            assert list(engine._players) == [_key(p["id"]) for p in players]
+            await engine.flush()
+            assert list(engine._players) == [_key(p["id"]) for p in players[1:]]
+
+            assert await engine.player(late["id"]) is None
+            db.profiles[str(late["id"])] = late
+            assert await engine.player(late["id"]) is None
+            now[0] = 31.0
+            return await engine.player(late["id"])
+
+        assert run(engine, scenario).id == late["id"]
+        assert len(engine._players) == 2 and engine.evictions == 2
+
+
+class TestJournal:
+    def test_commit_waits_for_disk_and_recovery_replays(self, tmp_path):
+        path = str(tmp_path / "engine.journal")
+
+        async def write():
+            journal = Journal(path, fsync_interval=0)
+            journal.recover()
+            journal.start()
+            seqs = [journal.append("sync", player_id="p", latitude=i, longitude=0) for i in range(3)]
+            await asyncio.gather(*(journal.commit(seq) for seq in seqs))
+            assert journal.durable == 3
+            await journal.checkpoint(1)
+            await journal.close()
+
+        asyncio.run(write())
+        with open(path, "a") as journal_file:
+            journal_file.write('{"seq": 4, "op": "sy')  # torn by a crash
+
+        async def reopen():
+            journal = Journal(path)
+            entries = journal.recover()
+            assert journal.append("sync", player_id="p", latitude=9, longitude=0) == 4
+            await journal.close()
+            return entries
+
+        assert [entry["latitude"] for entry in asyncio.run(reopen())] == [1, 2]
+        lines = [json.loads(line) for line in open(path)]
+        assert [line["seq"] for line in lines] == [2, 3, 4]
+
+    def test_replay_is_idempotent_with_absolute_values(self, tmp_path):
+        player = profile(gems=10)
+        engine, db, _ = engine_with(tmp_path, [player])
+        entries = [
+            {"seq": 1, "op": "use", "item_id": str(uuid4()), "player_id": str(player["id"]), "gems": 17},
+            {
+                "seq": 2, "op": "battle", "id": str(uuid4()), "attacker_id": str(player["id"]),
+                "defender_id": str(uuid4()), "winner_id": str(player["id"]),
+                "created_at": (datetime.now(timezone.utc) - timedelta(minutes=1)).isoformat(),
+                "players": [{"id": str(player["id"]), "level": 1, "wins": 1, "losses": 0}],
+            },
+        ]
+        asyncio.run(engine.apply(entries))
+        first = list(db.writes)
+        db.writes.clear()
+        asyncio.run(engine.apply(entries))
+        assert db.writes == first
+        assert any("ON CONFLICT (id) DO NOTHING" in query for query, _ in first)
+        update = next(values for query, values in first if query.strip().startswith("UPDATE"))
+        assert update["gems"] == [17] and update["wins"] == [1]
+
+    def test_restart_replays_unflushed_collect_before_serving(self, tmp_path):
+        player = profile()
+        engine, db, map_id = engine_with(tmp_path, [player])
+        item = chest(map_id)
+        engine.items.add(item)
+
+        async def crash():
+            engine.journal.recover()
+            engine.journal.start()
+            await engine.player(player["id"])
+            await engine.collect(item.id, player["id"], LATITUDE, LONGITUDE, 10)
+            await engine.journal.close()
+
+        asyncio.run(crash())
+        # The restarted worker's index still has the item as unowned in Postgres
+        restarted, db, _ = engine_with(tmp_path, [player])
+        grid = MapGrid(restarted.items.cell_meters)
+        grid.add(item)
+        restarted.items._install(map_id, grid)
+
+        async def restart():
+            await restarted.start()
+            await restarted.stop()
+
+        asyncio.run(restart())
+        assert restarted.items.get(item.id) is None
+        upsert = next(values for query, values in db.writes if "INSERT INTO items" in query)
+        assert upsert["owners"] == [str(player["id"])]
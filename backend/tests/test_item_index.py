@@ -0,0 +1,152 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from app.services.item_index import IndexedItem, ItemIndex, MapGrid, haversine_meters
+
+
+def make_item(map_id, latitude, longitude, expires_at=None):
+    return IndexedItem(
+        id=uuid4(),
+        type="Potion",
+        subtype="Stun Brew",
+        map_id=map_id,
+        latitude=latitude,
+        longitude=longitude,
+        expires_at=expires_at,
+    )
+
+
+class TestMapGrid:
+    """Test the uniform grid backing proximity queries"""
+
+    def test_within_orders_by_distance(self):
+        map_id = uuid4()
+        grid = MapGrid(cell_meters=50.0)
+        far = make_item(map_id, 33.9515, -83.3753)
+        near = make_item(map_id, 33.9511, -83.3753)
+        outside = make_item(map_id, 33.9600, -83.3753)
+        for item in (far, near, outside):
+            grid.add(item)
+
+        now = datetime.now(timezone.utc)
+        hits = grid.within(33.9510, -83.3753, 100.0, now)
+
+        assert [item.id for _, item in hits] == [near.id, far.id]
+        assert hits[0][0] < hits[1][0] <= 100.0
+
+    def test_within_matches_brute_force(self):
+        map_id = uuid4()
+        grid = MapGrid(cell_meters=25.0)
+        items = [
+            make_item(map_id, 33.95 + i * 0.00013, -83.375 + j * 0.00017)
+            for i in range(20)
+            for j in range(20)
+        ]
+        for item in items:
+            grid.add(item)
+
+        now = datetime.now(timezone.utc)
+        hits = {item.id for _, item in grid.within(33.951, -83.374, 120.0, now)}
+        expected = {
+            item.id
+            for item in items
+            if haversine_meters(33.951, -83.374, item.latitude, item.longitude) <= 120.0
+        }
+        assert hits == expected
+
+    def test_expired_items_are_skipped(self):
+        map_id = uuid4()
+        grid = MapGrid(cell_meters=50.0)
+        now = datetime.now(timezone.utc)
+        grid.add(make_item(map_id, 33.9510, -83.3753, now - timedelta(minutes=1)))
+
+        assert grid.within(33.9510, -83.3753, 100.0, now) == []
+
+
+class TestItemIndex:
+    """Test index bookkeeping for writers"""
+
+    def test_add_and_remove_on_loaded_map(self):
+        index = ItemIndex(cell_meters=50.0)
+        map_id = uuid4()
+        index._install(map_id, MapGrid(50.0))
+
+        item = make_item(map_id, 33.9510, -83.3753)
+        index.add(item)
+        assert item.id in index._maps[map_id].items
+
+        removed = index.remove(str(item.id))
+        assert removed is item
+        assert item.id not in index._maps[map_id].items
+
+    def test_writes_to_cold_maps_are_ignored(self):
+        index = ItemIndex(cell_meters=50.0)
+        item = make_item(uuid4(), 33.9510, -83.3753)
+        index.add(item)
+
+        assert not index.is_loaded(item.map_id)
+        assert index.remove(item.id) is None
+
+
+class TestProximityChanges:
+    """Test cursor-based delta sync"""
+
+    async def _changes(self, index, map_id, latitude, longitude, radius, since):
+        return await index.changes(None, map_id, latitude, longitude, radius, since)
+
+    def _index_with_map(self):
+        index = ItemIndex(cell_meters=50.0, change_retention=4)
+        map_id = uuid4()
+        index._install(map_id, MapGrid(50.0))
+        return index, map_id
+
+    def test_delta_reports_spawns_and_collections(self):
+        index, map_id = self._index_with_map()
+        kept = make_item(map_id, 33.9511, -83.3753)
+        collected = make_item(map_id, 33.9512, -83.3753)
+        index.add(kept)
+        index.add(collected)
+        cursor = index.cursor(map_id, 33.9510, -83.3753, 100.0)
+
+        spawned = make_item(map_id, 33.9513, -83.3753)
+        index.add(spawned)
+        index.remove(collected.id)
+
+        delta = asyncio.run(
+            self._changes(index, map_id, 33.9510, -83.3753, 100.0, cursor)
+        )
+        assert delta["reset"] is False
+        assert [item.id for item in delta["added"]] == [spawned.id]
+        assert delta["removed"] == [collected.id]
+
+    def test_delta_follows_player_movement(self):
+        index, map_id = self._index_with_map()
+        behind = make_item(map_id, 33.9500, -83.3753)
+        ahead = make_item(map_id, 33.9530, -83.3753)
+        index.add(behind)
+        index.add(ahead)
+        cursor = index.cursor(map_id, 33.9500, -83.3753, 100.0)
+
+        delta = asyncio.run(
+            self._changes(index, map_id, 33.9530, -83.3753, 100.0, cursor)
+        )
+        assert [item.id for item in delta["added"]] == [ahead.id]
+        assert delta["removed"] == [behind.id]
+
+    def test_stale_or_foreign_cursor_resets(self):
+        index, map_id = self._index_with_map()
+        cursor = index.cursor(map_id, 33.9510, -83.3753, 100.0)
+        for _ in range(10):
+            index.add(make_item(map_id, 33.9510, -83.3753))
+
+        delta = asyncio.run(
+            self._changes(index, map_id, 33.9510, -83.3753, 100.0, cursor)
+        )
+        assert delta["reset"] is True
+        assert len(delta["added"]) == 10
+
+        delta = asyncio.run(
+            self._changes(index, map_id, 33.9510, -83.3753, 100.0, "other:0:0:0:100")
+        )
+        assert delta["reset"] is True
@@ -0,0 +1,47 @@
+import random
+
+from app.services.item_index import haversine_meters
+from app.services.item_spawner import poisson_disc_sample
+
+CENTER = (33.9510, -83.3753)
+
+
+class TestPoissonDiscSample:
+    """Test spatially even placement of spawned items"""
+
+    def test_points_stay_inside_area_and_apart(self):
+        points = poisson_disc_sample(
+            *CENTER, radius_meters=150.0, count=40, min_distance=20.0,
+            rng=random.Random(7),
+        )
+
+        assert len(points) == 40
+        for latitude, longitude in points:
+            assert haversine_meters(*CENTER, latitude, longitude) <= 150.5
+        for i, a in enumerate(points):
+            for b in points[i + 1:]:
+                assert haversine_meters(*a, *b) >= 19.9
+
+    def test_respects_existing_items(self):
+        existing = [CENTER]
+        points = poisson_disc_sample(
+            *CENTER, radius_meters=60.0, count=10, min_distance=15.0,
+            existing=existing, rng=random.Random(3),
+        )
+
+        for point in points:
+            assert haversine_meters(*CENTER, *point) >= 14.9
+
+    def test_stops_when_area_is_full(self):
+        points = poisson_disc_sample(
+            *CENTER, radius_meters=10.0, count=100, min_distance=10.0,
+            rng=random.Random(1),
+        )
+
+        # A 10 m disc cannot hold 100 points 10 m apart
+        assert 0 < len(points) < 10
+
+    def test_deterministic_for_a_seed(self):
+        first = poisson_disc_sample(*CENTER, 100.0, 20, 10.0, rng=random.Random(42))
+        second = poisson_disc_sample(*CENTER, 100.0, 20, 10.0, rng=random.Random(42))
+        assert first == second
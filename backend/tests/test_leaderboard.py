@@ -0,0 +1,170 @@
+import asyncio
+from uuid import UUID, uuid4
+
+from app.services.leaderboard import Leaderboard, MapBoard
+
+
+def player(name, wins=0, level=1, **overrides):
+    row = {"id": uuid4(), "name": name, "level": level, "wins": wins, "losses": 0}
+    row.update(overrides)
+    return row
+
+
+class BoardDatabase:
+    """Serves a fixed board for a map and profiles by id"""
+
+    def __init__(self, holdings, profiles=()):
+        self.holdings = holdings
+        self.profiles = {p["id"]: p for p in list(profiles) + [p for p, _ in holdings]}
+        self.queries = 0
+        # When set, board queries wait for it
+        self.gate = None
+
+    async def fetch_all(self, query, values=None):
+        self.queries += 1
+        if "COUNT(*)" in query:
+            if self.gate is not None:
+                await self.gate.wait()
+            return [{**p, "items_collected": count} for p, count in self.holdings]
+        return [self.profiles[UUID(i)] for i in values["ids"]]
+
+
+class TestMapBoard:
+    def test_orders_by_items_then_wins_then_level(self):
+        board = MapBoard()
+        a, b, c = player("a", wins=1), player("b", wins=5), player("c", wins=5, level=3)
+        board.set(a["id"], 4, a)
+        board.set(b["id"], 2, b)
+        board.set(c["id"], 2, c)
+
+        assert [pid for pid, _ in board.top(10)] == [a["id"], c["id"], b["id"]]
+        assert board.rank(b["id"]) == 3
+
+    def test_zero_count_leaves_board(self):
+        board = MapBoard()
+        a = player("a")
+        board.set(a["id"], 1, a)
+        board.set(a["id"], 0, a)
+
+        assert len(board) == 0
+        assert board.rank(a["id"]) is None
+
+
+class TestLeaderboard:
+    def test_loads_once_then_serves_from_memory(self):
+        map_id = uuid4()
+        a, b = player("a"), player("b")
+        db = BoardDatabase([(a, 3), (b, 1)])
+        board = Leaderboard(db)
+
+        async def run():
+            first = await board.top(map_id)
+            board.adjust(map_id, b["id"], +3)
+            second = await board.top(map_id)
+            return first, second
+
+        first, second = asyncio.run(run())
+
+        assert [row["name"] for row in first] == ["a", "b"]
+        assert [(row["name"], row["items_collected"]) for row in second] == [("b", 4), ("a", 3)]
+        assert db.queries == 1
+
+    def test_new_player_resolved_on_next_read(self):
+        map_id = uuid4()
+        a, newcomer = player("a"), player("newcomer")
+        db = BoardDatabase([(a, 1)], profiles=[newcomer])
+        board = Leaderboard(db)
+
+        async def run():
+            await board.top(map_id)
+            board.adjust(map_id, newcomer["id"], +1)
+            board.adjust(map_id, newcomer["id"], +1)
+            return await board.standing(map_id, newcomer["id"])
+
+        standing = asyncio.run(run())
+
+        assert standing["rank"] == 1
+        assert standing["items_collected"] == 2
+        assert standing["players"] == 2
+
+    def test_battle_results_reposition_player(self):
+        map_id = uuid4()
+        a, b = player("a", wins=2), player("b", wins=1)
+        board = Leaderboard(BoardDatabase([(a, 1), (b, 1)]))
+
+        async def run():
+            await board.top(map_id)
+            board.update_player({**b, "wins": 3})
+            return await board.top(map_id)
+
+        assert [row["name"] for row in asyncio.run(run())] == ["b", "a"]
+
+    def test_reconcile_replaces_drifted_counts(self):
+        map_id = uuid4()
+        a = player("a")
+        db = BoardDatabase([(a, 2)])
+        board = Leaderboard(db)
+
+        async def run():
+            await board.top(map_id)
+            board.adjust(map_id, a["id"], +10)
+            await board.reconcile()
+            return await board.top(map_id)
+
+        assert asyncio.run(run())[0]["items_collected"] == 2
+
+    def test_forget_player(self):
+        map_id = uuid4()
+        a = player("a")
+        board = Leaderboard(BoardDatabase([(a, 2)]))
+
+        async def run():
+            await board.top(map_id)
+            board.forget_player(a["id"])
+            return await board.top(map_id)
+
+        assert asyncio.run(run()) == []
+
+    def test_invalidation_from_another_worker(self):
+        map_id = uuid4()
+        a, b = player("a", wins=2), player("b", wins=1)
+        db = BoardDatabase([(a, 1), (b, 1)])
+        board = Leaderboard(db)
+
+        async def run():
+            await board.top(map_id)
+            db.profiles[b["id"]] = {**b, "wins": 3}
+            board.invalidate_player(b["id"])
+            reordered = await board.top(map_id)
+            db.holdings = [(a, 1), (db.profiles[b["id"]], 4)]
+            board.invalidate(map_id)
+            return reordered, await board.top(map_id)
+
+        reordered, reloaded = asyncio.run(run())
+        assert [row["name"] for row in reordered] == ["b", "a"]
+        assert reloaded[0]["items_collected"] == 4
+        assert db.queries == 3
+
+    def test_adjustments_during_a_reload_are_replayed(self):
+        map_id = uuid4()
+        a, b, newcomer = player("a"), player("b"), player("newcomer")
+        db = BoardDatabase([(a, 2), (b, 1)], profiles=[newcomer])
+        board = Leaderboard(db)
+
+        async def run():
+            await board.top(map_id)
+            db.gate = asyncio.Event()
+            board.invalidate(map_id)
+            reload = asyncio.ensure_future(board.top(map_id))
+            while map_id not in board._racing:
+                await asyncio.sleep(0)
+            # Written after the snapshot was taken
+            board.adjust(map_id, b["id"], +2)
+            board.adjust(map_id, newcomer["id"], +1)
+            db.gate.set()
+            return await reload
+
+        rows = asyncio.run(run())
+        assert [(row["name"], row["items_collected"]) for row in rows] == [
+            ("b", 3), ("a", 2), ("newcomer", 1)
+        ]
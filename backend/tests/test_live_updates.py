@@ -0,0 +1,98 @@
+import json
+import time
+from uuid import uuid4
+
+from app.services.item_index import IndexedItem
+from app.services.live_updates import EVICTED, LiveHub
+
+
+def make_item(map_id, latitude=33.9510, longitude=-83.3753):
+    return IndexedItem(
+        id=uuid4(),
+        type="Gem",
+        subtype="Focus Crystal",
+        map_id=map_id,
+        latitude=latitude,
+        longitude=longitude,
+    )
+
+
+class TestLiveHub:
+    """Test per-map fan-out of item events"""
+
+    def test_publish_reaches_map_subscribers_only(self):
+        hub = LiveHub(queue_size=8)
+        map_id = uuid4()
+        watcher = hub.subscribe(map_id)
+        other = hub.subscribe(uuid4())
+
+        item = make_item(map_id)
+        hub.publish("spawned", map_id, item.id, item)
+
+        message = json.loads(watcher.queue.get_nowait())
+        assert message["event"] == "spawned"
+        assert message["item_id"] == str(item.id)
+        assert message["item"]["location"]["coordinates"] == [-83.3753, 33.951]
+        assert other.queue.empty()
+
+    def test_radius_filter(self):
+        hub = LiveHub(queue_size=8)
+        map_id = uuid4()
+        subscriber = hub.subscribe(
+            map_id, latitude=33.9510, longitude=-83.3753, radius=50.0
+        )
+
+        far = make_item(map_id, latitude=33.9600)
+        hub.publish("spawned", map_id, far.id, far)
+        assert subscriber.queue.empty()
+
+        subscriber.move(33.9600, -83.3753)
+        hub.publish("collected", map_id, far.id, far)
+        assert json.loads(subscriber.queue.get_nowait())["event"] == "collected"
+
+    def test_slow_consumer_is_evicted(self):
+        hub = LiveHub(queue_size=2)
+        map_id = uuid4()
+        slow = hub.subscribe(map_id)
+
+        for _ in range(3):
+            item = make_item(map_id)
+            hub.publish("spawned", map_id, item.id, item)
+
+        assert slow.evicted
+        assert slow.queue.get_nowait() is EVICTED
+        assert hub.subscriber_count(map_id) == 0
+        assert hub.evictions == 1
+
+
+def eventually(condition, timeout=2.0) -> bool:
+    """Wait for the app, running in the test client's thread, to catch up"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class TestLiveSocket:
+    def test_ignores_malformed_messages_and_unsubscribes_on_disconnect(self, caplog):
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+
+        from app.routers import live
+
+        app = FastAPI()
+        app.include_router(live.router)
+        map_id = uuid4()
+
+        with TestClient(app) as client:
+            with client.websocket_connect(f"/map/{map_id}/live?radius=50") as websocket:
+                websocket.send_text("not json")
+                websocket.send_json([1, 2])
+                websocket.send_json({"latitude": 33.9510, "longitude": -83.3753, "radius": 0})
+                websocket.send_json({"latitude": 33.9510})
+                (subscriber,) = live.live_hub._subscribers[map_id]
+                assert eventually(lambda: subscriber.radius == 0)
+            assert eventually(lambda: live.live_hub.subscriber_count(map_id) == 0)
+        assert "exception was never retrieved" not in caplog.text
@@ -0,0 +1,88 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+
+from app.services.location_buffer import LocationBuffer
+
+
+class RecordingDatabase:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.executed = []
+
+    async def execute(self, query, values=None):
+        if self.fail:
+            raise RuntimeError("database unavailable")
+        self.executed.append((query, values))
+
+    async def fetch_one(self, query, values=None):
+        return {"?column?": 1}
+
+
+class TestLocationBuffer:
+    """Test coalescing of player location fixes"""
+
+    def test_keeps_latest_fix_per_player(self):
+        db = RecordingDatabase()
+        buffer = LocationBuffer(db)
+        walker, other = uuid4(), uuid4()
+        buffer.record(walker, 33.9510, -83.3753)
+        buffer.record(walker, 33.9511, -83.3754)
+        buffer.record(other, 33.9500, -83.3700)
+
+        assert asyncio.run(buffer.flush()) == 2
+
+        _, values = db.executed[0]
+        positions = dict(zip(values["ids"], zip(values["latitudes"], values["longitudes"])))
+        assert positions == {
+            str(walker): (33.9511, -83.3754),
+            str(other): (33.9500, -83.3700),
+        }
+        assert buffer.position(walker) is None
+        assert asyncio.run(buffer.flush()) == 0
+
+    def test_failed_flush_keeps_unsuperseded_fixes(self):
+        db = RecordingDatabase(fail=True)
+        buffer = LocationBuffer(db)
+        walker = uuid4()
+        buffer.record(walker, 33.9510, -83.3753)
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(buffer.flush())
+
+        assert buffer.position(walker) == (33.9510, -83.3753)
+
+    def test_player_existence_is_cached(self):
+        db = RecordingDatabase()
+        buffer = LocationBuffer(db)
+        walker = uuid4()
+
+        assert asyncio.run(buffer.player_exists(walker))
+        db.fetch_one = None
+        assert asyncio.run(buffer.player_exists(walker))
+
+    def test_stop_during_flush_still_writes_the_batch(self):
+        db = RecordingDatabase()
+        buffer = LocationBuffer(db, interval=0)
+        walker = uuid4()
+        buffer.record(walker, 33.9510, -83.3753)
+
+        async def run():
+            writing = asyncio.Event()
+            execute = db.execute
+
+            async def slow_execute(query, values=None):
+                writing.set()
+                await asyncio.sleep(1)
+
+            db.execute = slow_execute
+            buffer.start()
+            await writing.wait()
+            db.execute = execute
+            await buffer.stop()
+
+        asyncio.run(run())
+        (_, values), = db.executed
+        assert values["ids"] == [str(walker)]
+        assert buffer.position(walker) is None
@@ -0,0 +1,155 @@
+import asyncio
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from app.services.map_stats import MapStats
+
+START = 1_700_000_000.0 - (1_700_000_000.0 % 60)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = START
+
+    def __call__(self):
+        return self.now
+
+
+def at(seconds: float) -> datetime:
+    return datetime.fromtimestamp(START + seconds, timezone.utc)
+
+
+class StatsDatabase:
+    """One map holding two unowned items and one owned by ``owner``"""
+
+    def __init__(self, owner):
+        self.owner = owner
+        self.loads = 0
+        # When set, count queries wait for it
+        self.gate = None
+
+    async def fetch_one(self, query, values=None):
+        self.loads += 1
+        if self.gate is not None:
+            await self.gate.wait()
+        return {
+            "total": 3,
+            "available": 2,
+            "expired": 1,
+            "upcoming_minutes": [int(START // 60) + 2, int(START // 60) + 10],
+            "upcoming_items": [1, 1],
+        }
+
+    async def fetch_all(self, query, values=None):
+        return [{"owner_id": self.owner, "items": 1}]
+
+
+def loaded(owner=None):
+    owner = owner or uuid4()
+    clock = FakeClock()
+    db = StatsDatabase(owner)
+    stats = MapStats(db, clock=clock)
+    map_id = uuid4()
+    asyncio.run(stats.current(map_id))
+    return stats, db, clock, map_id, owner
+
+
+class TestMapStats:
+    def test_loads_once_then_counts_events(self):
+        stats, db, _, map_id, owner = loaded()
+        player = uuid4()
+
+        stats.spawned(map_id, at(3600))
+        stats.collected(map_id, player)
+        stats.removed(map_id, owner)
+
+        assert asyncio.run(stats.current(map_id)) == {
+            "total": 3,
+            "available": 2,
+            "collected": 1,
+            "expired": 1,
+            "active_players": 1,
+        }
+        assert db.loads == 1
+
+    def test_expired_count_follows_the_clock(self):
+        stats, _, clock, map_id, _ = loaded()
+
+        clock.now += 121
+        assert asyncio.run(stats.current(map_id))["expired"] == 2
+
+        stats.removed(map_id, None, at(120))
+        assert asyncio.run(stats.current(map_id))["expired"] == 1
+
+    def test_history_closes_minutes_lazily(self):
+        stats, _, clock, map_id, _ = loaded()
+
+        stats.spawned(map_id, at(3600))
+        stats.spawned(map_id, at(3600))
+        clock.now += 60
+        stats.collected(map_id, uuid4())
+        clock.now += 125
+
+        history = asyncio.run(stats.history(map_id, minutes=60))
+
+        assert [row["spawned"] for row in history] == [2, 0, 0]
+        assert [row["collected_events"] for row in history] == [0, 1, 0]
+        assert [row["expired"] for row in history] == [1, 1, 2]
+        assert history[0]["minute"] == at(0)
+
+    def test_reconcile_keeps_history(self):
+        stats, db, clock, map_id, _ = loaded()
+        stats.spawned(map_id, None)
+        clock.now += 60
+
+        asyncio.run(stats.reconcile())
+
+        assert asyncio.run(stats.current(map_id))["total"] == 3
+        assert len(asyncio.run(stats.history(map_id))) == 1
+        assert db.loads == 2
+
+    def test_events_for_unloaded_maps_are_ignored(self):
+        stats, _, _, _, _ = loaded()
+        stats.spawned(uuid4(), None)
+        stats.collected(None, uuid4())
+
+    def test_expiries_are_counted_per_minute(self):
+        stats, _, clock, map_id, _ = loaded()
+
+        stats.spawned(map_id, at(130))
+        stats.spawned(map_id, at(170))
+        stats.spawned(map_id, at(175))
+        stats.removed(map_id, None, at(175))
+
+        clock.now += 170
+        assert asyncio.run(stats.current(map_id))["expired"] == 2
+        clock.now += 10
+        assert asyncio.run(stats.current(map_id))["expired"] == 4
+        assert stats._maps[map_id].upcoming == {int(START // 60) + 10: 1}
+
+    def test_events_during_a_reload_are_replayed(self):
+        stats, db, _, map_id, owner = loaded()
+        player = uuid4()
+
+        async def run():
+            db.gate = asyncio.Event()
+            stats.invalidate(map_id)
+            reload = asyncio.ensure_future(stats.current(map_id))
+            while map_id not in stats._racing:
+                await asyncio.sleep(0)
+            # Written after the snapshot was taken
+            stats.spawned(map_id, at(3600))
+            stats.collected(map_id, player)
+            stats.removed(map_id, owner)
+            db.gate.set()
+            return await reload
+
+        assert asyncio.run(run()) == {
+            "total": 3,
+            "available": 2,
+            "collected": 1,
+            "expired": 1,
+            "active_players": 1,
+        }
+        assert stats._maps[map_id].owners == {player: 1}
+        assert stats._maps[map_id].events["spawned"] == 1
@@ -0,0 +1,68 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.metrics import Exposition, HTTPMetrics, Histogram, MetricsMiddleware, record_query
+
+
+def metrics_app():
+    metrics = HTTPMetrics()
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+    @app.get("/things/{thing_id}")
+    async def get_thing(thing_id: int):
+        record_query(0.002)
+        record_query(0.003)
+        return {"id": thing_id}
+
+    return TestClient(app), metrics
+
+
+class TestMetricsMiddleware:
+    def test_labels_by_route_template(self):
+        client, metrics = metrics_app()
+        client.get("/things/1")
+        client.get("/things/2")
+        client.get("/nowhere")
+
+        assert metrics.requests == {
+            ("GET", "/things/{thing_id}", 200): 2,
+            ("GET", "unmatched", 404): 1,
+        }
+        assert metrics.db_queries[("GET", "/things/{thing_id}")] == 4
+        db_time = metrics.db_time[("GET", "/things/{thing_id}")]
+        assert db_time.sum == pytest.approx(0.01)
+        assert db_time.cumulative()["0.005"] == 2
+
+    def test_queries_outside_requests_are_ignored(self):
+        record_query(1.0)
+
+
+class TestExposition:
+    def test_histogram_text(self):
+        histogram = Histogram(buckets=(0.1, 1.0))
+        histogram.observe(0.5)
+        exposition = Exposition()
+        exposition.declare("latency_seconds", "histogram", "Latency")
+        exposition.histogram("latency_seconds", histogram, route='/a"b')
+
+        assert exposition.text().splitlines() == [
+            "# HELP latency_seconds Latency",
+            "# TYPE latency_seconds histogram",
+            'latency_seconds_bucket{route="/a\\"b",le="0.1"} 0',
+            'latency_seconds_bucket{route="/a\\"b",le="1.0"} 1',
+            'latency_seconds_bucket{route="/a\\"b",le="+Inf"} 1',
+            'latency_seconds_sum{route="/a\\"b"} 0.5',
+            'latency_seconds_count{route="/a\\"b"} 1',
+        ]
+
+    def test_metrics_endpoint(self):
+        from main import app
+
+        response = TestClient(app).get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert "# TYPE db_pool_acquire_wait_seconds histogram" in response.text
+        assert "# TYPE http_request_db_seconds histogram" in response.text
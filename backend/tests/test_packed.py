@@ -0,0 +1,136 @@
+import json
+import uuid
+from datetime import datetime, timezone
+
+import msgpack
+
+from app.core.packed import (
+    COORDINATE_SCALE,
+    JSON,
+    MSGPACK,
+    PACKED_JSON,
+    items_response,
+    negotiate,
+    pack_items,
+    unpack_items,
+)
+from app.core.serialization import item_from_row
+from app.services.item_index import IndexedItem
+
+MAP_ID = uuid.uuid4()
+EXPIRES = datetime(2025, 3, 1, 8, 0, 0, tzinfo=timezone.utc)
+
+
+def row(**overrides):
+    values = {
+        "id": uuid.uuid4(),
+        "type": "Gem",
+        "subtype": "Focus Crystal",
+        "owner_id": None,
+        "map_id": MAP_ID,
+        "latitude": 33.9510123,
+        "longitude": -83.3753456,
+        "expires_at": EXPIRES,
+    }
+    values.update(overrides)
+    return values
+
+
+def assert_same_items(decoded, rows):
+    expected = [item_from_row(r).model_dump() for r in rows]
+    assert len(decoded) == len(expected)
+    for got, want in zip(decoded, expected):
+        got, want = dict(got), dict(want)
+        got_location, want_location = got.pop("location"), want.pop("location")
+        assert got == want
+        if want_location is None:
+            assert got_location is None
+        else:
+            for a, b in zip(got_location["coordinates"], want_location["coordinates"]):
+                assert abs(a - b) <= 1 / COORDINATE_SCALE
+
+
+class TestNegotiate:
+    def test_defaults_to_json(self):
+        assert negotiate(None) == JSON
+        assert negotiate("*/*") == JSON
+        assert negotiate("text/html") == JSON
+
+    def test_packed_formats(self):
+        assert negotiate("application/x-msgpack") == MSGPACK
+        assert negotiate(PACKED_JSON) == PACKED_JSON
+
+    def test_quality_values(self):
+        assert negotiate("application/json;q=0.5, application/x-msgpack") == MSGPACK
+        assert negotiate("application/x-msgpack;q=0.1, */*") == JSON
+        assert negotiate("application/x-msgpack;q=0") == JSON
+
+
+class TestPackedRoundTrip:
+    def test_msgpack_round_trip(self):
+        rows = [
+            row(),
+            row(type="Chest", subtype="Iron Crate", owner_id=uuid.uuid4()),
+            row(latitude=None, longitude=None, expires_at=None, map_id=None),
+        ]
+
+        body = items_response(MSGPACK, rows, item_from_row).body
+
+        assert_same_items(unpack_items(msgpack.unpackb(body)), rows)
+
+    def test_packed_json_round_trip(self):
+        rows = [row(), row(subtype="Stun Brew", type="Potion")]
+
+        response = items_response(PACKED_JSON, rows, item_from_row)
+
+        assert response.media_type == PACKED_JSON
+        assert_same_items(unpack_items(json.loads(response.body)), rows)
+
+    def test_indexed_items_pack_like_rows(self):
+        values = row()
+        indexed = IndexedItem(
+            **{k: v for k, v in values.items() if k != "owner_id"}
+        )
+
+        assert pack_items([indexed]) == pack_items([values])
+
+    def test_dictionary_columns(self):
+        packed = pack_items([row(), row(), row(subtype="Stun Brew", type="Potion")])
+
+        assert packed["subtypes"] == ["Focus Crystal", "Stun Brew"]
+        assert packed["subtype"] == [0, 0, 1]
+        assert packed["maps"] == [MAP_ID.bytes]
+        assert packed["map"] == [0, 0, 0]
+        assert [packed["types"][code] for code in packed["type"]] == ["Gem", "Gem", "Potion"]
+
+    def test_position_override(self):
+        packed = pack_items([row()], position=(10.0, 20.0))
+
+        assert packed["lat"] == [10 * COORDINATE_SCALE]
+        assert packed["lng"] == [20 * COORDINATE_SCALE]
+
+    def test_delta_envelope(self):
+        removed = uuid.uuid4()
+        envelope = {"cursor": "c", "reset": False, "added": [], "removed": [removed]}
+
+        body = items_response(
+            MSGPACK, [row()], item_from_row, headers={"X-Map-Cursor": "c"}, envelope=envelope
+        ).body
+        decoded = msgpack.unpackb(body)
+
+        assert decoded["cursor"] == "c"
+        assert decoded["removed"] == [removed.bytes]
+        assert len(unpack_items(decoded["added"])) == 1
+
+    def test_json_stays_default_shape(self):
+        rows = [row()]
+
+        response = items_response(JSON, rows, item_from_row)
+
+        assert json.loads(response.body) == json.loads(
+            json.dumps([item_from_row(rows[0]).model_dump(mode="json")])
+        )
+        assert response.headers["vary"] == "Accept"
+
+    def test_empty_payload(self):
+        assert unpack_items(pack_items([])) == []
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.pagination import (
+    NEXT_CURSOR_HEADER,
+    decode_cursor,
+    encode_cursor,
+    keyset_condition,
+    keyset_values,
+    page,
+)
+
+NOW = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def rows(count):
+    return [{"id": uuid4(), "created_at": NOW - timedelta(minutes=i)} for i in range(count)]
+
+
+class TestCursors:
+    def test_round_trip(self):
+        row_id = uuid4()
+        assert decode_cursor(encode_cursor(NOW, row_id)) == (NOW, row_id)
+
+    def test_no_cursor_is_first_page(self):
+        assert decode_cursor(None) is None
+        assert keyset_condition(None) == ""
+        assert keyset_values(None) == {}
+
+    @pytest.mark.parametrize("cursor", ["garbage", encode_cursor(NOW, "not-a-uuid")])
+    def test_bad_cursor_is_400(self, cursor):
+        with pytest.raises(HTTPException) as error:
+            decode_cursor(cursor)
+        assert error.value.status_code == 400
+
+    def test_condition_compares_the_sort_key(self):
+        key = decode_cursor(encode_cursor(NOW, uuid4()))
+        assert "(bl.created_at, bl.id) <" in keyset_condition(key, prefix="bl.")
+        assert keyset_values(key)["cursor_created_at"] == NOW
+
+
+class TestPage:
+    def test_full_page_links_to_next(self):
+        fetched = rows(4)
+        result, headers = page(fetched, 3)
+
+        assert result == fetched[:3]
+        assert decode_cursor(headers[NEXT_CURSOR_HEADER]) == (
+            fetched[2]["created_at"],
+            fetched[2]["id"],
+        )
+
+    def test_last_page_has_no_cursor(self):
+        fetched = rows(3)
+        assert page(fetched, 3) == (fetched, {})
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from app.core.metrics import Histogram
+from app.core.pool import InstrumentedPool, PoolExhausted, PoolMetrics
+
+
+class FakePool:
+    """asyncpg-like pool of ``size`` connections"""
+
+    def __init__(self, size):
+        self.size = size
+        self.free = asyncio.Queue()
+        for n in range(size):
+            self.free.put_nowait(f"connection-{n}")
+
+    async def acquire(self, timeout=None):
+        return await asyncio.wait_for(self.free.get(), timeout)
+
+    async def release(self, connection):
+        self.free.put_nowait(connection)
+
+    def get_max_size(self):
+        return self.size
+
+
+class TestHistogram:
+    def test_cumulative_buckets(self):
+        histogram = Histogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+
+        assert histogram.cumulative() == {"0.1": 2, "1.0": 3, "+Inf": 4}
+        assert histogram.count == 4
+        assert histogram.sum == pytest.approx(3.65)
+
+
+class TestInstrumentedPool:
+    def test_tracks_connections_in_use(self):
+        async def run():
+            pool = InstrumentedPool(FakePool(2), PoolMetrics(), acquire_timeout=1)
+            first = await pool.acquire()
+            await pool.acquire()
+            in_use = pool.metrics.in_use
+            await pool.release(first)
+            return pool.metrics, in_use
+
+        metrics, in_use = asyncio.run(run())
+
+        assert in_use == 2
+        assert metrics.in_use == 1
+        assert metrics.acquires == 2
+        assert metrics.wait.count == 2
+
+    def test_exhaustion_raises_after_timeout(self):
+        async def run():
+            pool = InstrumentedPool(FakePool(1), PoolMetrics(), acquire_timeout=0.01)
+            await pool.acquire()
+            with pytest.raises(PoolExhausted):
+                await pool.acquire()
+            return pool.metrics
+
+        metrics = asyncio.run(run())
+
+        assert metrics.timeouts == 1
+        assert metrics.waiters == 0
+        assert metrics.wait.cumulative()["0.005"] == 1
+
+    def test_waiters_counted_while_blocked(self):
+        async def run():
+            pool = InstrumentedPool(FakePool(1), PoolMetrics(), acquire_timeout=1)
+            held = await pool.acquire()
+            waiting = asyncio.ensure_future(pool.acquire())
+            await asyncio.sleep(0)
+            waiters = pool.metrics.waiters
+            await pool.release(held)
+            await waiting
+            return waiters, pool.metrics.waiters
+
+        assert asyncio.run(run()) == (1, 0)
+
+
+class TestConnectionChurn:
+    def test_opened_and_closed(self):
+        class Connection:
+            def add_termination_listener(self, listener):
+                self.listener = listener
+
+        metrics = PoolMetrics()
+        connection = Connection()
+        asyncio.run(metrics.on_connect(connection))
+        connection.listener(connection)
+
+        assert (metrics.opened, metrics.closed) == (1, 1)
@@ -0,0 +1,106 @@
+import uuid
+
+from app.services.profile_cache import ProfileCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def profile(name="Merlin", **overrides):
+    row = {
+        "id": uuid.uuid4(),
+        "name": name,
+        "description": None,
+        "level": 1,
+        "wins": 0,
+        "losses": 0,
+        "gems": 50,
+        "latitude": 33.951,
+        "longitude": -83.3753,
+    }
+    row.update(overrides)
+    return row
+
+
+class TestProfileCache:
+    def test_read_through_by_id_and_name(self):
+        cache = ProfileCache()
+        row = profile()
+
+        assert cache.get(row["id"]) is None
+        cache.put(row)
+
+        assert cache.get(row["id"])["gems"] == 50
+        assert cache.get(str(row["id"]))["name"] == "Merlin"
+        assert cache.get_by_name("Merlin")["id"] == row["id"]
+        assert cache.stats()["hits"] == 3
+        assert cache.stats()["misses"] == 1
+
+    def test_least_recently_used_is_evicted(self):
+        cache = ProfileCache(max_entries=2)
+        first, second, third = profile("a"), profile("b"), profile("c")
+        cache.put(first)
+        cache.put(second)
+        cache.get(first["id"])
+
+        cache.put(third)
+
+        assert cache.get(second["id"]) is None
+        assert cache.get_by_name("b") is None
+        assert cache.get(first["id"]) is not None
+        assert cache.stats()["evictions"] == 1
+
+    def test_entries_expire(self):
+        clock = FakeClock()
+        cache = ProfileCache(ttl=30, clock=clock)
+        row = profile()
+        cache.put(row)
+
+        clock.now = 31
+        assert cache.get(row["id"]) is None
+        assert cache.stats()["expirations"] == 1
+        assert cache.get_by_name("Merlin") is None
+
+    def test_invalidate_drops_both_keys(self):
+        cache = ProfileCache()
+        row = profile()
+        cache.put(row)
+
+        cache.invalidate(row["id"])
+
+        assert cache.get(row["id"]) is None
+        assert cache.get_by_name("Merlin") is None
+        assert cache.stats()["invalidations"] == 1
+
+    def test_read_racing_an_invalidation_is_not_cached(self):
+        cache = ProfileCache()
+        row = profile()
+        version = cache.version
+
+        cache.invalidate(row["id"])
+        cache.put(row, version)
+
+        assert cache.get(row["id"]) is None
+
+    def test_update_position_keeps_entry(self):
+        cache = ProfileCache()
+        row = profile()
+        cache.put(row)
+
+        cache.update_position(row["id"], 10.0, 20.0)
+
+        cached = cache.get(row["id"])
+        assert (cached["latitude"], cached["longitude"]) == (10.0, 20.0)
+
+    def test_disabled_cache_never_hits(self):
+        cache = ProfileCache(enabled=False)
+        row = profile()
+        cache.put(row)
+
+        assert cache.get(row["id"]) is None
+        assert cache.stats()["entries"] == 0
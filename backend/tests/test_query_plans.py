@@ -0,0 +1,136 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+from uuid import UUID
+
+import asyncpg
+import pytest
+from alembic import command
+from alembic.config import Config
+
+from app.core.pagination import keyset_values
+from app.core.statements import Statement, statements
+from app.database import DATABASE_URL
+from app.routers import items, players  # noqa: F401 (declare their statements)
+from app.routers.battles import player_battles_query, recent_battles_query
+from app.services.item_service import ItemService
+from app.services.map_stats import MapStats
+
+BACKEND = Path(__file__).resolve().parents[1]
+TEST_DATABASE_URL = DATABASE_URL.replace("/wizard_go", "/wizard_go_test")
+
+MAP_ID = UUID("550e8400-e29b-41d4-a716-446655440011")
+PLAYER_ID = UUID("550e8400-e29b-41d4-a716-446655440101")
+CURSOR = (datetime(2026, 1, 1, tzinfo=timezone.utc), PLAYER_ID)
+
+
+async def _prepare_schema():
+    connection = await asyncpg.connect(TEST_DATABASE_URL, timeout=5)
+    try:
+        if await connection.fetchval("SELECT to_regclass('items')") is None:
+            # The base schema the migrations start from
+            await connection.execute((BACKEND / "db-init" / "01_init.sql").read_text())
+    finally:
+        await connection.close()
+
+
+@pytest.fixture(scope="module")
+def migrated_database():
+    """URL of the test database upgraded to the latest migration"""
+    try:
+        asyncio.run(_prepare_schema())
+    except (OSError, asyncio.TimeoutError, asyncpg.PostgresError) as e:
+        pytest.skip(f"No test database at {TEST_DATABASE_URL}: {e}")
+    config = Config(str(BACKEND / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND / "migrations"))
+    config.set_main_option("sqlalchemy.url", TEST_DATABASE_URL)
+    command.upgrade(config, "head")
+    return TEST_DATABASE_URL
+
+
+def index_names(plan) -> set:
+    """Every index a JSON EXPLAIN plan reads"""
+    names = set()
+    if isinstance(plan, dict):
+        if "Index Name" in plan:
+            names.add(plan["Index Name"])
+        for value in plan.values():
+            names |= index_names(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            names |= index_names(value)
+    return names
+
+
+def explain(url: str, sql: str, values: dict) -> set:
+    """Indexes the plan for ``sql`` reads, with ``:name`` values bound as the routers bind them"""
+    statement = Statement("explain", sql)
+
+    async def run():
+        connection = await asyncpg.connect(url)
+        transaction = connection.transaction()
+        await transaction.start()
+        try:
+            # The test tables are tiny, so make the planner show its index choice
+            await connection.execute("SET LOCAL enable_seqscan = off")
+            return await connection.fetchval(
+                f"EXPLAIN (FORMAT JSON) {statement.positional}", *statement.arguments(values)
+            )
+        finally:
+            await transaction.rollback()
+            await connection.close()
+
+    plan = asyncio.run(run())
+    return index_names(json.loads(plan) if isinstance(plan, str) else plan)
+
+
+class TestHotQueryPlans:
+    """The routers' hot queries keep using the indexes added for them"""
+
+    def test_proximity_uses_unowned_map_location_index(self, migrated_database):
+        names = explain(
+            migrated_database,
+            statements["nearby_items"].sql,
+            {"map_id": MAP_ID, "latitude": 33.951, "longitude": -83.3753, "radius": 50.0},
+        )
+        assert "idx_items_unowned_map_location" in names
+
+    def test_inventory_uses_owner_index(self, migrated_database):
+        names = explain(
+            migrated_database,
+            statements["player_inventory"].sql,
+            {"player_id": PLAYER_ID},
+        )
+        assert "idx_items_owner_map" in names
+
+    def test_map_owners_use_map_owner_index(self, migrated_database):
+        names = explain(migrated_database, MapStats._OWNERS_QUERY, {"map_id": MAP_ID})
+        assert "idx_items_map_owner" in names
+
+    def test_player_battles_use_both_side_keyset_indexes(self, migrated_database):
+        names = explain(
+            migrated_database,
+            player_battles_query(CURSOR),
+            {"player_id": PLAYER_ID, "limit": 21, **keyset_values(CURSOR)},
+        )
+        assert {
+            "idx_battle_logs_attacker_keyset",
+            "idx_battle_logs_defender_keyset",
+        } <= names
+
+    def test_recent_battles_use_keyset_index(self, migrated_database):
+        names = explain(
+            migrated_database,
+            recent_battles_query(CURSOR, since=False),
+            {"limit": 21, **keyset_values(CURSOR)},
+        )
+        assert "idx_battle_logs_keyset" in names
+
+    def test_expiry_reaper_uses_expires_at_index(self, migrated_database):
+        names = explain(
+            migrated_database,
+            ItemService._CLEANUP_EXPIRED_QUERY,
+            {"batch_size": 500},
+        )
+        assert "idx_items_unowned_expires_at" in names
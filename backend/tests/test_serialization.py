@@ -0,0 +1,105 @@
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.core.serialization import (
+    FastJSONResponse,
+    IsoJSONResponse,
+    battle_log_from_row,
+    item_from_row,
+    point,
+    profile_from_row,
+)
+from app.schemas.schemas import BattleLog, Item, Profile
+
+CREATED = datetime(2025, 2, 1, 12, 30, 15, 250000, tzinfo=timezone.utc)
+
+
+def item_row(**overrides):
+    row = {
+        "id": uuid.uuid4(),
+        "type": "Chest",
+        "subtype": "Iron Crate",
+        "owner_id": None,
+        "map_id": uuid.uuid4(),
+        "latitude": 33.9510004,
+        "longitude": -83.3753001,
+        "expires_at": CREATED,
+    }
+    row.update(overrides)
+    return row
+
+
+class TestFastSerialization:
+    """The fast path writes exactly what response_model validation wrote"""
+
+    def test_items_match_validated_models(self):
+        rows = [item_row(), item_row(latitude=None, longitude=None, expires_at=None)]
+        validated = [
+            Item(
+                **{k: v for k, v in row.items() if k not in ("latitude", "longitude")},
+                location=(
+                    {"type": "Point", "coordinates": [row["longitude"], row["latitude"]]}
+                    if row["latitude"] is not None
+                    else None
+                ),
+            )
+            for row in rows
+        ]
+
+        body = FastJSONResponse([item_from_row(row) for row in rows]).body
+
+        assert body == TypeAdapter(List[Item]).dump_json(validated)
+
+    def test_position_overrides_row_coordinates(self):
+        item = item_from_row(item_row(), position=(10.0, 20.0))
+        assert item.location == {"type": "Point", "coordinates": [20.0, 10.0]}
+
+    def test_coordinates_rounded_like_geojson(self):
+        assert point(33.12345678912, -83.98765432198) == {
+            "type": "Point",
+            "coordinates": [-83.987654322, 33.123456789],
+        }
+
+    def test_profile_matches_validated_model(self):
+        row = {
+            "id": uuid.uuid4(),
+            "name": "Merlin",
+            "description": None,
+            "level": 3,
+            "wins": 5,
+            "losses": 2,
+            "gems": 100,
+            "latitude": 33.951,
+            "longitude": -83.3753,
+        }
+        validated = Profile(
+            **{k: v for k, v in row.items() if k not in ("latitude", "longitude")},
+            location={"type": "Point", "coordinates": [-83.3753, 33.951]},
+        )
+
+        assert FastJSONResponse(profile_from_row(row)).body == validated.model_dump_json().encode()
+
+    def test_battle_log_matches_validated_model(self):
+        row = {
+            "id": uuid.uuid4(),
+            "attacker_id": uuid.uuid4(),
+            "defender_id": uuid.uuid4(),
+            "winner_id": uuid.uuid4(),
+            "created_at": CREATED,
+        }
+
+        body = FastJSONResponse([battle_log_from_row(row)]).body
+
+        assert body == TypeAdapter(List[BattleLog]).dump_json([BattleLog(**row)])
+
+    def test_iso_response_matches_jsonable_encoder(self):
+        content = [{"id": uuid.uuid4(), "expires_at": CREATED, "location": None}]
+
+        body = IsoJSONResponse(content).body
+
+        assert json.loads(body) == jsonable_encoder(content)
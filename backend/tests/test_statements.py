@@ -0,0 +1,93 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from databases import Database
+
+from app.core.statements import Statement, StatementRegistry
+
+
+class RawConnection:
+    def __init__(self):
+        self.calls = []
+
+    async def fetchrow(self, query, *args):
+        self.calls.append((query, args))
+        return {"id": args[0]}
+
+
+class PreparedDatabase(Database):
+    """A Database whose one connection is a recording asyncpg stand-in"""
+
+    def __init__(self):
+        super().__init__("postgresql://localhost/unused")
+        self.raw = RawConnection()
+
+    @asynccontextmanager
+    async def _connection(self):
+        class Connection:
+            raw_connection = self.raw
+
+        yield Connection()
+
+    def connection(self):
+        return self._connection()
+
+
+class TextDatabase:
+    def __init__(self):
+        self.calls = []
+
+    async def fetch_one(self, query, values=None):
+        self.calls.append((query, values))
+        return values
+
+
+class TestStatement:
+    def test_named_parameters_become_positional(self):
+        statement = Statement(
+            "s",
+            "SELECT :b::text, CAST(:a AS float8), location::geography, :b, '12:30'",
+        )
+
+        assert statement.parameters == ("b", "a")
+        assert statement.positional == (
+            "SELECT $1::text, CAST($2 AS float8), location::geography, $1, '12:30'"
+        )
+        assert statement.arguments({"a": 1.5, "b": "x"}) == ["x", 1.5]
+
+    @pytest.mark.parametrize("values", [{"a": 1}, {"a": 1, "b": 2, "c": 3}])
+    def test_arguments_must_match(self, values):
+        with pytest.raises(TypeError):
+            Statement("s", "SELECT :a, :b").arguments(values)
+
+
+class TestStatementRegistry:
+    def test_prepared_mode_runs_positional_on_raw_connection(self):
+        db = PreparedDatabase()
+        registry = StatementRegistry(db)
+        registry.declare("by_id", "SELECT id FROM profiles WHERE id = :player_id")
+
+        row = asyncio.run(registry.fetch_one("by_id", {"player_id": "p"}))
+
+        assert row == {"id": "p"}
+        assert db.raw.calls == [("SELECT id FROM profiles WHERE id = $1", ("p",))]
+
+    def test_text_mode_and_test_doubles_get_named_sql(self):
+        registry = StatementRegistry(PreparedDatabase(), enabled=False)
+        registry.declare("by_id", "SELECT id FROM profiles WHERE id = :player_id")
+        text = TextDatabase()
+
+        asyncio.run(registry.using(text, enabled=True).fetch_one("by_id", {"player_id": "p"}))
+
+        assert text.calls == [
+            ("SELECT id FROM profiles WHERE id = :player_id", {"player_id": "p"})
+        ]
+
+    def test_conflicting_declaration_rejected(self):
+        registry = StatementRegistry(TextDatabase())
+        registry.declare("s", "SELECT 1")
+        registry.declare("s", "SELECT 1")
+
+        with pytest.raises(ValueError):
+            registry.declare("s", "SELECT 2")
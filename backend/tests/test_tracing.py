@@ -0,0 +1,128 @@
+import logging
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.metrics import HTTPMetrics, MetricsMiddleware, RequestTiming, current_request
+from app.core.tracing import OTHER, QueryTracer, normalize, rows_affected
+
+
+class TestNormalize:
+    def test_collapses_whitespace_and_literals(self):
+        query = """
+        SELECT * FROM items
+        WHERE id = 'abc''d' AND quantity > 3 AND owner_id = :player_id
+        LIMIT 10
+        """
+        assert normalize(query) == (
+            "SELECT * FROM items WHERE id = ? AND quantity > ? "
+            "AND owner_id = :player_id LIMIT ?"
+        )
+
+    def test_keeps_identifiers_with_digits(self):
+        assert normalize("SELECT ST_X(p.location::geometry) FROM t1") == (
+            "SELECT ST_X(p.location::geometry) FROM t1"
+        )
+
+
+class TestQueryTracer:
+    def test_groups_statements_and_ranks_by_total_time(self):
+        tracer = QueryTracer()
+        tracer.record("SELECT 1 FROM a WHERE id = 'x'", 0, 0.010, 1)
+        tracer.record("SELECT 1 FROM a WHERE id = 'y'", 0, 0.030, 0)
+        tracer.record("SELECT * FROM b WHERE id = :id", 1, 0.005, 3)
+
+        top = tracer.top()
+        assert [s["query"] for s in top] == [
+            "SELECT ? FROM a WHERE id = ?",
+            "SELECT * FROM b WHERE id = :id",
+        ]
+        assert top[0]["calls"] == 2
+        assert top[0]["total_ms"] == 40.0
+        assert top[0]["max_ms"] == 30.0
+        assert top[0]["rows"] == 1
+        assert top[1]["parameters"] == 1
+        assert tracer.top(limit=1) == top[:1]
+
+    def test_caps_distinct_statements(self):
+        tracer = QueryTracer(max_statements=2)
+        for table in ("a", "b", "c", "d"):
+            tracer.record(f"SELECT * FROM {table}", 0, 0.001, None)
+        queries = {s["query"]: s["calls"] for s in tracer.top()}
+        assert queries == {"SELECT * FROM a": 1, "SELECT * FROM b": 1, OTHER: 2}
+
+    def test_logs_slow_queries(self, caplog):
+        tracer = QueryTracer(slow_threshold_ms=50)
+        with caplog.at_level(logging.WARNING, logger="app.core.tracing"):
+            tracer.record("SELECT * FROM items WHERE owner_id = 'secret'", 1, 0.020, 1)
+            tracer.record("SELECT * FROM items WHERE owner_id = 'secret'", 1, 0.080, 4)
+
+        assert tracer.slow_queries == 1
+        assert len(caplog.records) == 1
+        message = caplog.records[0].getMessage()
+        assert "80.0 ms" in message and "4 rows" in message
+        assert "secret" not in message
+
+    def test_disabled_records_nothing(self):
+        tracer = QueryTracer(enabled=False, slow_threshold_ms=0)
+        tracer.record("SELECT 1", 0, 1.0, 1)
+        tracer.finish_request("GET", "/x", 200, 1.0, RequestTiming())
+        assert tracer.top() == [] and tracer.routes() == [] and tracer.slow_queries == 0
+
+    def test_reset(self):
+        tracer = QueryTracer()
+        tracer.record("SELECT 1", 0, 0.001, 1)
+        tracer.finish_request("GET", "/x", 200, 0.01, RequestTiming())
+        tracer.reset()
+        assert tracer.top() == [] and tracer.routes() == []
+
+
+class TestRequestTraces:
+    def traced_app(self, tracer):
+        metrics = HTTPMetrics()
+        metrics.add_listener(tracer.finish_request)
+        app = FastAPI()
+        app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+        @app.get("/players/{player_id}/items")
+        async def items(player_id: int, n: int = 1):
+            timing = current_request.get()
+            for item_id in range(n):
+                timing.queries += 1
+                tracer.record(f"SELECT * FROM items WHERE id = {item_id}", 0, 0.001, 1)
+            return []
+
+        return TestClient(app)
+
+    def test_counts_queries_per_route(self):
+        tracer = QueryTracer(repeat_threshold=10)
+        client = self.traced_app(tracer)
+        client.get("/players/1/items?n=2")
+        client.get("/players/2/items?n=4")
+
+        (route,) = tracer.routes()
+        assert route["route"] == "/players/{player_id}/items"
+        assert route["requests"] == 2
+        assert route["queries"] == 6
+        assert route["mean_queries"] == 3.0
+        assert route["max_queries"] == 4
+        assert route["repeated_statement_requests"] == 0
+
+    def test_flags_repeated_statements(self, caplog):
+        tracer = QueryTracer(repeat_threshold=5)
+        client = self.traced_app(tracer)
+        with caplog.at_level(logging.WARNING, logger="app.core.tracing"):
+            client.get("/players/1/items?n=4")
+            client.get("/players/1/items?n=6")
+
+        assert tracer.routes()[0]["repeated_statement_requests"] == 1
+        (record,) = caplog.records
+        assert "ran one statement 6 times" in record.getMessage()
+        assert "SELECT * FROM items WHERE id = ?" in record.getMessage()
+
+
+def test_rows_affected():
+    assert rows_affected("UPDATE 3") == 3
+    assert rows_affected("INSERT 0 12") == 12
+    assert rows_affected("BEGIN") is None
+    assert rows_affected(None) is None